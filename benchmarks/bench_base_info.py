@@ -0,0 +1,182 @@
+"""
+基本信息获取的基准测试
+
+使用 bench_pipeline 合成的华为设备, 删除每台设备中一部分基本信息用到的命令,
+分别统计旧的 ``with device.search_cmd(...)`` 写法与现在使用
+``parse_result`` / ``get_cmd`` 写法的基本信息方法每台设备的耗时,
+并确认两者得到的基本信息相同。命令只在预热时解析一次, 不计入耗时。
+在仓库根目录执行::
+
+    python -m benchmarks.bench_base_info -n 20
+    python -m benchmarks.bench_base_info -n 20 --missing 1.0
+"""
+
+from __future__ import annotations
+
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING, Dict, List
+
+from rich import print
+from rich.table import Table
+
+from benchmarks.bench_pipeline import synthesize_devices
+from net_inspect.api import NetInspect
+from net_inspect.base_info import BaseInfo, EachVendorDeviceInfo
+from net_inspect.func import match_lower
+from net_inspect.vendor import Huawei
+
+if TYPE_CHECKING:
+    from net_inspect.domain import Device
+
+
+class SearchCmdDeviceInfo(EachVendorDeviceInfo):
+    """迁移到 ``parse_result`` 之前的华为设备基本信息方法, 命令不存在时由NoneSkip跳过with中的内容
+
+    只保留华为设备的方法作为对比, 其他厂商的写法相同
+    """
+
+    def do_huawei_vrp_baseinfo(self, device: Device, info: BaseInfo):
+        if not info.ip:
+            with device.search_cmd('display ip interface brief') as cmd:
+                for row in cmd.parse_result:
+                    if match_lower(row.get('interface'), 'loopback0'):
+                        info.ip = row.get('ip')
+                        break
+
+                    elif match_lower(row.get('interface'), 'vlanif'):
+                        if not info.ip:
+                            info.ip = row.get('ip')
+
+        with device.search_cmd('display version') as cmd:
+            for row in cmd.parse_result:
+                info.model = row.get('model')
+                info.version = row.get('vrp_version')
+                info.uptime = row.get('uptime')
+
+        with device.search_cmd('display device manufacture-info') as cmd:
+            for row in cmd.parse_result:
+                info.sn.append((row.get('type'), row.get('serial')))
+
+        if not info.sn:
+            with device.search_cmd('display esn') as cmd:
+                if cmd.parse_result:
+                    sn = cmd.parse_result[0].get('esn')
+                    info.sn.append(('chassis', sn))
+
+            with device.search_cmd('display elabel brief') as cmd:
+                for row in cmd.parse_result:
+                    info.sn.append((row.get('slot'), row.get('bar_code')))
+
+        with device.search_cmd('display cpu-usage') as cmd:
+            if cmd.parse_result:
+                info.cpu_usage = cmd.parse_result[0].get('cpu_5_min') + '%'
+
+        with device.search_cmd('display memory-usage') as cmd:
+            if cmd.parse_result:
+                info.memory_usage = (
+                    cmd.parse_result[0].get('memory_using_percent') + '%'
+                )
+
+        device.analysis_result
+
+
+HANDLERS = {
+    'search_cmd': SearchCmdDeviceInfo,
+    'parse_result': EachVendorDeviceInfo,
+}
+
+
+def parse_args(command: List[str] = None) -> Namespace:
+    args = ArgumentParser(description='基本信息获取的基准测试')
+    args.add_argument('-n', '--devices', type=int, default=20, help='每个厂商合成的设备数, 只统计华为设备')
+    args.add_argument('-r', '--repeat', type=int, default=5, help='重复次数, 取最小耗时')
+    args.add_argument(
+        '--missing', type=float, default=0.5, help='每台设备删除的基本信息命令的比例'
+    )
+    return args.parse_args(command)
+
+
+def load_devices(input_dir: str, missing: float) -> List[Device]:
+    """读取合成的设备, 按照比例删除每台设备中基本信息用到的命令"""
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone')
+    net.run_input(input_dir)
+    net.run_parse()
+
+    devices = [device for device in net.cluster.devices if device.vendor is Huawei]
+    handler = EachVendorDeviceInfo()
+    for device in devices:
+        commands = sorted(handler.get_commands(device.vendor) or ())
+        for command in commands[: int(len(commands) * missing)]:
+            cmd = device.get_cmd(command)
+            if cmd is not None:
+                del device.cmds[cmd.command]
+    return devices
+
+
+def measure(handler: EachVendorDeviceInfo, devices: List[Device], repeat: int) -> float:
+    """返回获取所有设备基本信息的最小耗时"""
+    seconds = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        for device in devices:
+            handler.run_baseinfo_func(device)
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def benchmark(args: Namespace) -> Dict[str, object]:
+    work_dir = tempfile.mkdtemp(prefix='net_inspect_bench_')
+    try:
+        synthesize_devices(work_dir, args.devices)
+        devices = load_devices(work_dir, args.missing)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    handlers = {name: handler_class() for name, handler_class in HANDLERS.items()}
+    infos = {  # 预热, 同时解析用到的命令
+        name: [handler.run_baseinfo_func(device) for device in devices]
+        for name, handler in handlers.items()
+    }
+
+    return {
+        'devices': len(devices),
+        'seconds': {
+            name: measure(handler, devices, args.repeat)
+            for name, handler in handlers.items()
+        },
+        'same': infos['search_cmd'] == infos['parse_result'],
+    }
+
+
+def report(result: Dict[str, object]) -> bool:
+    """打印结果, 返回两种写法得到的基本信息是否相同"""
+    devices = result['devices']
+    table = Table(title=f'{devices} devices')
+    for col in ['method', 'seconds', 'us/device']:
+        table.add_column(col, justify='right')
+
+    for name, seconds in result['seconds'].items():
+        table.add_row(name, f'{seconds:.4f}', f'{seconds / devices * 1e6:.1f}')
+    print(table)
+
+    legacy = result['seconds']['search_cmd']
+    fast = result['seconds']['parse_result']
+    print(f'speedup: {legacy / fast:.1f}x')
+
+    if not result['same']:
+        print('[red]基本信息不一致[/red]')
+    return result['same']
+
+
+def main(command: List[str] = None) -> int:
+    args = parse_args(command)
+    return 0 if report(benchmark(args)) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
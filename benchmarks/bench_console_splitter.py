@@ -0,0 +1,173 @@
+"""
+InputPluginWithConsole 切分方法的基准测试
+
+将 tests 中的console会话记录重复拼接为一个大文件, 分别统计逐行匹配的
+``split_by_line`` 与在整个文件内容中查找的 ``InputPluginWithConsole.main`` 的耗时和内存峰值,
+并确认两者的切分结果相同。在仓库根目录执行::
+
+    python -m benchmarks.bench_console_splitter -n 200
+    python -m benchmarks.bench_console_splitter --file session.log
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import re
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from typing import Callable, Dict, List
+
+from rich import print
+from rich.table import Table
+
+from net_inspect.domain import InputPluginResult
+from net_inspect.plugins.input_plugin_with_console import (
+    InputPluginWithConsole,
+    prompt_reg,
+    similar_cisco_reg,
+    simialr_huawei_reg,
+)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+CONSOLE_FIXTURES = [
+    os.path.join(ROOT_DIR, 'tests', '**', 'console_input.log'),
+    os.path.join(ROOT_DIR, 'tests', 'integration', 'data', 'base_info_logs', '*.txt'),
+]
+
+
+def parse_args(command: List[str] = None) -> Namespace:
+    args = ArgumentParser(description='InputPluginWithConsole 切分方法的基准测试')
+    args.add_argument('-n', '--copies', type=int, default=100, help='测试数据重复拼接的次数')
+    args.add_argument('-r', '--repeat', type=int, default=3, help='重复次数, 取最小耗时')
+    args.add_argument('--file', type=str, default='', help='使用指定的会话记录, 不再拼接测试数据')
+    return args.parse_args(command)
+
+
+def build_stream(copies: int) -> str:
+    """将测试数据中的console会话记录拼接后重复 ``copies`` 次"""
+    plugin = InputPluginWithConsole()
+    files = sorted(
+        file for pattern in CONSOLE_FIXTURES for file in glob.glob(pattern, recursive=True)
+    )
+    stream = '\n'.join(plugin.read(file) for file in files) + '\n'
+    return stream * copies
+
+
+def split_by_line(file_path: str, stream: str) -> InputPluginResult:
+    """逐行匹配命令行和提示符的切分方法, 即 ``InputPluginWithConsole.main`` 原来的实现"""
+    command = ''
+    content = []
+
+    prompt = ''  # 用于记录当前的提示符
+
+    result = InputPluginResult()
+
+    for line in stream.splitlines():
+        match = re.match(similar_cisco_reg, line) or re.match(
+            simialr_huawei_reg, line
+        )  # 判断是否为命令的行
+        if match:
+            if not result.hostname:  # 如果没有设备名称就记录
+                result.hostname = match.group('device_name')
+
+            prompt = re.match(prompt_reg, line).group(0)  # 获取当前的提示符
+
+            if content and command:  # 如果有内容，且有命令，则保存
+                result.add_cmd(command, '\n'.join(content))
+
+            command = match.group('cmd').strip()
+            content.clear()
+            continue
+
+        else:  # 如果没有匹配到，有可能是只有命令提示符，此时也要保存
+            if prompt:  # 如果保存有提示符
+                # 如果行开始是提示符，且有内容，且有命令，则保存
+                if line.startswith(prompt) and content and command:
+                    result.add_cmd(command, '\n'.join(content))
+
+                    command = ''  # 清空状态
+                    content.clear()
+                    continue
+
+            content.append(line)  # 如果没有匹配到，则添加到内容中
+
+    if content and command:  # 最后将没有保存的内容保存
+        result.add_cmd(command, '\n'.join(content))
+
+    return result
+
+
+def measure(
+    func: Callable[[str, str], InputPluginResult], stream: str, repeat: int
+) -> Dict:
+    """统计切分方法的最小耗时和内存峰值
+
+    Returns:
+        {'seconds': 耗时, 'peak': 内存峰值(字节), 'result': 切分结果}
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func('', stream)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func('', stream)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'seconds': min(seconds), 'peak': peak, 'result': result}
+
+
+def benchmark(args: Namespace) -> Dict[str, Dict]:
+    plugin = InputPluginWithConsole()
+    stream = plugin.read(args.file) if args.file else build_stream(args.copies)
+
+    results = {
+        'split_by_line': measure(split_by_line, stream, args.repeat),
+        'main': measure(plugin.main, stream, args.repeat),
+    }
+    results['size'] = len(stream)
+    return results
+
+
+def report(results: Dict[str, Dict]) -> bool:
+    """打印结果, 返回两种方法的切分结果是否相同"""
+    size = results.pop('size')
+    table = Table(title=f'{size / 1024 / 1024:.1f} MB console log')
+    for col in ['method', 'seconds', 'MB/s', 'tracemalloc MB', 'commands']:
+        table.add_column(col, justify='right')
+
+    for name, item in results.items():
+        table.add_row(
+            name,
+            f"{item['seconds']:.3f}",
+            f"{size / 1024 / 1024 / item['seconds']:.1f}" if item['seconds'] else '-',
+            f"{item['peak'] / 1024 / 1024:.1f}",
+            str(len(item['result'].cmd_dict)),
+        )
+    print(table)
+
+    legacy, fast = results['split_by_line'], results['main']
+    print(f"speedup: {legacy['seconds'] / fast['seconds']:.1f}x")
+
+    same = (
+        legacy['result'].cmd_dict == fast['result'].cmd_dict
+        and legacy['result'].hostname == fast['result'].hostname
+    )
+    if not same:
+        print('[red]切分结果不一致[/red]')
+    return same
+
+
+def main(command: List[str] = None) -> int:
+    args = parse_args(command)
+    return 0 if report(benchmark(args)) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Excel 写入合并单元格的基准测试
+
+写入N行带有合并单元格的数据并保存, 分别统计使用 openpyxl 公开的 ``merge_cells``、
+``Excel.write_block`` 以及只写模式的 ``StreamingExcel.write_block`` 的耗时,
+并确认 ``merge_cells`` 与 ``Excel.write_block`` 合并的范围相同。
+``merge_cells`` 每次都会检查所有已有的范围, 耗时与行数的平方成正比。
+在仓库根目录执行::
+
+    python -m benchmarks.bench_excel -n 2000
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Callable, Dict, List, Set
+
+from rich import print
+from rich.table import Table
+
+from net_inspect.third_party.excel import CellContext, Excel, StreamingExcel
+
+COLUMNS = 8
+MERGE = [('A', 'B'), ('D', 'F')]  # 每行合并的范围, 与报告中的合并方式类似
+
+
+def parse_args(command: List[str] = None) -> Namespace:
+    args = ArgumentParser(description='Excel 写入合并单元格的基准测试')
+    args.add_argument('-n', '--rows', type=int, default=2000, help='写入的行数')
+    args.add_argument('-r', '--repeat', type=int, default=3, help='重复次数, 取最小耗时')
+    return args.parse_args(command)
+
+
+def make_rows(count: int) -> List[List[CellContext]]:
+    """每行的值依次写入没有被合并的列"""
+    values = COLUMNS - sum(ord(end) - ord(start) for start, end in MERGE)
+    return [[CellContext(f'{row}-{col}') for col in range(values)] for row in range(count)]
+
+
+def write_with_merge_cells(rows: List[List[CellContext]], file_path: str) -> Set[str]:
+    """逐个单元格写入, 使用公开的 ``merge_cells`` 合并"""
+    excel = Excel()
+    for row in rows:
+        excel.write_block([row])
+        for start, end in MERGE:
+            excel.sheet.merge_cells(f'{start}{excel.next_row - 1}:{end}{excel.next_row - 1}')
+    excel.save(file_path)
+    return {str(cell_range) for cell_range in excel.sheet.merged_cells.ranges}
+
+
+def write_with_write_block(rows: List[List[CellContext]], file_path: str) -> Set[str]:
+    excel = Excel()
+    excel.write_block(rows, MERGE)
+    excel.save(file_path)
+    return {str(cell_range) for cell_range in excel.sheet.merged_cells.ranges}
+
+
+def write_with_streaming(rows: List[List[CellContext]], file_path: str) -> Set[str]:
+    excel = StreamingExcel()
+    excel.write_block(rows, MERGE)
+    excel.save(file_path)
+    return {str(cell_range) for cell_range in excel.sheet.merged_cells}
+
+
+METHODS: Dict[str, Callable[[List[List[CellContext]], str], Set[str]]] = {
+    'merge_cells': write_with_merge_cells,
+    'write_block': write_with_write_block,
+    'streaming': write_with_streaming,
+}
+
+
+def benchmark(args: Namespace) -> Dict[str, Dict]:
+    rows = make_rows(args.rows)
+    work_dir = tempfile.mkdtemp(prefix='net_inspect_bench_')
+    results = {}
+    try:
+        for name, func in METHODS.items():
+            file_path = os.path.join(work_dir, name + '.xlsx')
+            seconds = []
+            for _ in range(max(args.repeat, 1)):
+                start = time.perf_counter()
+                merged = func(rows, file_path)
+                seconds.append(time.perf_counter() - start)
+            results[name] = {'seconds': min(seconds), 'merged': merged}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def report(results: Dict[str, Dict], rows: int) -> bool:
+    """打印结果, 返回所有方法合并的范围是否相同"""
+    table = Table(title=f'{rows} rows, {len(MERGE)} merged ranges per row')
+    for col in ['method', 'seconds', 'rows/s', 'merged ranges']:
+        table.add_column(col, justify='right')
+
+    for name, item in results.items():
+        table.add_row(
+            name,
+            f"{item['seconds']:.3f}",
+            f"{rows / item['seconds']:.0f}" if item['seconds'] else '-',
+            str(len(item['merged'])),
+        )
+    print(table)
+
+    public = results['merge_cells']
+    for name in ('write_block', 'streaming'):
+        print(f"{name} speedup: {public['seconds'] / results[name]['seconds']:.1f}x")
+
+    same = all(item['merged'] == public['merged'] for item in results.values())
+    if not same:
+        print('[red]合并的范围不一致[/red]')
+    return same
+
+
+def main(command: List[str] = None) -> int:
+    args = parse_args(command)
+    return 0 if report(benchmark(args), args.rows) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
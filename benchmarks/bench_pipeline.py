@@ -0,0 +1,415 @@
+"""
+net_inspect 流水线基准测试
+
+使用 tests/check_analysis_plugins 和 tests/integration/data 中的命令回显,
+为每个厂商合成 N 台设备, 分别统计 NetInspect.run 中
+run_input, run_parse, run_analysis, run_output 四个阶段的耗时、
+每秒处理的设备数、每条命令的解析耗时以及内存峰值。
+
+整个过程不需要网络, 在仓库根目录执行::
+
+    python -m benchmarks.bench_pipeline -n 20
+    python -m benchmarks.bench_pipeline -n 20 --save default      # 保存基线
+    python -m benchmarks.bench_pipeline -n 20 --compare default   # 与基线对比
+
+基线保存在 benchmarks/baselines/<name>.json 中, 对比时耗时增加超过阈值的阶段
+会被标记出来, 并以非0状态码退出。基线与机器相关, 只在同一台机器上对比才有意义。
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import platform as sys_platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from collections import defaultdict
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
+
+from rich import print
+from rich.table import Table
+
+from net_inspect.api import NetInspect
+from net_inspect.plugins.input_plugin_with_console import InputPluginWithConsole
+from net_inspect.plugins.input_plugin_with_smartone import InputPluginWithSmartOne
+from net_inspect.plugins.output_plugin_with_excel_report import (
+    OutputPluginWithExcelReport,
+)
+from net_inspect.plugins.parse_plugin_with_ntc_templates import (
+    ParsePluginWithNtcTemplates,
+)
+
+if TYPE_CHECKING:
+    from net_inspect.domain import Cmd
+
+try:
+    import resource
+except ImportError:  # pragma: no cover Windows 没有resource模块
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, 'baselines')
+ANALYSIS_FIXTURE_DIR = os.path.join(ROOT_DIR, 'tests', 'check_analysis_plugins')
+BASE_INFO_FIXTURE_DIR = os.path.join(
+    ROOT_DIR, 'tests', 'integration', 'data', 'base_info_logs'
+)
+
+PLATFORMS = ['huawei_vrp', 'hp_comware', 'cisco_ios', 'maipu_mypower', 'ruijie_os']
+STAGES = ['run_input', 'run_parse', 'run_analysis', 'run_output']
+BASELINE_VERSION = 1  # 基线格式版本
+
+command_line_reg = re.compile(
+    r'^-------------------------(?P<cmd>[^-].*?)-------------------------$'
+)
+
+
+class TimedParsePlugin(ParsePluginWithNtcTemplates):
+    """记录每条命令解析耗时的解析插件, 只在串行解析时有效"""
+
+    timings: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+
+    def run(self, cmd: Cmd, platform: str):
+        start = time.perf_counter()
+        try:
+            return super().run(cmd, platform)
+        finally:
+            self.timings[(platform, cmd.command)].append(
+                time.perf_counter() - start
+            )
+
+
+def parse_args(command: List[str] = None) -> Namespace:
+    args = ArgumentParser(description='net_inspect 流水线基准测试')
+    args.add_argument('-n', '--devices', type=int, default=10, help='每个厂商合成的设备数')
+    args.add_argument('-r', '--repeat', type=int, default=3, help='重复次数, 取每个阶段的最小耗时')
+    args.add_argument('-j', '--jobs', type=int, default=1, help='解析的进程数')
+    args.add_argument('--no-output', action='store_true', help='跳过run_output阶段')
+    args.add_argument('--memory', action='store_true', help='使用tracemalloc统计每个阶段的内存峰值, 耗时会变长')
+    args.add_argument('--top', type=int, default=10, help='显示解析最慢的命令数量')
+    args.add_argument('--save', type=str, default='', help='将结果保存为基线')
+    args.add_argument('--compare', type=str, default='', help='与指定的基线进行对比')
+    args.add_argument('--threshold', type=float, default=10.0, help='判断为性能下降的阈值(%%)')
+    return args.parse_args(command)
+
+
+def read_raw_file(file_path: str) -> Dict[str, str]:
+    """读取 check_analysis_plugins 中的 .raw 文件, 返回命令字典"""
+    cmd_dict = {}
+    content = []
+    command = ''
+
+    with open(file_path, encoding='utf-8') as f:
+        for line in f.read().splitlines():
+            match = command_line_reg.match(line)
+            if match:
+                if command:
+                    cmd_dict[command] = '\n'.join(content)
+                command = match.group('cmd')
+                content.clear()
+                continue
+            content.append(line)
+
+    if command:
+        cmd_dict[command] = '\n'.join(content)
+    return cmd_dict
+
+
+def load_platform_profiles() -> Dict[str, List[Dict[str, str]]]:
+    """读取测试数据, 为每个厂商生成若干个命令字典的样本
+
+    base_info_logs 中的回显提供厂商识别需要的 version 命令,
+    每个分析插件的 .raw 文件(包括 huawei_vrp2.raw 这样的变体)轮流补充到样本中。
+
+    Returns:
+        Dict[str, List[Dict[str, str]]]: {厂商平台: [命令字典, ...]}
+    """
+    profiles = {}
+    console = InputPluginWithConsole()
+
+    for platform in PLATFORMS:
+        base_file = os.path.join(BASE_INFO_FIXTURE_DIR, platform + '.txt')
+        with open(base_file, encoding='utf-8') as f:
+            base_cmds = console.main(base_file, f.read()).cmd_dict
+
+        variants = []  # 每个分析插件目录中该厂商的所有.raw文件
+        for plugin_dir in sorted(glob.glob(os.path.join(ANALYSIS_FIXTURE_DIR, '*'))):
+            files = sorted(glob.glob(os.path.join(plugin_dir, platform + '*.raw')))
+            files = [
+                f
+                for f in files
+                if re.match(platform + r'\d*\.raw$', os.path.basename(f))
+            ]
+            if files:
+                variants.append([read_raw_file(f) for f in files])
+
+        count = max([len(v) for v in variants] + [1])
+        profiles[platform] = []
+        for i in range(count):
+            cmd_dict = dict(base_cmds)
+            for raws in variants:
+                for command, content in raws[i % len(raws)].items():
+                    cmd_dict.setdefault(command, content)
+            profiles[platform].append(cmd_dict)
+
+    return profiles
+
+
+def synthesize_devices(input_dir: str, devices_per_vendor: int) -> int:
+    """在目录中按照 iSmartOne 的文件格式合成设备文件
+
+    Args:
+        input_dir: 输出目录
+        devices_per_vendor: 每个厂商的设备数
+
+    Returns:
+        int: 设备总数
+    """
+    total = 0
+    for platform, profiles in load_platform_profiles().items():
+        for i in range(devices_per_vendor):
+            cmd_dict = profiles[i % len(profiles)]
+            total += 1
+            ip = f'10.{total // 65536}.{total // 256 % 256}.{total % 256}'
+            file_name = f'BENCH_{platform.upper()}_{i:05d}_{ip}.diag'
+            with open(os.path.join(input_dir, file_name), 'w', encoding='utf-8') as f:
+                for command, content in cmd_dict.items():
+                    f.write(f'{"-" * 25}{command}{"-" * 25}\n')
+                    f.write(content + '\n')
+    return total
+
+
+def peak_rss_mb() -> float:
+    """进程的内存峰值(MB), 不支持时返回0"""
+    if resource is None:  # pragma: no cover
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # pragma: no cover macOS的单位是字节
+        return rss / 1024 / 1024
+    return rss / 1024
+
+
+def timed(func: Callable, trace_memory: bool) -> Tuple[float, float]:
+    """执行函数, 返回 (耗时秒数, tracemalloc内存峰值MB)"""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = 0.0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_once(
+    args: Namespace, input_dir: str, output_dir: str
+) -> Dict[str, Dict[str, float]]:
+    """执行一次完整的流水线, 返回每个阶段的耗时和内存峰值"""
+    net = NetInspect()
+    net.set_plugins(
+        input_plugin=InputPluginWithSmartOne,
+        output_plugin=OutputPluginWithExcelReport,
+        parse_plugin=TimedParsePlugin,
+    )
+    output_file = os.path.join(output_dir, 'report.xlsx')
+
+    stages = {
+        'run_input': lambda: net.run_input(input_dir),
+        'run_parse': lambda: net.run_parse(workers=args.jobs),
+        'run_analysis': net.run_analysis,
+        'run_output': lambda: net.run_output(output_file),
+    }
+    if args.no_output:
+        stages.pop('run_output')
+
+    result = {'seconds': {}, 'memory_mb': {}}
+    for name, func in stages.items():
+        elapsed, peak = timed(func, args.memory)
+        result['seconds'][name] = elapsed
+        if args.memory:
+            result['memory_mb'][name] = peak
+    return result
+
+
+def command_stats(top: int) -> List[Dict[str, object]]:
+    """统计每条命令的解析耗时, 按照总耗时倒序排列"""
+    stats = []
+    for (platform, command), times in TimedParsePlugin.timings.items():
+        stats.append(
+            {
+                'platform': platform,
+                'command': command,
+                'count': len(times),
+                'total_ms': sum(times) * 1000,
+                'mean_ms': sum(times) / len(times) * 1000,
+            }
+        )
+    stats.sort(key=lambda x: x['total_ms'], reverse=True)
+    return stats[:top] if top > 0 else stats
+
+
+def benchmark(args: Namespace) -> Dict[str, object]:
+    """合成设备并执行基准测试
+
+    Returns:
+        Dict[str, object]: 测试结果, 可以直接保存为基线
+    """
+    work_dir = tempfile.mkdtemp(prefix='net_inspect_bench_')
+    try:
+        input_dir = os.path.join(work_dir, 'input')
+        os.makedirs(input_dir)
+        total = synthesize_devices(input_dir, args.devices)
+
+        seconds = {}
+        memory = {}
+        parse_commands = []
+        for _ in range(max(args.repeat, 1)):
+            TimedParsePlugin.timings.clear()
+            res = run_once(args, input_dir, work_dir)
+            for name, value in res['seconds'].items():  # 每个阶段取最小的耗时
+                seconds[name] = min(seconds.get(name, value), value)
+            for name, value in res['memory_mb'].items():
+                memory[name] = max(memory.get(name, value), value)
+            parse_commands = command_stats(args.top)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    pipeline = sum(seconds.values())
+    return {
+        'version': BASELINE_VERSION,
+        'python': sys_platform.python_version(),
+        'machine': sys_platform.machine(),
+        'devices': total,
+        'devices_per_vendor': args.devices,
+        'jobs': args.jobs,
+        'seconds': seconds,
+        'devices_per_second': {
+            name: (total / value if value else 0.0) for name, value in seconds.items()
+        },
+        'pipeline_devices_per_second': total / pipeline if pipeline else 0.0,
+        'memory_mb': memory,
+        'peak_rss_mb': peak_rss_mb(),
+        'parse_commands': parse_commands if args.jobs == 1 else [],
+    }
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, name + '.json')
+
+
+def save_baseline(name: str, result: Dict[str, object]):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(name: str) -> Dict[str, object]:
+    with open(baseline_path(name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(
+    result: Dict[str, object], baseline: Dict[str, object], threshold: float
+) -> List[str]:
+    """对比测试结果和基线
+
+    Args:
+        result: 本次测试的结果
+        baseline: 基线
+        threshold: 耗时增加超过这个百分比时认为性能下降
+
+    Returns:
+        List[str]: 性能下降的阶段
+    """
+    regressions = []
+    for name, value in result['seconds'].items():
+        old = baseline['seconds'].get(name)
+        if old and (value - old) / old * 100 > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def print_result(
+    result: Dict[str, object],
+    baseline: Dict[str, object] = None,
+    threshold: float = 10.0,
+):
+    table = Table(
+        title=f"{result['devices']} devices, jobs={result['jobs']}, python {result['python']}"
+    )
+    columns = ['stage', 'seconds', 'devices/s', 'tracemalloc MB']
+    if baseline:
+        columns += ['baseline seconds', 'delta %']
+    for col in columns:
+        table.add_column(col, justify='right')
+
+    for name in STAGES:
+        if name not in result['seconds']:
+            continue
+        seconds = result['seconds'][name]
+        row = [
+            name,
+            f'{seconds:.3f}',
+            f"{result['devices_per_second'][name]:.1f}",
+            f"{result['memory_mb'][name]:.1f}" if name in result['memory_mb'] else '-',
+        ]
+        if baseline:
+            old = baseline['seconds'].get(name)
+            if old:
+                delta = (seconds - old) / old * 100
+                color = 'red' if delta > threshold else 'green'
+                row += [f'{old:.3f}', f'[{color}]{delta:+.1f}[/]']
+            else:
+                row += ['-', '-']
+        table.add_row(*row)
+
+    print(table)
+    print(
+        f"pipeline: {result['pipeline_devices_per_second']:.1f} devices/s, "
+        f"peak rss: {result['peak_rss_mb']:.1f} MB"
+    )
+
+    if result['parse_commands']:
+        table = Table(title='parse time per command')
+        for col in ['platform', 'command', 'count', 'total ms', 'mean ms']:
+            table.add_column(col, justify='right')
+        for row in result['parse_commands']:
+            table.add_row(
+                row['platform'],
+                row['command'],
+                str(row['count']),
+                f"{row['total_ms']:.1f}",
+                f"{row['mean_ms']:.3f}",
+            )
+        print(table)
+
+
+def main(command: List[str] = None) -> int:
+    args = parse_args(command)
+    result = benchmark(args)
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    print_result(result, baseline, args.threshold)
+
+    if args.save:
+        save_baseline(args.save, result)
+        print(f'baseline saved: {baseline_path(args.save)}')
+
+    if baseline:
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"[red]regression over {args.threshold}%: {', '.join(regressions)}[/]")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
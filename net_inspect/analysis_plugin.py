@@ -45,6 +45,10 @@ class StoreTemplateKey(Singleton):
             'base_info': [],
         }
         self._only_run_plugins: List[str] = []  # 只运行指定的插件
+        # 分析函数的索引 {(插件名称, 厂商平台): [分析函数]}
+        self._index: Dict[Tuple[PLUGIN_NAME, str], List[AnalysisFunctionInfo]] = {}
+        # 应用了only_run_plugins之后实际执行的索引, 没有设置时就是完整的索引
+        self._dispatch = self._index
 
     def _clear_temp_store(self):
         """清空临时存储"""
@@ -62,6 +66,24 @@ class StoreTemplateKey(Singleton):
             plugins: 指定的插件列表
         """
         self._only_run_plugins = [plugin.__name__ for plugin in plugins]
+        self._build_dispatch()
+
+    def _build_dispatch(self):
+        """按照only_run_plugins从索引中筛选出实际执行的分析函数"""
+        if not self._only_run_plugins:
+            self._dispatch = self._index
+            return
+
+        self._dispatch = {
+            key: infos
+            for key, infos in self._index.items()
+            if key[0] in self._only_run_plugins
+        }
+
+    @property
+    def index(self) -> Dict[Tuple[PLUGIN_NAME, str], List[AnalysisFunctionInfo]]:
+        """分析函数的索引 {(插件名称, 厂商平台): [分析函数]}, 按照注册的顺序排列"""
+        return self._index
 
     def get_funcs(
         self, plugin_name: PLUGIN_NAME, vendor: Type[DefaultVendor]
@@ -78,20 +100,28 @@ class StoreTemplateKey(Singleton):
         Return:
             分析函数和TemplateKey的迭代器
         """
-        vendor_name = vendor.PLATFORM
-        func_list = []
+        # 设置only_run_plugins时已经筛选过, 这里只需要查找索引
+        for info in self._dispatch.get((plugin_name, vendor.PLATFORM), []):
+            yield info.function, info.template_keys_value, info.base_info_keys_list
 
-        for info in self.filter(plugin_name=plugin_name, vendor_platform=vendor_name):
-            if (
-                self._only_run_plugins and plugin_name not in self._only_run_plugins
-            ):  # 如果设置了only_run_plugins，则只运行指定的插件
-                continue
-            func_list.append(
-                (info.function, info.template_keys_value, info.base_info_keys_list)
-            )
+    def get_commands(self, plugin_name: PLUGIN_NAME, vendor_platform: str) -> List[str]:
+        """
+        获取插件在厂商平台上的分析函数需要的命令, 用于按需解析
+
+        Args:
+            plugin_name: 分析插件类名称
+            vendor_platform: 厂商平台名称
 
-        for func, temp_keys, base_info_keys_list in func_list:
-            yield func, temp_keys, base_info_keys_list
+        Return:
+            命令列表
+        """
+        commands = []
+        for info in self._dispatch.get((plugin_name, vendor_platform), []):
+            for template_file in info.template_keys_value._key_store:
+                if not template_file.endswith('.textfsm'):
+                    template_file += '.textfsm'
+                commands.append(get_command_from_textfsm(vendor_platform, template_file))
+        return commands
 
     def filter(
         self,
@@ -110,13 +140,17 @@ class StoreTemplateKey(Singleton):
         Return:
             分析函数的列表
         """
-        res = []
-        for info in self.store:
+        # 如果名称是以蛇形命名，则转换为驼峰命名
+        if plugin_name and '_' in plugin_name:
+            plugin_name = snake_case_to_pascal_case(plugin_name)
 
-            # 如果名称是以蛇形命名，则转换为驼峰命名
-            if '_' in plugin_name:
-                plugin_name = snake_case_to_pascal_case(plugin_name)
+        if plugin_name and vendor_platform:  # 插件和厂商都指定时直接查找索引
+            infos = self._index.get((plugin_name, vendor_platform), [])
+        else:
+            infos = self.store
 
+        res = []
+        for info in infos:
             if plugin_name and info.plugin_name != plugin_name:
                 continue
             if vendor_platform and info.vendor_platform != vendor_platform:
@@ -152,6 +186,9 @@ class StoreTemplateKey(Singleton):
         )
 
         self.store.append(af)
+        self._index.setdefault((plugin_name, vendor.PLATFORM), []).append(af)
+        if self._dispatch is not self._index:  # 已经设置了only_run_plugins
+            self._build_dispatch()
         self._clear_temp_store()
 
     def vendor(self, vendor: DefaultVendor):
@@ -332,8 +369,8 @@ class AnalysisPluginAbc(AnalysisPluginAbstract):
             cmd = get_command_from_textfsm(  # 通过模板文件名获得命令
                 device.vendor.PLATFORM, template_file
             )
-            cmd_find = device.search_cmd(cmd)  # 搜索命令
-            if not cmd_find:  # 如果命令不存在，跳过
+            cmd_find = device.get_cmd(cmd)  # 搜索命令
+            if cmd_find is None:  # 如果命令不存在，跳过
                 ret[template_file] = []  # 并且返回一个空的列表，作为占位符
                 continue
 
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import os
-from typing import TYPE_CHECKING, Dict, List, Optional, Type
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Type
 
 from .bootstrap import bootstrap
+from .cache import ParseResultCache
 from .data import pyoption, pystr
 from .domain import Cluster
 from .logger import LoggerConfig, logger
+from .metrics import Metrics, metrics
 from .plugin_manager import PluginManager
 
 if TYPE_CHECKING:
@@ -33,6 +35,7 @@ class NetInspect:
         )
         self._plugin_manager.analysis_plugin = self._plugins.get_analysis_plugin_list()
         self.cluster._plugin_manager = self._plugin_manager
+        self._metrics = Metrics()  # 只记录这个实例运行时的耗时统计
 
     def enable_console_log(self, level: str = '', log_format: str = ''):
         """启用控制台日志
@@ -168,12 +171,43 @@ class NetInspect:
         """
         self._plugin_manager.parse_plugin.set_external_templates(templates_dir)
 
+    def enable_parse_cache(self, cache_dir: str):
+        """启用解析结果的磁盘缓存, 命令回显和模板都没有变化时跳过解析
+
+        Args:
+            cache_dir: 缓存目录
+        """
+        self._plugin_manager.parse_cache = ParseResultCache(cache_dir)
+
+    def enable_release_content(self, spill: bool = True, spill_dir: str = ''):
+        """开启节省内存的模式, 设备解析完成后释放命令回显
+
+        Args:
+            spill: 是否将回显写入临时文件, 以便之后需要时读取
+            spill_dir: 临时文件所在目录, 为空时使用系统默认的临时目录
+        """
+        self.cluster.enable_release_content(spill=spill, spill_dir=spill_dir)
+
+    def enable_demand_parse(self):
+        """开启按需解析, 只解析基础信息和分析插件用到的命令, 其他命令在访问时才解析"""
+        self.cluster.enable_demand_parse()
+
+    def enable_incremental(self, manifest_dir: str):
+        """开启增量巡检, 只处理新增或者发生变化的输入文件, 其余设备使用清单中保存的结果
+
+        Args:
+            manifest_dir: 清单目录, 建议与输出文件放在一起
+        """
+        self.cluster.enable_incremental(manifest_dir)
+
     @logger.catch(reraise=True)
-    def run_input(self, path: str) -> Cluster:
+    def run_input(self, path: str, concurrency: int = 1) -> Cluster:
         """运行输入插件, 如果没有指定输入插件则跳过
 
         Args:
             path: 输入路径
+            concurrency: 输入目录时同时读取的文件数, 大于1时并发读取,
+                适用于读取延迟较高的网络存储
 
         Returns:
             Cluster: 集群对象
@@ -183,34 +217,45 @@ class NetInspect:
             logger.info('未指定`input_plugin`, 跳过 `run_input` 函数.')
             return self.cluster
 
-        if os.path.isfile(path):
-            self.cluster.input(path)
-        elif os.path.isdir(path):
-            self.cluster.input_dir(path)
-        else:
-            raise ValueError('`path`必须是文件或者目录')
+        with metrics.collect(self._metrics):
+            if os.path.isfile(path):
+                self.cluster.input(path)
+            elif os.path.isdir(path):
+                self.cluster.input_dir(path, concurrency=concurrency)
+            else:
+                raise ValueError('`path`必须是文件或者目录')
 
         logger.info('输入插件运行完成, 总共发现 {} 台设备.', len(self.cluster.devices))
         return self.cluster
 
     @logger.catch(reraise=True)
-    def run_parse(self) -> Cluster:
+    def run_parse(self, workers: int = 1) -> Cluster:
         """运行解析插件
 
+        Args:
+            workers: 并行解析的进程数, 默认为1即串行解析, 小于1时使用CPU核心数
+
         Returns:
             Cluster: 解析后的集群
         """
-        self.cluster.parse()
+        with metrics.collect(self._metrics):
+            self.cluster.parse(workers=workers)
         return self.cluster
 
     @logger.catch(reraise=True)
-    def run_analysis(self) -> Cluster:
+    def run_analysis(self, workers: int = 1, executor: str = 'thread') -> Cluster:
         """运行分析插件
 
+        Args:
+            workers: 并行分析的设备数, 默认为1即串行分析, 小于1时使用CPU核心数
+            executor: 并行分析的方式, ``thread`` 使用线程池, ``process`` 使用进程池,
+                分析插件或分析函数无法在子进程中导入时改为使用线程池
+
         Returns:
             Cluster: 分析后的集群
         """
-        self.cluster.analysis()
+        with metrics.collect(self._metrics):
+            self.cluster.analysis(workers=workers, executor=executor)
         return self.cluster
 
     @logger.catch(reraise=True)
@@ -226,7 +271,8 @@ class NetInspect:
                 f'start run output, plugin is {self._plugin_manager.output_plugin!r}.'
             )
             logger.complete()
-            self.cluster.output(file_path, params)
+            with metrics.collect(self._metrics):
+                self.cluster.output(file_path, params)
         else:
             logger.info('未指定`output_plugin`, 跳过 `run_output` 函数.')
 
@@ -236,6 +282,10 @@ class NetInspect:
         output_file_path: str = '',
         output_plugin_params: Dict[str, str] = {},
         path: str = '',
+        workers: int = 1,
+        input_concurrency: int = 1,
+        analysis_workers: int = 1,
+        analysis_executor: str = 'thread',
     ) -> Cluster:
         """执行所有插件
 
@@ -244,6 +294,10 @@ class NetInspect:
             output_file_path: 输出文件路径, 可以为空
             output_plugin_params: 传递给output_plugin的参数, 可以为空
             path: 废弃参数
+            workers: 并行解析的进程数, 默认为1即串行解析
+            input_concurrency: 输入目录时同时读取的文件数
+            analysis_workers: 并行分析的设备数, 默认为1即串行分析
+            analysis_executor: 并行分析的方式, ``thread`` 或者 ``process``
 
         Returns:
             Cluster: 集群对象
@@ -255,13 +309,70 @@ class NetInspect:
             rich.print('[red]NetInspect.run: `path`参数已废弃, 请使用`input_path`参数代替.[/]')
             input_path = path
 
-        self.run_input(input_path)
-        self.run_parse()
-        self.run_analysis()
+        self.run_input(input_path, concurrency=input_concurrency)
+        self.run_parse(workers=workers)
+        self.run_analysis(workers=analysis_workers, executor=analysis_executor)
         self.run_output(output_file_path, output_plugin_params)
 
         return self.cluster
 
+    def iter_run(
+        self,
+        input_path: str,
+        workers: int = 1,
+        max_in_flight: int = 0,
+        input_concurrency: int = 1,
+    ) -> Iterator[Device]:
+        """以流水线的方式对目录执行输入、解析和分析, 逐台产出分析完成的设备。
+        设备不会保存到 ``cluster.devices`` 中, 适用于文件数量很多的目录。
+
+        Args:
+            input_path: 输入目录
+            workers: 并行解析的进程数, 默认为1即串行解析
+            max_in_flight: 并行解析时最多同时处理的设备数, 为0时使用 ``workers * 4``
+            input_concurrency: 同时读取的文件数
+
+        Yields:
+            Device: 分析完成的设备
+        """
+        if not os.path.isdir(input_path):
+            raise ValueError('`input_path`必须是目录')
+
+        devices = self.cluster.iter_devices(
+            input_path,
+            workers=workers,
+            max_in_flight=max_in_flight,
+            concurrency=input_concurrency,
+        )
+        while True:
+            with metrics.collect(self._metrics):  # 不统计产出之后调用者的耗时
+                device = next(devices, None)
+            if device is None:
+                return
+            yield device
+
+    def save_snapshot(self, file_path: str, include_content: bool = False):
+        """保存集群快照, 之后可以通过 ``load_snapshot`` 加载并重新执行 ``run_output``
+
+        Args:
+            file_path: 快照文件路径
+            include_content: 是否保存命令回显, 默认不保存
+        """
+        self.cluster.save_snapshot(file_path, include_content=include_content)
+
+    @logger.catch(reraise=True)
+    def load_snapshot(self, file_path: str) -> Cluster:
+        """加载集群快照, 不需要再执行输入、解析和分析
+
+        Args:
+            file_path: 快照文件路径
+
+        Returns:
+            Cluster: 加载后的集群
+        """
+        self.cluster.load_snapshot(file_path)
+        return self.cluster
+
     def add_device_with_raw_data(
         self, hostname: str, ip: str = '', cmd_contents: Dict[str, str] = {}
     ):
@@ -307,10 +418,36 @@ class NetInspect:
 
         return ret
 
+    def get_metrics(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """获取运行过程中的耗时统计
+
+        统计按照分类保存, 每一项记录调用次数(count)和总耗时(seconds):
+
+        * ``cluster``: 输入、解析、分析、输出每个阶段的总耗时
+        * ``stage``: 每个阶段中的单次调用, 如每个文件的输入、每条命令的解析、每台设备的分析
+        * ``platform``: 每个厂商平台的命令解析耗时
+        * ``template``: 每个模板的解析耗时
+        * ``analysis_plugin``: 每个分析插件的耗时
+
+        命令在第一次使用解析结果时才会解析, 所以 ``base_info`` 和分析插件的耗时中可能包含解析的耗时。
+        并行解析时子进程中的耗时会合并到统计中, 此时 ``stage`` 中的耗时是所有进程耗时的总和。
+        统计只包含这个实例的 ``run_*`` 和 ``iter_run`` 执行期间的耗时, 不同实例的统计互不影响,
+        之后访问解析结果时才进行的解析不会计入。
+
+        Returns:
+            {分类: {名称: {'count': 调用次数, 'seconds': 耗时}}}
+        """
+        return self._metrics.snapshot()
+
+    def reset_metrics(self):
+        """清空耗时统计"""
+        self._metrics.clear()
+
     def set_base_info_handler(self, handler: Type[EachVendorDeviceInfo]):
         """设置设备基本信息处理器
 
         Args:
             handler: 设备基本信息处理器
         """
+        handler.clear_cache()  # 处理器的方法可能已经改变
         self.cluster.base_info_handler = handler()
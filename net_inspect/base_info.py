@@ -1,8 +1,11 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+import ast
+import inspect
 import re
+import textwrap
 
-from typing import TYPE_CHECKING, Callable, List, Tuple, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Tuple, Optional
 from .func import match_lower, Singleton
 from .logger import logger
 
@@ -67,6 +70,22 @@ class EachVendorDeviceInfo(Singleton):
     analysis_info_class = AnalysisInfo
     append_analysis_items = []
 
+    # 缓存 (处理器类, 厂商平台, 类型) -> 方法名称列表
+    _funcs_cache: Dict[Tuple[type, str, str], List[str]] = {}
+    # 缓存 处理器类 -> analysis_items + append_analysis_items
+    _analysis_items_cache: Dict[type, List[Tuple[str, str]]] = {}
+    # 缓存 (处理器类, 厂商平台) -> 基本信息方法用到的命令
+    _commands_cache: Dict[Tuple[type, str], Optional[Set[str]]] = {}
+    # 基本信息方法中查找命令的方法, 第一个参数为命令
+    command_accessors = ('parse_result', 'get_cmd', 'search_cmd')
+
+    @classmethod
+    def clear_cache(cls):
+        """清空方法和检查项目的缓存, 在运行时修改了处理器的方法或者检查项目后调用"""
+        EachVendorDeviceInfo._funcs_cache.clear()
+        EachVendorDeviceInfo._analysis_items_cache.clear()
+        EachVendorDeviceInfo._commands_cache.clear()
+
     def run_general_information(self, device: Device) -> BaseInfo:
         """配置通用基础信息"""
         base_info = self.base_info_class()
@@ -97,63 +116,89 @@ class EachVendorDeviceInfo(Singleton):
     def get_funcs(
         self, platform: vendor.DefaultVendor, type_name: str
     ) -> List[Callable[[Device, BaseInfo]]]:
-        """取设备厂商所有的方法"""
-        ret = []
-        for i in dir(self):
-            if re.match(f'do_{platform.PLATFORM}_{type_name}.*', i):
-                ret.append(getattr(self, i))
-        return ret
+        """取设备厂商所有的方法, 方法名称按照处理器类和厂商平台缓存"""
+        key = (type(self), platform.PLATFORM, type_name)
+        names = self._funcs_cache.get(key)
+        if names is None:
+            names = [
+                i
+                for i in dir(self)
+                if re.match(f'do_{platform.PLATFORM}_{type_name}.*', i)
+            ]
+            self._funcs_cache[key] = names
+        return [getattr(self, i) for i in names]
+
+    def get_commands(self, platform: vendor.DefaultVendor) -> Optional[Set[str]]:
+        """从厂商的基本信息方法的源码中找出用到的命令, 用于按需解析
+
+        只识别以字符串常量调用 ``command_accessors`` 中方法的命令,
+        取不到源码、命令不是常量或者直接读取了 ``device.cmds`` 时返回None,
+        表示需要解析所有命令
+        """
+        key = (type(self), platform.PLATFORM)
+        if key not in self._commands_cache:
+            commands: Optional[Set[str]] = set()
+            for func in self.get_funcs(platform, 'baseinfo'):
+                func_commands = _find_accessed_commands(func, self.command_accessors)
+                if func_commands is None:
+                    commands = None
+                    break
+                commands |= func_commands
+            self._commands_cache[key] = commands
+        return self._commands_cache[key]
+
+    def get_analysis_items(self) -> List[Tuple[str, str]]:
+        """取所有的检查项目, 包括重载追加的内容"""
+        items = self._analysis_items_cache.get(type(self))
+        if items is None:
+            items = self.analysis_items + self.append_analysis_items
+            self._analysis_items_cache[type(self)] = items
+        return items
 
     def do_huawei_vrp_baseinfo(self, device: Device, info: BaseInfo):
         """获取华为设备基本信息"""
 
         # Manager IP
         if not info.ip:
-            with device.search_cmd('display ip interface brief') as cmd:
-                for row in cmd.parse_result:
-                    if match_lower(row.get('interface'), 'loopback0'):
+            for row in device.parse_result('display ip interface brief'):
+                if match_lower(row.get('interface'), 'loopback0'):
+                    info.ip = row.get('ip')
+                    break  # 取到后可以立即返回
+
+                # 有些设备没有loopback0, 用 vlanif 代替
+                elif match_lower(row.get('interface'), 'vlanif'):
+                    if not info.ip:
                         info.ip = row.get('ip')
-                        break  # 取到后可以立即返回
-
-                    # 有些设备没有loopback0, 用 vlanif 代替
-                    elif match_lower(row.get('interface'), 'vlanif'):
-                        if not info.ip:
-                            info.ip = row.get('ip')
 
         # Model & Version & Uptime
-        with device.search_cmd('display version') as cmd:
-            for row in cmd.parse_result:
-                info.model = row.get('model')
-                info.version = row.get('vrp_version')
-                info.uptime = row.get('uptime')
+        for row in device.parse_result('display version'):
+            info.model = row.get('model')
+            info.version = row.get('vrp_version')
+            info.uptime = row.get('uptime')
 
         # 获取序列号
-        with device.search_cmd('display device manufacture-info') as cmd:
-            for row in cmd.parse_result:
-                info.sn.append((row.get('type'), row.get('serial')))
+        for row in device.parse_result('display device manufacture-info'):
+            info.sn.append((row.get('type'), row.get('serial')))
 
         # 如果没有获取到序列号，就从 display esn 和 display elabel brief里面找
         if not info.sn:
-            with device.search_cmd('display esn') as cmd:
-                if cmd.parse_result:
-                    sn = cmd.parse_result[0].get('esn')
-                    info.sn.append(('chassis', sn))
+            rows = device.parse_result('display esn')
+            if rows:
+                sn = rows[0].get('esn')
+                info.sn.append(('chassis', sn))
 
-            with device.search_cmd('display elabel brief') as cmd:
-                for row in cmd.parse_result:
-                    info.sn.append((row.get('slot'), row.get('bar_code')))
+            for row in device.parse_result('display elabel brief'):
+                info.sn.append((row.get('slot'), row.get('bar_code')))
 
         # CPU利用率
-        with device.search_cmd('display cpu-usage') as cmd:
-            if cmd.parse_result:
-                info.cpu_usage = cmd.parse_result[0].get('cpu_5_min') + '%'
+        rows = device.parse_result('display cpu-usage')
+        if rows:
+            info.cpu_usage = rows[0].get('cpu_5_min') + '%'
 
         # Memory 利用率
-        with device.search_cmd('display memory-usage') as cmd:
-            if cmd.parse_result:
-                info.memory_usage = (
-                    cmd.parse_result[0].get('memory_using_percent') + '%'
-                )
+        rows = device.parse_result('display memory-usage')
+        if rows:
+            info.memory_usage = rows[0].get('memory_using_percent') + '%'
 
         device.analysis_result
 
@@ -162,168 +207,154 @@ class EachVendorDeviceInfo(Singleton):
 
         # Manager IP
         if not info.ip:
-            with device.search_cmd('display ip interface brief') as cmd:
-                for row in cmd.parse_result:
-                    if match_lower(row.get('interface'), 'loop0|loopback0'):
+            for row in device.parse_result('display ip interface brief'):
+                if match_lower(row.get('interface'), 'loop0|loopback0'):
+                    info.ip = row.get('ip')
+                    break
+
+                # 有些设备没有loopback0, 用 vlanif 代替
+                elif match_lower(row.get('interface'), 'vlan'):
+                    if not info.ip:
                         info.ip = row.get('ip')
-                        break
-
-                    # 有些设备没有loopback0, 用 vlanif 代替
-                    elif match_lower(row.get('interface'), 'vlan'):
-                        if not info.ip:
-                            info.ip = row.get('ip')
 
         # Model & Version & Uptime
-        with device.search_cmd('display version') as cmd:
-            for row in cmd.parse_result:
-                info.model = row.get('model')
-                info.version = (
-                    row.get('software_version') + ' Release: ' + row.get('release')
-                )
-                info.uptime = row.get('uptime')
+        for row in device.parse_result('display version'):
+            info.model = row.get('model')
+            info.version = (
+                row.get('software_version') + ' Release: ' + row.get('release')
+            )
+            info.uptime = row.get('uptime')
 
         # SN
-        with device.search_cmd('display device manuinfo') as cmd:
-            for row in cmd.parse_result:
-                if row.get('device_serial_number').lower() == 'none':
-                    continue
-                info.sn.append(
-                    (row.get('device_name'), row.get('device_serial_number'))
-                )
+        for row in device.parse_result('display device manuinfo'):
+            if row.get('device_serial_number').lower() == 'none':
+                continue
+            info.sn.append(
+                (row.get('device_name'), row.get('device_serial_number'))
+            )
 
         # CPU利用率
-        with device.search_cmd('display cpu-usage') as cmd:
-            if cmd.parse_result:
-                info.cpu_usage = cmd.parse_result[0].get('cpu_5_min') + '%'
+        rows = device.parse_result('display cpu-usage')
+        if rows:
+            info.cpu_usage = rows[0].get('cpu_5_min') + '%'
 
         # Memory 利用率
-        with device.search_cmd('display memory') as cmd:
-            if cmd.parse_result:
-                row = cmd.parse_result[0]
-                if row.get('used_rate'):
-                    info.memory_usage = row.get('used_rate') + '%'
+        rows = device.parse_result('display memory')
+        if rows:
+            row = rows[0]
+            if row.get('used_rate'):
+                info.memory_usage = row.get('used_rate') + '%'
 
-                # 当是free rate 的情况，需要转换
-                elif row.get('free_rate'):
-                    info.memory_usage = f"{(100 - float(row.get('free_rate'))):.1f}%"
+            # 当是free rate 的情况，需要转换
+            elif row.get('free_rate'):
+                info.memory_usage = f"{(100 - float(row.get('free_rate'))):.1f}%"
 
     def do_maipu_mypower_baseinfo(self, device: Device, info: BaseInfo):
         """获取迈普设备基本信息"""
 
         # Manager IP
         if not info.ip:
-            with device.search_cmd('show ip interface brief') as cmd:
-                for row in cmd.parse_result:
-                    if match_lower(row.get('interface'), 'loopback0'):
-                        info.ip = row.get('ip')
-                        break
+            for row in device.parse_result('show ip interface brief'):
+                if match_lower(row.get('interface'), 'loopback0'):
+                    info.ip = row.get('ip')
+                    break
 
-                    elif match_lower(row.get('interface'), 'vlan'):
-                        if not info.ip:
-                            info.ip = row.get('ip')
+                elif match_lower(row.get('interface'), 'vlan'):
+                    if not info.ip:
+                        info.ip = row.get('ip')
 
         # Model & Version & Uptime
-        with device.search_cmd('show version') as cmd:
-            for row in cmd.parse_result:
-                info.model = row.get('model')
-                info.version = row.get('software_version')
-                info.uptime = row.get('uptime')
+        for row in device.parse_result('show version'):
+            info.model = row.get('model')
+            info.version = row.get('software_version')
+            info.uptime = row.get('uptime')
 
-        with device.search_cmd('show system module brief') as cmd:
-            for row in cmd.parse_result:
-                if row.get('name') != '/':
-                    info.sn.append((row.get('name'), row.get('sn')))
+        for row in device.parse_result('show system module brief'):
+            if row.get('name') != '/':
+                info.sn.append((row.get('name'), row.get('sn')))
 
         # CPU 利用率
-        with device.search_cmd('show cpu monitor') as cmd:
-            if cmd.parse_result:
-                info.cpu_usage = cmd.parse_result[0].get('cpu_5_min') + '%'
+        rows = device.parse_result('show cpu monitor')
+        if rows:
+            info.cpu_usage = rows[0].get('cpu_5_min') + '%'
 
         # Memory 利用率
-        with device.search_cmd('show memory') as cmd:
-            if cmd.parse_result:
-                info.memory_usage = cmd.parse_result[0].get('used_percent') + '%'
+        rows = device.parse_result('show memory')
+        if rows:
+            info.memory_usage = rows[0].get('used_percent') + '%'
 
     def do_ruijie_os_baseinfo(self, device: Device, info: BaseInfo):
         """获取锐捷设备基本信息"""
 
         # Manager IP
         if not info.ip:
-            with device.search_cmd('show ip interface brief') as cmd:
-                for row in cmd.parse_result:
-                    if match_lower(row.get('interface'), 'loopback 0'):
-                        info.ip = row.get('ip')
-                        break
+            for row in device.parse_result('show ip interface brief'):
+                if match_lower(row.get('interface'), 'loopback 0'):
+                    info.ip = row.get('ip')
+                    break
 
-                    elif match_lower(row.get('interface'), 'vlan'):
-                        if not info.ip:
-                            info.ip = row.get('ip')
+                elif match_lower(row.get('interface'), 'vlan'):
+                    if not info.ip:
+                        info.ip = row.get('ip')
 
         # Model & Version & Uptime
-        with device.search_cmd('show version') as cmd:
-            if cmd.parse_result:
-                temp = cmd.parse_result[0]
-                info.model = temp.get('model')
-                info.version = temp.get('soft_version')
-                info.uptime = temp.get('uptime')
-
-            # SN
-            for row in cmd.parse_result:
-                if row.get('serial_number'):
-                    info.sn.append((row.get('slot_name'), row.get('serial_number')))
+        rows = device.parse_result('show version')
+        if rows:
+            temp = rows[0]
+            info.model = temp.get('model')
+            info.version = temp.get('soft_version')
+            info.uptime = temp.get('uptime')
+
+        # SN
+        for row in rows:
+            if row.get('serial_number'):
+                info.sn.append((row.get('slot_name'), row.get('serial_number')))
 
         # CPU 利用率
-        with device.search_cmd('show cpu') as cmd:
-            if cmd.parse_result:
-                info.cpu_usage = cmd.parse_result[0].get('cpu_5_min') + '%'
+        rows = device.parse_result('show cpu')
+        if rows:
+            info.cpu_usage = rows[0].get('cpu_5_min') + '%'
 
         # Memory 利用率
-        with device.search_cmd('show memory') as cmd:
-            if cmd.parse_result:
-                info.memory_usage = (
-                    cmd.parse_result[0].get('system_memory_used_rate_precent') + '%'
-                )
+        rows = device.parse_result('show memory')
+        if rows:
+            info.memory_usage = rows[0].get('system_memory_used_rate_precent') + '%'
 
     def do_cisco_ios_baseinfo(self, device: Device, info: BaseInfo):
         """获取思科设备基本信息"""
 
         # Manager IP
         if not info.ip:
-            with device.search_cmd('show ip interface brief') as cmd:
-                for row in cmd.parse_result:
-                    if match_lower(row.get('intf'), 'loopback0'):
-                        info.ip = row.get('ipaddr')
-                        break
+            for row in device.parse_result('show ip interface brief'):
+                if match_lower(row.get('intf'), 'loopback0'):
+                    info.ip = row.get('ipaddr')
+                    break
 
-                    elif match_lower(row.get('intf'), 'vlan'):
-                        if not info.ip:
-                            info.ip = row.get('ipaddr')
+                elif match_lower(row.get('intf'), 'vlan'):
+                    if not info.ip:
+                        info.ip = row.get('ipaddr')
 
         # Model & Version & Uptime
-        with device.search_cmd('show version') as cmd:
-            for row in cmd.parse_result:
-                info.model = row.get('hardware')[0]
-                info.version = row.get('version')
-                info.uptime = row.get('uptime')
+        for row in device.parse_result('show version'):
+            info.model = row.get('hardware')[0]
+            info.version = row.get('version')
+            info.uptime = row.get('uptime')
 
         # SN
-        with device.search_cmd('show inventory') as cmd:
-            for row in cmd.parse_result:
-                info.sn.append((row.get('name'), row.get('sn')))
+        for row in device.parse_result('show inventory'):
+            info.sn.append((row.get('name'), row.get('sn')))
 
         # CPU 利用率
-        with device.search_cmd('show processes cpu') as cmd:
-            if cmd.parse_result:
-                info.cpu_usage = cmd.parse_result[0].get('cpu_5_min') + '%'
+        rows = device.parse_result('show processes cpu')
+        if rows:
+            info.cpu_usage = rows[0].get('cpu_5_min') + '%'
 
         # Memory 利用率
-        with device.search_cmd('show processes memory') as cmd:
-            if cmd.parse_result:
-                total = cmd.parse_result[0].get('memory_total')
-                used = cmd.parse_result[0].get('memory_used')
-                info.memory_usage = (
-                    str(round(float(used) / float(total) * 100, 1)) + '%'
-                )
+        rows = device.parse_result('show processes memory')
+        if rows:
+            total = rows[0].get('memory_total')
+            used = rows[0].get('memory_used')
+            info.memory_usage = str(round(float(used) / float(total) * 100, 1)) + '%'
 
         if not info.memory_usage:  # 有些设备没有show processes memory命令
             for row in device.parse_result('show processes memory sorted'):
@@ -343,7 +374,7 @@ class EachVendorDeviceInfo(Singleton):
         """
         info = device.info
 
-        for item in self.analysis_items + self.append_analysis_items:
+        for item in self.get_analysis_items():
             ar = device.analysis_result.get(item[0])
             if not ar._result:  # 如果没有检查结果，则不更新
                 continue
@@ -353,6 +384,58 @@ class EachVendorDeviceInfo(Singleton):
                 setattr(info.analysis, item[1], False)
 
 
+def _find_accessed_commands(func: Callable, accessors: Tuple[str, ...]) -> Optional[Set[str]]:
+    """找出函数中以字符串常量调用 ``accessors`` 中方法的第一个参数
+
+    直接读取 ``cmds`` , 不是以调用的方式使用 ``accessors`` 中的方法,
+    或者命令不是字符串常量时, 都无法确定用到的命令
+
+    Returns:
+        命令集合, 无法确定时返回None
+    """
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+
+    func_def = tree.body[0]
+    if not isinstance(func_def, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return None
+    params = [arg.arg for arg in func_def.args.args]
+    device_name = params[-2] if len(params) >= 2 else None  # (device, info)
+
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    commands = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and (
+            node.attr in ('cmds', '_cmds')
+            or (node.attr in accessors and id(node) not in called)
+        ):
+            return None  # 直接读取命令字典或者没有直接调用查找命令的方法
+
+        if isinstance(node, ast.Call) and device_name and any(
+            isinstance(arg, ast.Name) and arg.id == device_name
+            for arg in node.args + [keyword.value for keyword in node.keywords]
+        ):
+            return None  # 设备传给了其他函数, 无法确定用到的命令
+
+        if not (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in accessors
+        ):
+            continue
+
+        if not node.args:
+            return None
+        arg = node.args[0]
+        if not (isinstance(arg, ast.Constant) and isinstance(arg.value, str)):
+            return None  # 命令不是常量, 无法确定
+        commands.add(arg.value)
+
+    return commands
+
+
 def get_base_info(device: Device, device_info_handler=EachVendorDeviceInfo) -> BaseInfo:
     """获取设备基本信息"""
     info = (
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .logger import logger
+
+
+class ParseResultCache:
+    """命令解析结果的磁盘缓存
+
+    缓存的键由 平台、命令、命令回显以及模板签名 计算得到，
+    模板签名由解析插件提供，模板文件发生变化后签名改变，缓存自动失效。
+    缓存以json文件的形式存放在缓存目录中，可以跨进程、跨运行使用。
+    """
+
+    version = 1  # 缓存格式版本, 格式变化时修改
+
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir: 缓存目录，不存在时会自动创建
+        """
+        self.cache_dir = str(cache_dir)
+        self.hits = 0  # 命中次数
+        self.misses = 0  # 未命中次数
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, platform: str, command: str, content: str, signature: str) -> str:
+        """计算缓存的键
+
+        Args:
+            platform: 厂商平台
+            command: 命令
+            content: 命令回显
+            signature: 解析插件提供的模板签名
+
+        Returns:
+            str: 缓存的键
+        """
+        command = ' '.join(command.lower().split())
+        sha = hashlib.sha256()
+        for item in (str(self.version), platform, command, signature, content):
+            sha.update(item.encode('utf-8', errors='surrogatepass'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """读取缓存
+
+        Args:
+            key: 缓存的键
+
+        Returns:
+            解析结果, 没有缓存时返回None
+        """
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:  # 缓存文件损坏时当作没有缓存
+            logger.debug(f'parse cache {key!r} 读取失败: {e}')
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return result
+
+    def set(self, key: str, result: List[Dict[str, str]]):
+        """写入缓存, 先写入临时文件再替换, 避免多进程同时写入时读到不完整的文件
+
+        Args:
+            key: 缓存的键
+            result: 解析结果
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, default=dict)
+            os.replace(temp_path, path)
+        except OSError as e:  # pragma: no cover
+            logger.debug(f'parse cache {key!r} 写入失败: {e}')
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def info(self) -> Dict[str, int]:
+        """返回缓存的统计信息"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class ContentSpill:
+    """将命令回显写入一个临时文件, 需要时再按位置读取, 用于降低内存占用
+
+    临时文件在对象被回收或者调用 ``close`` 后自动删除。
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None):
+        """
+        Args:
+            spill_dir: 临时文件所在的目录, 为空时使用系统默认的临时目录
+        """
+        self._file = tempfile.TemporaryFile(dir=spill_dir)
+        self._size = 0  # 已经写入的字节数
+        self._lock = threading.Lock()
+
+    def write(self, content: str) -> Tuple[int, int]:
+        """写入命令回显
+
+        Args:
+            content: 命令回显
+
+        Returns:
+            (偏移量, 长度)
+        """
+        data = content.encode('utf-8', errors='surrogatepass')
+        with self._lock:
+            offset = self._size
+            self._file.seek(offset)
+            self._file.write(data)
+            self._size += len(data)
+        return offset, len(data)
+
+    def read(self, offset: int, length: int) -> str:
+        """读取命令回显
+
+        Args:
+            offset: 偏移量
+            length: 长度
+
+        Returns:
+            str: 命令回显
+        """
+        with self._lock:
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return data.decode('utf-8', errors='surrogatepass')
+
+    def close(self):
+        """关闭并删除临时文件"""
+        self._file.close()
+
+
+class InspectionManifest:
+    """增量巡检的清单, 记录每个输入文件的指纹以及上一次巡检的结果
+
+    清单目录中的 ``manifest.json`` 记录每个文件的 路径、大小、修改时间和内容hash,
+    以及插件和模板的签名; 每个文件的巡检结果使用pickle保存在 ``results`` 目录中。
+    文件没有变化且签名相同时直接使用之前的结果, 签名改变时之前的结果全部失效。
+    """
+
+    version = 2  # 清单格式版本, 格式变化时修改
+    file_name = 'manifest.json'
+
+    def __init__(self, manifest_dir: str):
+        """
+        Args:
+            manifest_dir: 清单目录，不存在时会自动创建
+        """
+        self.manifest_dir = str(manifest_dir)
+        self.signature = ''  # 插件和模板的签名
+        self._files: Dict[str, Dict[str, Any]] = {}  # 上一次运行的文件记录
+        self._current: Dict[str, Dict[str, Any]] = {}  # 本次运行的文件记录
+        self.reused = 0  # 没有变化的文件数
+        self.changed = 0  # 新增或者变化的文件数
+        os.makedirs(os.path.join(self.manifest_dir, 'results'), exist_ok=True)
+        self._load()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.manifest_dir, self.file_name)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:  # 清单损坏时当作第一次运行
+            logger.debug(f'manifest {self.path!r} 读取失败: {e}')
+            return
+
+        if data.get('version') == self.version:
+            self.signature = data.get('signature', '')
+            self._files = data.get('files', {})
+
+    def set_signature(self, signature: str):
+        """设置本次运行的插件和模板签名, 与上一次不同时之前的结果全部失效
+
+        Args:
+            signature: 签名, 为空时表示无法确定, 所有文件都重新处理
+        """
+        if signature != self.signature or not signature:
+            if self._files:
+                logger.info('插件或模板发生变化, 重新处理所有文件')
+            self._files = {}
+        self.signature = signature
+
+    def lookup(self, file_path: str) -> Tuple[bool, Any]:
+        """检查文件在上一次运行之后是否发生变化
+
+        文件大小和修改时间都相同时认为没有变化, 只有修改时间不同时再比较内容的hash。
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            (文件是否没有变化, 上一次的巡检结果), 文件没有产生结果时为None
+        """
+        key = os.path.abspath(file_path)
+        entry = self._files.get(key)
+        if entry is None:
+            self.changed += 1
+            return False, None
+
+        try:
+            stat = os.stat(file_path)
+            if stat.st_size != entry['size'] or (
+                stat.st_mtime_ns != entry['mtime']
+                and _file_hash(file_path) != entry['hash']
+            ):
+                self.changed += 1
+                return False, None
+
+            result = None
+            if entry['result']:
+                with open(self._result_path(entry['result']), 'rb') as f:
+                    result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            logger.debug(f'manifest {file_path!r} 读取之前的结果失败: {e}')
+            self.changed += 1
+            return False, None
+
+        self.reused += 1
+        self._current[key] = dict(entry, mtime=stat.st_mtime_ns)
+        return True, result
+
+    def record(self, file_path: str, result: Any = None):
+        """记录本次处理的文件和巡检结果
+
+        Args:
+            file_path: 文件路径
+            result: 巡检结果, 需要可以pickle, 为None时表示文件没有产生结果
+        """
+        key = os.path.abspath(file_path)
+        try:
+            stat = os.stat(file_path)
+            entry = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'hash': _file_hash(file_path),
+                'result': '',
+            }
+            if result is not None:
+                entry['result'] = hashlib.sha256(key.encode('utf-8')).hexdigest()
+                _atomic_write(
+                    self._result_path(entry['result']),
+                    pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+                )
+        except OSError as e:  # pragma: no cover
+            logger.debug(f'manifest {file_path!r} 记录失败: {e}')
+            return
+
+        self._current[key] = entry
+
+    def save(self):
+        """写入清单, 本次运行中没有出现的文件的记录和结果会被删除"""
+        used = {entry['result'] for entry in self._current.values()}
+        for entry in self._files.values():
+            if entry['result'] and entry['result'] not in used:
+                try:
+                    os.remove(self._result_path(entry['result']))
+                except OSError:
+                    pass
+
+        data = {'version': self.version, 'signature': self.signature, 'files': self._current}
+        try:
+            _atomic_write(self.path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        except OSError as e:  # pragma: no cover
+            logger.debug(f'manifest {self.path!r} 写入失败: {e}')
+
+        self._files, self._current = self._current, {}
+
+    def info(self) -> Dict[str, int]:
+        """返回清单的统计信息"""
+        return {'reused': self.reused, 'changed': self.changed}
+
+    def _result_path(self, name: str) -> str:
+        return os.path.join(self.manifest_dir, 'results', name + '.pickle')
+
+
+def _file_hash(file_path: str) -> str:
+    """计算文件内容的hash"""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _atomic_write(path: str, data: bytes):
+    """先写入临时文件再替换, 避免中途出错时留下不完整的文件"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -67,10 +67,10 @@ def print_plugin_list(all_plugins: Dict[str, Dict[str, Type[PluginAbstract]]]):
 def print_analysis_list():
     """打印每个分析模块支持的厂商"""
     analysis_vendor_dict = {}
-    for info in analysis.store:
-        if info.plugin_name not in analysis_vendor_dict:
-            analysis_vendor_dict[info.plugin_name] = []
-        analysis_vendor_dict[info.plugin_name].append(info.vendor_platform)
+    for plugin_name, vendor_platform in analysis.index:
+        if plugin_name not in analysis_vendor_dict:
+            analysis_vendor_dict[plugin_name] = []
+        analysis_vendor_dict[plugin_name].append(vendor_platform)
 
     # 对厂商进行排序
     rows = []
@@ -101,6 +101,29 @@ def print_base_info_list():
     print()
 
 
+def print_metrics(metrics: Dict[str, Dict[str, Dict[str, float]]], top: int = 10):
+    """打印耗时统计, 除cluster外每个分类只显示耗时最长的前几项"""
+    for category, items in metrics.items():
+        rows = sorted(items.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        if category != 'cluster':
+            rows = rows[:top]
+
+        print_table(
+            f'耗时统计: {category}',
+            ['名称', '次数', '总耗时(s)', '平均耗时(ms)'],
+            [
+                [
+                    name,
+                    str(item['count']),
+                    f"{item['seconds']:.3f}",
+                    f"{item['seconds'] / item['count'] * 1000:.3f}",
+                ]
+                for name, item in rows
+            ],
+        )
+        print()
+
+
 def print_ntc_template_value(clitable: CliTable, template_name: str):
     """打印ntc_templates中的模板VALUE"""
 
@@ -140,6 +163,28 @@ def main(
     base_info_list: bool = typer.Option(
         False, '--base-info-list', '-b', help='显示基础信息属性列表'
     ),
+    jobs: int = typer.Option(1, '--jobs', '-j', help='并行解析的进程数, 0为使用全部CPU核心'),
+    input_concurrency: int = typer.Option(
+        1, '--input-concurrency', help='同时读取的文件数, 适用于读取较慢的网络存储'
+    ),
+    analysis_jobs: int = typer.Option(
+        1, '--analysis-jobs', help='并行分析的设备数, 0为使用全部CPU核心'
+    ),
+    analysis_executor: str = typer.Option(
+        'thread', '--analysis-executor', help='并行分析的方式: thread 或者 process'
+    ),
+    cache_dir: str = typer.Option('', '--cache-dir', help='解析结果的缓存目录'),
+    incremental: str = typer.Option(
+        '', '--incremental', help='增量巡检的清单目录, 只处理新增或者变化的文件'
+    ),
+    snapshot: str = typer.Option(
+        '', '--snapshot', help='加载集群快照并直接输出, 不再执行输入、解析和分析'
+    ),
+    save_snapshot: str = typer.Option('', '--save-snapshot', help='分析完成后保存集群快照'),
+    demand_parse: bool = typer.Option(
+        False, '--demand-parse', help='只解析基础信息和分析插件用到的命令'
+    ),
+    profile: bool = typer.Option(False, '--profile', help='运行结束后显示耗时统计'),
 ):
     net = NetInspect()
     net.set_plugins(input_plugin=input_plugin, output_plugin=output_plugin)
@@ -163,8 +208,34 @@ def main(
         print_base_info_list()
         exit()
 
+    if cache_dir:
+        net.enable_parse_cache(cache_dir)
+
+    if demand_parse:
+        net.enable_demand_parse()
+
+    if incremental:
+        net.enable_incremental(incremental)
+
+    if snapshot:
+        net.load_snapshot(snapshot)
+        net.run_output(output_path)
+        exit()
+
     if input_path:
-        net.run(input_path=input_path, output_file_path=output_path)
+        net.run(
+            input_path=input_path,
+            output_file_path=output_path,
+            workers=jobs,
+            input_concurrency=input_concurrency,
+            analysis_workers=analysis_jobs,
+            analysis_executor=analysis_executor,
+        )
+        if save_snapshot:
+            net.save_snapshot(save_snapshot)
+        if profile:
+            print()
+            print_metrics(net.get_metrics())
         exit()
 
 
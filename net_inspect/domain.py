@@ -1,17 +1,47 @@
 from __future__ import annotations
 
 import abc
+import functools
+import hashlib
+import multiprocessing
+import os
+import pickle
 import re
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Iterator, List, Optional, Tuple, Type
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
 
 from . import exception
 from .base_info import BaseInfo, EachVendorDeviceInfo
+from .cache import ContentSpill, InspectionManifest, ParseResultCache
 from .data import pystr
-from .func import NoneSkip, StoreFunc, pascal_case_to_snake_case, CaseInsensitiveDict
-from .logger import logger
+from .func import (
+    NoneSkip,
+    StoreFunc,
+    code_fingerprint,
+    pascal_case_to_snake_case,
+    to_rows,
+)
+from .logger import capture_records, logger, replay_records
+from .metrics import ANALYSIS_PLUGIN, CLUSTER, PLATFORM, STAGE, metrics
 from .vendor import DefaultVendor
 
+ANALYSIS_EXECUTORS = ('thread', 'process')  # 并行分析支持的方式
+SNAPSHOT_VERSION = 1  # 集群快照的格式版本, 格式变化时修改
+
 
 class Cluster:
     """作为设备的集合"""
@@ -23,18 +53,238 @@ class Cluster:
         self.devices: DeviceList[Device] = DeviceList()
         self.base_info_handler = EachVendorDeviceInfo()
 
-    def parse(self):
-        """递归对每个设备的命令进行解析"""
+        self.release_content = False  # 解析完成后是否释放命令回显
+        self.content_spill: Optional[ContentSpill] = None  # 释放的回显写入的临时文件
+        self.demand_parse = False  # 是否只解析基础信息和分析插件用到的命令
+        self.manifest: Optional[InspectionManifest] = None  # 增量巡检的清单
+
+    def enable_incremental(self, manifest_dir: str):
+        """开启增量巡检, 只处理新增或者发生变化的输入文件
+
+        没有变化的文件不再读取、解析和分析, 直接使用清单中保存的基础信息和分析结果,
+        这些设备的 ``restored`` 为True, 并且没有命令回显和解析结果。
+        分析完成后更新清单, 插件、模板或者分析函数发生变化时所有文件都会重新处理。
+
+        Args:
+            manifest_dir: 清单目录, 建议与输出文件放在一起
+        """
+        self.manifest = InspectionManifest(manifest_dir)
+
+    def enable_demand_parse(self):
+        """开启按需解析, 只解析基础信息和分析插件用到的命令
+
+        其他命令保持原始回显, 在第一次访问解析结果时才解析。
+        无法确定用到的命令时(如自定义的分析插件重写了 ``run``), 仍然解析所有命令。
+        """
+        self.demand_parse = True
+
+    def enable_release_content(self, spill: bool = True, spill_dir: str = ''):
+        """开启节省内存的模式, 设备解析完成后释放命令回显
+
+        开启后每台设备需要解析的命令都会立即解析, 之后命令回显写入临时文件(``spill=True``)
+        并在访问 ``Cmd.content`` 时重新读取, 或者直接丢弃(``spill=False``)。
+
+        Args:
+            spill: 是否将回显写入临时文件, 以便之后需要时读取
+            spill_dir: 临时文件所在目录, 为空时使用系统默认的临时目录
+        """
+        self.release_content = True
+        self.content_spill = ContentSpill(spill_dir or None) if spill else None
+
+    def parse(self, workers: int = 1):
+        """递归对每个设备的命令进行解析
+
+        Args:
+            workers: 并行解析的进程数, 默认为1即在当前进程中串行解析, 小于1时使用CPU核心数
+        """
         logger.info('start parse')
-        self.devices.parse(base_info_handler=self.base_info_handler)
+        with metrics.timer(CLUSTER, 'parse'):
+            devices = self._pending_devices()
+            if not self.release_content:
+                devices.parse(
+                    base_info_handler=self.base_info_handler,
+                    workers=workers,
+                    demand=self.demand_parse,
+                )
+            else:  # 每台设备解析完成后立即释放回显, 不需要等待所有设备解析完成
+                for device in DeviceList.iter_parse(
+                    devices,
+                    self.base_info_handler,
+                    workers=workers if len(devices) > 1 else 1,
+                    demand=self.demand_parse,
+                ):
+                    device.release_content(self.content_spill)
         logger.info('parse finished')
 
-    def analysis(self):
-        """递归对每个设备进行分析"""
+    def analysis(self, workers: int = 1, executor: str = 'thread'):
+        """递归对每个设备进行分析
+
+        Args:
+            workers: 并行分析的设备数, 默认为1即串行分析, 小于1时使用CPU核心数
+            executor: 并行分析的方式, ``thread`` 使用线程池, ``process`` 使用进程池
+        """
         logger.info('start analysis')
-        self.devices.analysis(base_info_handler=self.base_info_handler)
+        with metrics.timer(CLUSTER, 'analysis'):
+            self._pending_devices().analysis(
+                base_info_handler=self.base_info_handler,
+                workers=workers,
+                executor=executor,
+            )
+            if self.manifest is not None:
+                self._save_manifest()
         logger.info('analysis finished')
 
+    def _pending_devices(self) -> DeviceList:
+        """需要解析和分析的设备, 不包括从增量巡检清单中恢复的设备"""
+        if self.manifest is None:
+            return self.devices
+
+        devices = DeviceList()
+        for device in self.devices:
+            if not device.restored:
+                devices.append(device)
+        return devices
+
+    def _save_manifest(self):
+        """将本次处理的设备结果写入增量巡检清单"""
+        for device in self.devices:
+            if not device.restored and device._device_info.file_path:
+                self.manifest.record(
+                    device._device_info.file_path, device.snapshot(commands=False)
+                )
+        self.manifest.save()
+        logger.info(f'incremental manifest: {self.manifest.info()}')
+
+    def _incremental_signature(self) -> str:
+        """插件、模板、基础信息处理器和分析函数的签名, 任意一项变化时之前的结果失效
+
+        插件、处理器和分析函数除了名称之外还包含代码指纹, 修改了所在模块的源文件后同样失效,
+        取不到源文件时无法确定代码是否变化, 返回空字符串。
+        """
+        from . import __version__
+        from .analysis_plugin import analysis
+
+        templates = self.plugin_manager.parse_plugin.templates_signature()
+        if not templates:
+            return ''
+
+        items = [
+            __version__,
+            type(self.plugin_manager.input_plugin).__name__,
+            code_fingerprint(type(self.plugin_manager.input_plugin)),
+            type(self.plugin_manager.parse_plugin).__name__,
+            code_fingerprint(type(self.plugin_manager.parse_plugin)),
+            templates,
+            f'{type(self.base_info_handler).__module__}.{type(self.base_info_handler).__qualname__}',
+            code_fingerprint(type(self.base_info_handler)),
+        ]
+        for plugin in sorted(
+            self.plugin_manager.analysis_plugin, key=lambda plugin: type(plugin).__name__
+        ):
+            items += [type(plugin).__name__, code_fingerprint(type(plugin))]
+        for (plugin_name, platform), infos in analysis._dispatch.items():
+            for info in infos:
+                function = info.function
+                items += [
+                    f'{plugin_name}:{platform}:{function.__module__}.{function.__qualname__}'
+                    f':{info.template_keys_list!r}:{info.base_info_keys_list!r}',
+                    code_fingerprint(function),
+                ]
+
+        if not all(items):  # 有的代码取不到源文件
+            return ''
+
+        sha = hashlib.sha256()
+        for item in items:
+            sha.update(item.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def _input_incremental(self, files: Iterable[str], concurrency: int = 1):
+        """增量巡检时的输入, 没有变化的文件直接恢复设备, 其余文件使用输入插件读取
+
+        设备按照文件的顺序保存到self.devices中, 与完整巡检的顺序一致。
+        """
+        self.manifest.set_signature(self._incremental_signature())
+
+        files = list(files)
+        restored: Dict[str, Optional[Device]] = {}
+        changed = []
+        for file_path in files:
+            unchanged, result = self.manifest.lookup(file_path)
+            if unchanged:
+                restored[file_path] = self._restore_device(result) if result else None
+            else:
+                changed.append(file_path)
+        logger.info(
+            f'incremental input: {len(restored)} unchanged, {len(changed)} new or changed'
+        )
+
+        created: Dict[str, Device] = {}
+        for input_plugin_result in self.plugin_manager.iter_input(
+            changed, concurrency=concurrency
+        ):
+            device = self.create_device(input_plugin_result)
+            if device is not None:
+                created[device._device_info.file_path] = device
+
+        for file_path in files:
+            if file_path in restored:
+                device = restored[file_path]
+            else:
+                device = created.get(file_path)
+                if device is None:  # 没有产生设备的文件也记录下来, 下次同样跳过
+                    self.manifest.record(file_path)
+
+            if device is not None:
+                self.devices.append(device)
+
+    def _restore_device(self, result: Tuple) -> Device:
+        """通过增量巡检清单中保存的结果恢复设备"""
+        device = Device.from_snapshot(result, self.plugin_manager)
+        device.restored = True
+        return device
+
+    def save_snapshot(self, file_path: str, include_content: bool = False):
+        """将所有设备的设备信息、解析结果、基础信息和分析结果保存为二进制快照
+
+        同一个表格的所有行共享表头, 快照中每个表头只保存一次。
+
+        Args:
+            file_path: 快照文件路径
+            include_content: 是否保存命令回显, 默认不保存
+        """
+        logger.info(f'save snapshot: {file_path!r}')
+        with metrics.timer(CLUSTER, 'snapshot'):
+            data = {
+                'version': SNAPSHOT_VERSION,
+                'devices': [device.snapshot(content=include_content) for device in self.devices],
+            }
+            with open(file_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_snapshot(self, file_path: str):
+        """加载 ``save_snapshot`` 保存的快照, 设备保存到self.devices中
+
+        快照使用pickle格式, 只能加载可信的快照文件。
+
+        Args:
+            file_path: 快照文件路径
+        """
+        logger.info(f'load snapshot: {file_path!r}')
+        with metrics.timer(CLUSTER, 'snapshot'):
+            try:
+                with open(file_path, 'rb') as f:
+                    data = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+                raise exception.SnapshotError(file_path, str(e)) from e
+
+            if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION:
+                raise exception.SnapshotError(file_path, '快照版本不匹配')
+
+            for snapshot in data['devices']:
+                self.devices.append(Device.from_snapshot(snapshot, self.plugin_manager))
+
     @property
     def plugin_manger(self) -> PluginManagerAbc:
         return self._plugin_manager
@@ -54,19 +304,93 @@ class Cluster:
         """
         return self.devices.search(device_name)
 
-    def input_dir(self, dir_path: str, expend: str | List[str] = None):
+    def input_dir(
+        self, dir_path: str, expend: str | List[str] = None, concurrency: int = 1
+    ):
         """输入整个目录，对目录中的文件进行提取设备和命令, 并保存到self.devices中
 
         Args:
             dir_path: 目录路径
             expend: 文件扩展名
+            concurrency: 同时读取的文件数, 大于1时在线程池中并发读取
         """
 
         logger.info(f'input dir: {dir_path!r}')
-        devices_list = self.plugin_manager.input_dir(dir_path, expend)
+        with metrics.timer(CLUSTER, 'input'):
+            if self.manifest is not None:
+                self._input_incremental(
+                    self.plugin_manager.iter_dir_files(dir_path, expend), concurrency
+                )
+                return
+
+            devices_list = self.plugin_manager.input_dir(
+                dir_path, expend, concurrency=concurrency
+            )
+
+            for cmd_contents_and_device_info in devices_list:
+                self.save_device_with_cmds(
+                    cmd_contents_and_device_info, check_vendor=False
+                )
+
+            # 所有设备读取完成后再统一识别厂商, 相同厂商类的设备共用一个识别器
+            logger.info(f'vendors: {self.devices.check_vendor()}')
+
+    def iter_input_dir(
+        self, dir_path: str, expend: str | List[str] = None, concurrency: int = 1
+    ) -> Iterator[Device]:
+        """逐个读取目录中的文件并产出设备, 设备 **不会** 保存到self.devices中
+
+        Args:
+            dir_path: 目录路径
+            expend: 文件扩展名
+            concurrency: 同时读取的文件数, 大于1时在线程池中并发读取
 
-        for cmd_contents_and_device_info in devices_list:
-            self.save_device_with_cmds(cmd_contents_and_device_info)
+        Yields:
+            Device: 设备
+        """
+        logger.info(f'input dir: {dir_path!r}')
+        for input_plugin_result in self.plugin_manager.iter_input_dir(
+            dir_path, expend, concurrency=concurrency
+        ):
+            device = self.create_device(input_plugin_result)
+            if device is not None:
+                yield device
+
+    def iter_devices(
+        self,
+        dir_path: str,
+        expend: str | List[str] = None,
+        workers: int = 1,
+        max_in_flight: int = 0,
+        concurrency: int = 1,
+    ) -> Iterator[Device]:
+        """以流水线的方式处理目录, 每台设备依次完成输入、解析和分析后产出,
+        设备 **不会** 保存到self.devices中, 内存占用与目录中的文件数量无关
+
+        Args:
+            dir_path: 目录路径
+            expend: 文件扩展名
+            workers: 并行解析的进程数, 默认为1即串行解析, 小于1时使用CPU核心数
+            max_in_flight: 并行解析时最多同时处理的设备数, 为0时使用 ``workers * 4``
+            concurrency: 同时读取的文件数, 大于1时在线程池中并发读取
+
+        Yields:
+            Device: 分析完成的设备
+        """
+        devices = DeviceList.iter_parse(
+            self.iter_input_dir(dir_path, expend, concurrency=concurrency),
+            self.base_info_handler,
+            workers=workers,
+            max_in_flight=max_in_flight,
+            demand=self.demand_parse,
+        )
+        for device in devices:
+            if self.release_content:
+                device.release_content(self.content_spill)
+            device.analysis()
+            with metrics.timer(STAGE, 'base_info'):
+                self.base_info_handler.run_analysis_info(device)
+            yield device
 
     def input(self, file_path: str):
         """输入文件，对文件中的设备和命令进行提取，并保存到self.devices中
@@ -76,28 +400,53 @@ class Cluster:
         """
 
         logger.info(f'input file: {file_path!r}')
+        if self.manifest is not None:
+            with metrics.timer(CLUSTER, 'input'):
+                self._input_incremental([str(file_path)])
+            return
+
         try:
-            input_plugin_result = self.plugin_manager.input(file_path)
-            self.save_device_with_cmds(input_plugin_result)
+            with metrics.timer(CLUSTER, 'input'):
+                input_plugin_result = self.plugin_manager.input(file_path)
+                self.save_device_with_cmds(input_plugin_result)
         except exception.InputFileTypeError:  # pragma: no cover
             logger.info('文件不符合input_plugin标准，跳过: {}'.format(file_path))
 
-    def save_device_with_cmds(self, input_plugin_result: InputPluginResult):
+    def save_device_with_cmds(
+        self, input_plugin_result: InputPluginResult, check_vendor: bool = True
+    ):
         """将设备和命令保存到self.devices中
 
         Args:
             cmd_contents_and_deviceinfo: 命令内容和设备信息
+            check_vendor: 是否立即识别厂商, 为False时需要之后调用 ``DeviceList.check_vendor``
         """
 
+        device_cls = self.create_device(input_plugin_result, check_vendor)
+        if device_cls is not None:
+            self.devices.append(device_cls)
+
+    def create_device(
+        self, input_plugin_result: InputPluginResult, check_vendor: bool = True
+    ) -> Optional[Device]:
+        """通过输入插件的结果创建设备
+
+        Args:
+            input_plugin_result: 输入插件的结果
+            check_vendor: 是否立即识别厂商
+
+        Returns:
+            Device | None: 设备, 没有设备名时返回None
+        """
         if not input_plugin_result.hostname:  # 如果没有设备名，直接跳过
-            return
+            return None
 
         device_cls = Device()
         device_cls.vendor = input_plugin_result.vendor
         device_cls._plugin_manager = self.plugin_manager
-        device_cls.save_to_cmds(input_plugin_result.cmd_dict)  # 保存命令信息
+        device_cls.save_to_cmds(input_plugin_result.cmd_dict, check_vendor)  # 保存命令信息
         device_cls._device_info = input_plugin_result._device_info  # 保存设备简单信息
-        self.devices.append(device_cls)
+        return device_cls
 
     def output(self, file_path: str = '', params: Dict[str, str] = {}):
         """输出到文件
@@ -106,7 +455,8 @@ class Cluster:
             file_path: 文件路径
             params: 传入output_plugin的参数
         """
-        self.plugin_manager._output_plugin.run(self.devices, file_path, params)
+        with metrics.timer(CLUSTER, 'output'):
+            self.plugin_manager._output_plugin.run(self.devices, file_path, params)
 
     def add_device_with_raw_data(
         self, hostname: str, ip: str, cmd_contents: Dict[str, str]
@@ -159,29 +509,290 @@ class DeviceList(list):
         """
         self._devices.append(device)
 
-    def parse(self, base_info_handler: EachVendorDeviceInfo):
-        """递归对每个设备的命令进行解析"""
+    def check_vendor(self) -> Dict[str, int]:
+        """重新识别所有设备的厂商, 相同厂商类的设备共用一个识别器
+
+        Returns:
+            Dict[str, int]: 每个厂商平台的设备数量
+        """
+        counts: Dict[str, int] = {}
+        detectors = {}
         for device in self._devices:
+            vendor = device.vendor
+            if vendor not in detectors:
+                detectors[vendor] = vendor.get_detector()
+            device._vendor = detectors[vendor].detect(device.cmds) or vendor
+            counts[device.vendor.PLATFORM] = counts.get(device.vendor.PLATFORM, 0) + 1
 
-            # 当没有设备厂商时，只配置通用信息
-            if device.vendor == DefaultVendor:
-                logger.debug(
-                    f'{pystr.parse_plugin_prefix} device:{device._device_info.name!r} 没有匹配到厂商, 跳过.'
-                )
-                device.info = base_info_handler.run_general_information(device)
-                continue
+        return counts
 
-            device.parse()
-            # 将分析到的基础信息放到Device.info中
-            device.info = base_info_handler.run_baseinfo_func(device)
+    def parse(
+        self,
+        base_info_handler: EachVendorDeviceInfo,
+        workers: int = 1,
+        demand: bool = False,
+    ):
+        """递归对每个设备的命令进行解析
 
-    def analysis(self, base_info_handler: EachVendorDeviceInfo):
-        """递归对每个设备进行分析, 必须在parse之后执行"""
-        for device in self._devices:
-            device.analysis()
-            # 将分析到的状态信息放到Device.info.analysis中
+        Args:
+            base_info_handler: 设备基础信息处理器
+            workers: 并行解析的进程数, 默认为1即在当前进程中串行解析, 小于1时使用CPU核心数
+            demand: 是否按需解析, 只解析基础信息和分析插件用到的命令
+        """
+        if len(self._devices) <= 1:
+            workers = 1
+
+        for _ in self.iter_parse(
+            self._devices, base_info_handler, workers=workers, demand=demand
+        ):
+            pass
+
+    @classmethod
+    def iter_parse(
+        cls,
+        devices: Iterable[Device],
+        base_info_handler: EachVendorDeviceInfo,
+        workers: int = 1,
+        max_in_flight: int = 0,
+        demand: bool = False,
+    ) -> Iterator[Device]:
+        """逐个解析设备, 按照输入的顺序产出解析完成的设备
+
+        Args:
+            devices: 设备的可迭代对象, 可以是生成器
+            base_info_handler: 设备基础信息处理器
+            workers: 并行解析的进程数, 默认为1即在当前进程中串行解析, 小于1时使用CPU核心数
+            max_in_flight: 并行解析时最多同时处理的设备数, 为0时使用 ``workers * 4``
+            demand: 是否按需解析, 只解析基础信息和分析插件用到的命令,
+                其他命令在第一次访问解析结果时才解析
+
+        Yields:
+            Device: 解析完成的设备
+        """
+        if workers < 1:
+            workers = os.cpu_count() or 1
+
+        # 每个厂商需要解析的命令, 不按需解析时为None
+        required = _RequiredCommands(base_info_handler) if demand else None
+
+        if workers == 1:
+            for device in devices:
+                # 当没有设备厂商时，只配置通用信息
+                if not cls._skip_default_vendor(device, base_info_handler):
+                    device.parse(required.get(device) if required else None)
+                    # 将分析到的基础信息放到Device.info中
+                    with metrics.timer(STAGE, 'base_info'):
+                        device.info = base_info_handler.run_baseinfo_func(device)
+                yield device
+            return
+
+        yield from cls._iter_parallel_parse(
+            devices, base_info_handler, workers, max_in_flight or workers * 4, required
+        )
+
+    @staticmethod
+    def _skip_default_vendor(
+        device: Device, base_info_handler: EachVendorDeviceInfo
+    ) -> bool:
+        """当没有设备厂商时，只配置通用信息, 并返回True表示跳过解析"""
+        if device.vendor != DefaultVendor:
+            return False
+
+        logger.debug(
+            f'{pystr.parse_plugin_prefix} device:{device._device_info.name!r} 没有匹配到厂商, 跳过.'
+        )
+        with metrics.timer(STAGE, 'base_info'):
+            device.info = base_info_handler.run_general_information(device)
+        return True
+
+    @classmethod
+    def _iter_parallel_parse(
+        cls,
+        devices: Iterable[Device],
+        base_info_handler: EachVendorDeviceInfo,
+        workers: int,
+        max_in_flight: int,
+        required: Optional[_RequiredCommands] = None,
+    ) -> Iterator[Device]:
+        """使用进程池并行解析设备
+
+        每个设备的命令回显会被发送到子进程中解析, 子进程返回所有命令的解析结果、
+        ``BaseInfo`` 以及解析过程中的日志, 在主进程中按照设备原有的顺序写回并重放日志。
+        同时在处理中的设备不超过 ``max_in_flight`` 台, 避免一次性读取所有设备。
+        按需解析时只发送需要解析的命令, 其他命令留在主进程中, 访问时再解析。
+        """
+        executor: Optional[ProcessPoolExecutor] = None
+        pending: Deque[Tuple[Device, Optional[Future], Optional[Set[str]]]] = deque()
+
+        try:
+            for device in devices:
+                if device.vendor == DefaultVendor:
+                    pending.append((device, None, None))
+                else:
+                    if executor is None:
+                        # 使用spawn启动子进程, 避免fork继承主进程的日志队列和线程
+                        executor = ProcessPoolExecutor(
+                            max_workers=workers,
+                            mp_context=multiprocessing.get_context('spawn'),
+                            initializer=_init_worker,
+                            initargs=(device._plugin_manager, base_info_handler),
+                        )
+                    demand = None
+                    if required is not None:
+                        demand = device.resolve_commands(required.get(device))
+
+                    payload = (
+                        device.vendor,
+                        device._device_info,
+                        {
+                            command: cmd.content
+                            for command, cmd in device.cmds.items()
+                            if demand is None or command in demand
+                        },
+                    )
+                    future = executor.submit(_parse_device_in_worker, payload)
+                    pending.append((device, future, demand))
+
+                while len(pending) >= max_in_flight:
+                    yield cls._finish_parallel_parse(*pending.popleft(), base_info_handler)
+
+            while pending:
+                yield cls._finish_parallel_parse(*pending.popleft(), base_info_handler)
+
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    @classmethod
+    def _finish_parallel_parse(
+        cls,
+        device: Device,
+        future: Optional[Future],
+        demand: Optional[Set[str]],
+        base_info_handler: EachVendorDeviceInfo,
+    ) -> Device:
+        """将子进程的解析结果写回设备"""
+        if future is None:
+            cls._skip_default_vendor(device, base_info_handler)
+            return device
+
+        parse_results, base_info, records, worker_metrics = future.result()
+        for command, cmd in device.cmds.items():
+            if command in parse_results:
+                cmd.update_parse_reslut(parse_results[command])
+            else:  # 按需解析时没有发送到子进程的命令
+                cmd.update_parse_reslut(StoreFunc(device._parse_on_demand, cmd))
+        device._demand = demand
+        device.info = base_info
+        metrics.merge(worker_metrics)
+
+        replay_records(records)  # 按照设备顺序重放子进程中的日志
+
+        return device
+
+    def analysis(
+        self,
+        base_info_handler: EachVendorDeviceInfo,
+        workers: int = 1,
+        executor: str = 'thread',
+    ):
+        """递归对每个设备进行分析, 必须在parse之后执行
+
+        并行分析时每台设备的分析插件仍然按照顺序执行, 分析完成后按照设备原有的顺序
+        在当前线程中更新 ``Device.info.analysis``, 结果与串行分析一致。
+
+        Args:
+            base_info_handler: 设备基础信息处理器
+            workers: 并行分析的设备数, 默认为1即串行分析, 小于1时使用CPU核心数
+            executor: 并行分析的方式, ``thread`` 使用线程池, ``process`` 使用进程池,
+                分析插件或分析函数无法在子进程中导入时改为使用线程池
+        """
+        if executor not in ANALYSIS_EXECUTORS:
+            raise ValueError(f'executor 必须是 {ANALYSIS_EXECUTORS} 中的一个')
+
+        if workers < 1:
+            workers = os.cpu_count() or 1
+        if len(self._devices) <= 1:
+            workers = 1
+
+        if workers == 1:
+            for device in self._devices:
+                device.analysis()
+                self._finish_analysis(device, base_info_handler)
+            return
+
+        if executor == 'process':
+            # 子进程通过重新导入模块得到分析插件和分析函数, 运行时定义或注册的无法导入
+            missing = _unimportable_analysis(self._devices[0]._plugin_manager)
+            if missing:
+                logger.warning(f'子进程中无法导入的分析插件或分析函数, 改为使用线程池分析: {missing}')
+                executor = 'thread'
+
+        if executor == 'thread':
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # map 按照设备的顺序返回, 某台设备分析出错时抛出异常
+                for device, _ in zip(self._devices, pool.map(Device.analysis, self._devices)):
+                    self._finish_analysis(device, base_info_handler)
+            return
+
+        self._parallel_process_analysis(base_info_handler, workers)
+
+    @staticmethod
+    def _finish_analysis(device: Device, base_info_handler: EachVendorDeviceInfo):
+        """将分析到的状态信息放到Device.info.analysis中"""
+        with metrics.timer(STAGE, 'base_info'):
             base_info_handler.run_analysis_info(device)
 
+    def _parallel_process_analysis(
+        self, base_info_handler: EachVendorDeviceInfo, workers: int
+    ):
+        """使用进程池并行分析设备
+
+        已经解析的命令只发送解析结果, 还没有解析的命令发送回显并在子进程中解析,
+        子进程返回分析结果以及新解析的结果, 在主进程中按照设备的顺序写回。
+        """
+        from .analysis_plugin import analysis
+
+        pending: List[Tuple[Device, Future]] = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(
+                self._devices[0]._plugin_manager,
+                base_info_handler,
+                analysis._only_run_plugins,
+            ),
+        ) as pool:
+            for device in self._devices:
+                cmd_contents = {}
+                parse_results = {}
+                for command, cmd in device.cmds.items():
+                    if cmd.parsed:
+                        parse_results[command] = cmd.parse_result
+                    else:
+                        cmd_contents[command] = cmd.content
+
+                payload = (
+                    device.vendor,
+                    device._device_info,
+                    device.info,
+                    cmd_contents,
+                    parse_results,
+                )
+                pending.append((device, pool.submit(_analysis_device_in_worker, payload)))
+
+            for device, future in pending:
+                result, parse_results, records, worker_metrics = future.result()
+                for command, rows in parse_results.items():
+                    device.cmds[command].update_parse_reslut(rows)
+                device._analysis_result.merge(result)
+                metrics.merge(worker_metrics)
+
+                replay_records(records)  # 按照设备顺序重放子进程中的日志
+
+                self._finish_analysis(device, base_info_handler)
+
     def search(self, device_name: str) -> List[Device]:
         """查找设备
 
@@ -198,6 +809,179 @@ class DeviceList(list):
         ]
 
 
+class _RequiredCommands:
+    """按需解析时每个厂商需要解析的命令, 同一个厂商只计算一次"""
+
+    def __init__(self, base_info_handler: EachVendorDeviceInfo):
+        self.base_info_handler = base_info_handler
+        self._commands: Dict[Type[DefaultVendor], Optional[Set[str]]] = {}
+
+    def get(self, device: Device) -> Optional[Set[str]]:
+        """返回设备需要解析的命令, 无法确定时返回None, 表示需要解析所有命令"""
+        vendor = device.vendor
+        if vendor not in self._commands:
+            self._commands[vendor] = device._plugin_manager.required_commands(
+                vendor, self.base_info_handler
+            )
+            logger.debug(f'{vendor.PLATFORM} 按需解析的命令: {self._commands[vendor]}')
+        return self._commands[vendor]
+
+
+_worker_context: Dict[str, Any] = {}  # 解析和分析子进程中的全局状态
+
+
+def _is_importable(obj: Any) -> bool:
+    """子进程能否通过模块名和限定名称重新导入 ``obj``, 并且得到同一个对象"""
+    module_name = getattr(obj, '__module__', None)
+    qualname = getattr(obj, '__qualname__', '')
+    if not module_name or module_name == '__main__' or '<locals>' in qualname:
+        return False
+
+    module = sys.modules.get(module_name)
+    if module is None or getattr(module, '__spec__', None) is None:
+        return False
+
+    target = module
+    for name in qualname.split('.'):
+        target = getattr(target, name, None)
+    return target is obj
+
+
+def _unimportable_analysis(plugin_manager: PluginManagerAbc) -> List[str]:
+    """返回子进程中无法导入的分析插件和分析函数的名称
+
+    子进程只会导入分析插件所在的模块, 在 ``__main__`` 、函数内部或者动态创建的模块中
+    定义的插件, 以及导入之后才注册的分析函数在子进程中都不存在。
+    """
+    from .analysis_plugin import analysis
+
+    missing = []
+    plugin_names = set()
+    for plugin in plugin_manager.analysis_plugin:
+        plugin_names.add(type(plugin).__name__)
+        if not _is_importable(type(plugin)):
+            missing.append(type(plugin).__qualname__)
+
+    for (plugin_name, _), infos in analysis._dispatch.items():
+        if plugin_name not in plugin_names:
+            continue
+        for info in infos:
+            if not _is_importable(info.function):
+                missing.append(f'{info.plugin_name}.{info.function_name}')
+
+    return missing
+
+
+def _init_worker(
+    plugin_manager: PluginManagerAbc,
+    base_info_handler: EachVendorDeviceInfo,
+    only_run_plugins: Optional[List[str]] = None,
+):
+    """初始化解析和分析子进程, 保存插件管理器并收集子进程中的日志
+
+    Args:
+        plugin_manager: 插件管理器
+        base_info_handler: 设备基础信息处理器
+        only_run_plugins: 主进程中设置的只运行的分析插件名称
+    """
+    records = capture_records()
+
+    if only_run_plugins:
+        from .analysis_plugin import analysis
+
+        analysis._only_run_plugins = only_run_plugins
+        analysis._build_dispatch()
+
+    _worker_context['plugin_manager'] = plugin_manager
+    _worker_context['base_info_handler'] = base_info_handler
+    _worker_context['records'] = records
+
+
+def _parse_device_in_worker(
+    payload: Tuple[Type[DefaultVendor], DeviceInfo, Dict[str, str]]
+) -> Tuple[
+    Dict[str, List[Dict[str, str]]],
+    BaseInfo,
+    List[Tuple[str, str]],
+    Dict[str, Dict[str, Dict[str, float]]],
+]:
+    """在子进程中解析单个设备
+
+    Args:
+        payload: 厂商类, 设备信息和命令字典
+
+    Returns:
+        每条命令的解析结果, 设备基础信息, 解析过程中的日志以及耗时统计
+    """
+    vendor, device_info, cmd_contents = payload
+    records = _worker_context['records']
+    records.clear()
+    metrics.clear()
+
+    device = Device()
+    device._vendor = vendor
+    device._plugin_manager = _worker_context['plugin_manager']
+    device._device_info = device_info
+    device.save_to_cmds(cmd_contents)
+
+    device.parse()
+    with metrics.timer(STAGE, 'base_info'):
+        base_info = _worker_context['base_info_handler'].run_baseinfo_func(device)
+    parse_results = {command: cmd.parse_result for command, cmd in device.cmds.items()}
+
+    return parse_results, base_info, list(records), metrics.snapshot()
+
+
+def _analysis_device_in_worker(
+    payload: Tuple[
+        Type[DefaultVendor],
+        DeviceInfo,
+        BaseInfo,
+        Dict[str, str],
+        Dict[str, List[Dict[str, str]]],
+    ]
+) -> Tuple[
+    AnalysisResult,
+    Dict[str, List[Dict[str, str]]],
+    List[Tuple[str, str]],
+    Dict[str, Dict[str, Dict[str, float]]],
+]:
+    """在子进程中分析单个设备
+
+    Args:
+        payload: 厂商类, 设备信息, 设备基础信息, 还没有解析的命令字典以及已经解析的结果
+
+    Returns:
+        分析结果, 在子进程中完成解析的命令的结果, 分析过程中的日志以及耗时统计
+    """
+    vendor, device_info, base_info, cmd_contents, parse_results = payload
+    records = _worker_context['records']
+    records.clear()
+    metrics.clear()
+
+    device = Device()
+    device._vendor = vendor
+    device._plugin_manager = _worker_context['plugin_manager']
+    device._device_info = device_info
+    device.info = base_info
+    device.save_to_cmds(cmd_contents)
+    device.parse()  # 只有还没有解析的命令, 在分析用到时才解析
+
+    device.save_to_cmds({command: '' for command in parse_results})
+    for command, rows in parse_results.items():
+        device.cmds[command].update_parse_reslut(rows)
+    device._vendor = vendor  # 保持与主进程中识别的厂商一致
+
+    device.analysis()
+    new_results = {
+        command: device.cmds[command].parse_result
+        for command in cmd_contents
+        if device.cmds[command].parsed
+    }
+
+    return device._analysis_result, new_results, list(records), metrics.snapshot()
+
+
 @dataclass
 class DeviceInfo:
     """用于InputPlugin中获取到的设备信息"""
@@ -219,6 +1003,13 @@ class Device:
 
         self._analysis_result = AnalysisResult()
 
+        # search_cmd 使用的索引, 按照命令的单词数分组, 保存切分好的命令
+        self._cmd_index: Dict[int, List[Tuple[str, List[str]]]] = {}
+        self._cmd_index_size = 0  # 索引中的命令数量, 用于发现直接修改cmds的情况
+        self._search_cache: Dict[Tuple[str, ...], Optional[str]] = {}  # 查找结果的缓存
+        self._demand: Optional[Set[str]] = None  # 按需解析时需要解析的命令, None为全部
+        self.restored = False  # 是否是从增量巡检清单中恢复的设备, 没有命令回显
+
     @property
     def info(self) -> BaseInfo:
         """设备基础信息，会在parse和analysis后更新
@@ -248,24 +1039,29 @@ class Device:
         Returns:
             List[dict] | None: 解析结果
         """
-        command = self.search_cmd(cmd)
-        if not command:
+        command = self.get_cmd(cmd)
+        if command is None:
             return []
 
         return command.parse_result
 
-    def save_to_cmds(self, cmd_contents: Dict[str, str]):
+    def save_to_cmds(self, cmd_contents: Dict[str, str], check_vendor: bool = True):
         """将分割好的命令字典保存到设备的命令列表中
 
         Args:
             cmd_contents: 命令字典
+            check_vendor: 厂商为 ``DefaultVendor`` 时是否识别厂商
         """
         for command, content in cmd_contents.items():
             cmd = Cmd(command)
             cmd.content = content
+            if command not in self.cmds:
+                self._add_cmd_index(command)
             self.cmds[command] = cmd
 
-        if self.vendor is DefaultVendor:  # 最后再检查厂商
+        self._search_cache.clear()
+
+        if check_vendor and self.vendor is DefaultVendor:  # 最后再检查厂商
             self.check_vendor()
 
     def check_vendor(self):
@@ -285,9 +1081,20 @@ class Device:
             raise TypeError('vendor must be subclass of DefaultVendor')
         self._vendor = vendor
 
-    def parse(self):
-        """对每条cmd进行解析"""
-        for _, cmd in self.cmds.items():
+    def parse(self, commands: Optional[Iterable[str]] = None):
+        """对每条cmd进行解析
+
+        Args:
+            commands: 按需解析时需要用到的命令, 为None时所有命令都需要解析。
+                其他命令保持原始回显, 有效性检查和解析推迟到第一次访问解析结果时
+        """
+        self._demand = None if commands is None else self.resolve_commands(commands)
+
+        for command, cmd in self.cmds.items():
+            if self._demand is not None and command not in self._demand:
+                cmd.update_parse_reslut(StoreFunc(self._parse_on_demand, cmd))
+                continue
+
             try:
                 # 首先判断是否为无效命令
                 if not cmd.check_valid(self._vendor.INVALID_STR):
@@ -304,6 +1111,96 @@ class Device:
                     f'{pystr.parse_plugin_prefix} device:{self._device_info.name!r} {str(e)}'
                 )
 
+    def resolve_commands(self, commands: Iterable[str]) -> Set[str]:
+        """将命令模糊匹配为 ``cmds`` 中的命令名称, 忽略设备中没有的命令
+
+        Args:
+            commands: 命令列表
+
+        Returns:
+            Set[str]: ``cmds`` 中的命令名称
+        """
+        return {
+            command
+            for command in map(self._find_command, commands)
+            if command is not None
+        }
+
+    def _parse_on_demand(self, cmd: Cmd) -> List[Dict[str, str]]:
+        """按需解析时, 不需要的命令在第一次访问解析结果时才检查并解析"""
+        if not cmd.check_valid(self._vendor.INVALID_STR):
+            raise exception.TemplateError(
+                f'platform: {self._vendor.PLATFORM!r} cmd: {cmd.command!r} 无效命令回显.'
+            )
+        return self._plugin_manager.parse(cmd, self.vendor.PLATFORM)
+
+    def release_content(self, spill: Optional[ContentSpill] = None):
+        """完成所有命令的解析后释放命令回显
+
+        按需解析时不需要的命令不会被解析, 回显写入临时文件后仍然可以在访问时解析。
+
+        Args:
+            spill: 回显写入的临时文件, 为None时直接丢弃回显
+        """
+        for command, cmd in self.cmds.items():
+            cmd.release_content(
+                spill, parse=self._demand is None or command in self._demand
+            )
+
+    def snapshot(self, content: bool = False, commands: bool = True) -> Tuple:
+        """返回可以pickle的设备快照, 用于保存和重新加载设备
+
+        没有解析的命令会先完成解析; 保存回显时没有解析的命令保留回显, 加载后再解析。
+
+        Args:
+            content: 是否保存命令回显
+            commands: 是否保存命令, 为False时只保存设备信息、基础信息和分析结果
+
+        Returns:
+            (厂商类, 设备信息, 基础信息, 分析结果, [(命令, 回显, 解析结果)])
+        """
+        cmds = []
+        for command, cmd in self.cmds.items() if commands else ():
+            parse_result = cmd.parse_result if cmd.parsed or not content else None
+            cmds.append((command, cmd.content if content else '', parse_result))
+
+        return (
+            self._vendor,
+            self._device_info,
+            self._base_info,
+            self._analysis_result,
+            cmds,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Tuple, plugin_manager: PluginManagerAbc) -> Device:
+        """通过 ``snapshot`` 返回的快照创建设备
+
+        Args:
+            snapshot: 设备快照
+            plugin_manager: 插件管理器, 用于解析快照中没有解析的命令
+
+        Returns:
+            Device: 设备
+        """
+        vendor, device_info, base_info, analysis_result, cmds = snapshot
+        device = cls()
+        device._vendor = vendor
+        device._plugin_manager = plugin_manager
+        device._device_info = device_info
+        device._base_info = base_info
+        device._analysis_result = analysis_result
+
+        for command, content, parse_result in cmds:
+            cmd = Cmd(command, content)
+            if parse_result is None:
+                parse_result = StoreFunc(device._parse_on_demand, cmd)
+            cmd.update_parse_reslut(parse_result)
+            device.cmds[command] = cmd
+            device._add_cmd_index(command)
+
+        return device
+
     def analysis(self):
         """对设备进行分析, 需要在parse之后"""
         res = self._plugin_manager.analysis(self)
@@ -313,30 +1210,77 @@ class Device:
         """
         查找命令, 返回Cmd类
 
+        NOTE 没有找到命令时返回的NoneSkip依赖sys.settrace跳过-with-中的内容,
+        开销较大并且会影响调试器, 新的代码请使用 ``get_cmd`` 或 ``parse_result``
+
         Args:
             cmd_name: 命令名
 
         Returns:
             Cmd | None: 命令类或者是个可以执行for的None类
         """
-        res = None  # type: Tuple[Cmd, int]
-        cmd_name_split = cmd_name.split()
-        cmd_name_len = len(cmd_name_split)
+        command = self.get_cmd(cmd_name)
+        return command if command is not None else NoneSkip()
+
+    def get_cmd(self, cmd_name: str) -> Optional[Cmd]:
+        """
+        查找命令, 参数 **cmd_name** 会自动进行模糊匹配
+
+        Args:
+            cmd_name: 命令名
+
+        Returns:
+            Cmd | None: 命令类, 没有找到时返回None
+        """
+        command = self._find_command(cmd_name)
+        return self.cmds[command] if command is not None else None
+
+    def _find_command(self, cmd_name: str) -> Optional[str]:
+        """模糊匹配命令, 返回 ``cmds`` 中的命令名称, 没有找到时返回None"""
+        cmd_name_split = tuple(cmd_name.split())
 
+        if self._cmd_index_size != len(self.cmds):  # cmds被直接修改过, 重建索引
+            self._build_cmd_index()
+
+        if cmd_name_split not in self._search_cache:
+            self._search_cache[cmd_name_split] = self._match_cmd(cmd_name_split)
+
+        return self._search_cache[cmd_name_split]
+
+    def _add_cmd_index(self, command: str):
+        """将命令添加到search_cmd的索引中"""
+        command_split = command.split()
+        self._cmd_index.setdefault(len(command_split), []).append(
+            (command, command_split)
+        )
+        self._cmd_index_size += 1
+
+    def _build_cmd_index(self):
+        """重建search_cmd的索引"""
+        self._cmd_index = {}
+        self._cmd_index_size = 0
+        self._search_cache.clear()
         for command in self.cmds.keys():
+            self._add_cmd_index(command)
+
+    def _match_cmd(self, cmd_name_split: Tuple[str, ...]) -> Optional[str]:
+        """在单词数相同的命令中查找得分最高的命令
+
+        Args:
+            cmd_name_split: 切分后的命令
+
+        Returns:
+            str | None: 匹配到的命令, 没有匹配时返回None
+        """
+        res = None  # type: Tuple[str, int]
+
+        for command, command_split in self._cmd_index.get(len(cmd_name_split), []):
 
             score = 0  # 匹配得分
             is_match = True  # 是否匹配的标签
 
-            # 切分命令
-            command_split = command.split()
-            if not len(command_split) == cmd_name_len:  # 当命令长度不一致就跳过
-                continue
-
             # 对每个单词进行匹配并打分
             for i, each_command in enumerate(command_split):
-                if is_match == False:
-                    break
                 # 排序长命令与短的命令
                 if len(each_command) > len(cmd_name_split[i]):
                     long_each_cmd, short_each_cmd = each_command, cmd_name_split[i]
@@ -352,9 +1296,9 @@ class Device:
             if is_match:
                 # 比较得分, 取最高的
                 if (not res) or score > res[1]:
-                    res = (self.cmds[command], score)
+                    res = (command, score)
 
-        return res[0] if res else NoneSkip()
+        return res[0] if res else None
 
 
 class Cmd:
@@ -370,6 +1314,8 @@ class Cmd:
         self._command: str = ''
         self._content: str = ''
         self._parse_result: List[Dict[str, str]] | StoreFunc = []
+        # 回显被释放到临时文件后的位置 (临时文件, 偏移量, 长度)
+        self._content_ref: Optional[Tuple[ContentSpill, int, int]] = None
 
         self.command = cmd
         self.content = content
@@ -393,12 +1339,33 @@ class Cmd:
 
     @property
     def content(self) -> str:
-        """返回回显字符串"""
+        """返回回显字符串, 回显被释放到临时文件时会重新读取"""
+        if self._content_ref is not None:
+            spill, offset, length = self._content_ref
+            return spill.read(offset, length)
         return self._content
 
     @content.setter
     def content(self, stream: str):
         self._content = stream
+        self._content_ref = None
+
+    def release_content(self, spill: Optional[ContentSpill] = None, parse: bool = True):
+        """完成解析后释放命令回显
+
+        Args:
+            spill: 回显写入的临时文件, 为None时直接丢弃回显
+            parse: 释放前是否先完成解析
+        """
+        if parse:
+            self.parse_result  # 确保已经完成解析
+
+        if self._content_ref is not None:  # 已经释放过
+            return
+
+        if spill is not None and self._content:
+            self._content_ref = (spill, *spill.write(self._content))
+        self._content = ''
 
     def update_parse_reslut(self, result: List[Dict[str, str]] | StoreFunc):
         """在取到解析结果后，更新解析结果, 也可以传入一个 StoreFunc, 作为延迟执行
@@ -422,6 +1389,11 @@ class Cmd:
             return False
         return True
 
+    @property
+    def parsed(self) -> bool:
+        """是否已经取得解析结果, 为False时解析会在第一次访问 ``parse_result`` 时执行"""
+        return not isinstance(self._parse_result, StoreFunc)
+
     @property
     def parse_result(self) -> List[Dict[str, str]]:
         """返回解析结果, 如果是 StoreFunc 则执行并返回结果
@@ -431,11 +1403,8 @@ class Cmd:
         """
         if isinstance(self._parse_result, StoreFunc):
             try:
-                res = []
-                tmp_dict = self._parse_result()
-                for dict in tmp_dict:
-                    res.append(CaseInsensitiveDict(dict))
-                self._parse_result = res
+                # 同一个表格的所有行共享表头, 取值时忽略键的大小写
+                self._parse_result = to_rows(self._parse_result())
 
             except exception.TemplateError as e:
                 self._parse_result = []
@@ -458,6 +1427,7 @@ class PluginManagerAbc(abc.ABC):
         self._output_plugin: Optional[OutputPluginAbstract] = None
         self._parse_plugin: Optional[ParsePluginAbstract] = None
         self._analysis_plugin: List[AnalysisPluginAbstract] = []
+        self.parse_cache: Optional[ParseResultCache] = None  # 解析结果的磁盘缓存
 
         if input_plugin:
             self.input_plugin = input_plugin
@@ -544,18 +1514,77 @@ class PluginManagerAbc(abc.ABC):
         self._analysis_plugin = [plugin_cls() for plugin_cls in plugin_cls_list]
 
     def parse(self, cmd: Cmd, platform: str) -> Dict[str, str]:
-        """对单个命令的内容进行解析"""
+        """对单个命令的内容进行解析, 设置了 ``parse_cache`` 时优先从缓存中读取"""
         if self._parse_plugin is None:
             raise exception.PluginNotSpecify('parse plugin is None')
-        return self._parse_plugin.run(cmd, platform)
+
+        # 命令是在第一次访问解析结果时才解析的, 所以在这里统计解析的耗时
+        with metrics.timer(STAGE, 'parse'), metrics.timer(PLATFORM, platform):
+            return self._parse(cmd, platform)
+
+    def _parse(self, cmd: Cmd, platform: str) -> Dict[str, str]:
+        if self.parse_cache is None:
+            return self._parse_plugin.run(cmd, platform)
+
+        signature = self._parse_plugin.template_signature(cmd, platform)
+        if not signature:  # 解析插件不支持缓存
+            return self._parse_plugin.run(cmd, platform)
+
+        key = self.parse_cache.make_key(platform, cmd.command, cmd.content, signature)
+        res = self.parse_cache.get(key)
+        if res is None:
+            try:
+                res = self._parse_plugin.run(cmd, platform)
+            except exception.NotParseAnyResult:
+                self.parse_cache.set(key, [])  # 没有解析结果也缓存起来
+                raise
+            self.parse_cache.set(key, res)
+
+        elif not res:
+            raise exception.NotParseAnyResult(platform, cmd.command)
+
+        return res
+
+    def required_commands(
+        self, vendor: Type[DefaultVendor], base_info_handler: EachVendorDeviceInfo
+    ) -> Optional[Set[str]]:
+        """按需解析时, 厂商设备的基础信息和分析插件需要用到的命令
+
+        Args:
+            vendor: 厂商类
+            base_info_handler: 设备基础信息处理器
+
+        Returns:
+            命令集合, 无法确定时返回None, 表示需要解析所有命令
+        """
+        from .analysis_plugin import AnalysisPluginAbc, analysis
+
+        commands = base_info_handler.get_commands(vendor)
+        if commands is None:
+            return None
+        commands = set(commands)
+
+        for plugin in self._analysis_plugin:
+            # 只有通过 analysis.template_key 声明模板的插件才能确定用到的命令
+            if not isinstance(plugin, AnalysisPluginAbc) or (
+                type(plugin).run is not AnalysisPluginAbc.run
+            ):
+                return None
+            commands.update(
+                analysis.get_commands(plugin.__class__.__name__, vendor.PLATFORM)
+            )
+
+        return commands
 
     def analysis(self, device: Device) -> AnalysisResult:
         """对设备进行分析, 返回分析结果列表"""
         res = AnalysisResult()
         if not self._analysis_plugin:
             raise exception.PluginNotSpecify('analysis plugin list is empty')
-        for plugin in self._analysis_plugin:
-            res.merge(plugin.run(device))
+        with metrics.timer(STAGE, 'analysis'):
+            for plugin in self._analysis_plugin:
+                with metrics.timer(ANALYSIS_PLUGIN, plugin.__class__.__name__):
+                    res.merge(plugin.run(device))
 
         return res
 
@@ -563,7 +1592,8 @@ class PluginManagerAbc(abc.ABC):
         """对单个文件进行设备输入"""
         if self._input_plugin is None:
             raise exception.PluginNotSpecify('input plugin is None')
-        return self._input_plugin.run(file_path)
+        with metrics.timer(STAGE, 'input'):
+            return self._input_plugin.run(file_path)
 
     def output(self, devices: DeviceList, file_path: str):
         """对设备列表进行输出"""
@@ -571,13 +1601,32 @@ class PluginManagerAbc(abc.ABC):
             raise exception.PluginNotSpecify('output plugin is None')
         self._output_plugin.run(devices, file_path)
 
+    def input_stream(self, file_path: str, stream: str) -> InputPluginResult:
+        """对已经读取的文件内容进行设备输入"""
+        if self._input_plugin is None:
+            raise exception.PluginNotSpecify('input plugin is None')
+        with metrics.timer(STAGE, 'input'):
+            return self._input_plugin.run_stream(file_path, stream)
+
+    def read_input(self, file_path: str) -> str:
+        """使用输入插件读取文件内容"""
+        if self._input_plugin is None:
+            raise exception.PluginNotSpecify('input plugin is None')
+        return self._input_plugin.read(file_path)
+
     @abc.abstractmethod
     def input_dir(
-        self, dir_path: str, expend: str | List = None
+        self, dir_path: str, expend: str | List = None, concurrency: int = 1
     ) -> List[InputPluginResult]:
         """对目录中的文件进行设备输入"""
         raise NotImplementedError
 
+    def iter_input_dir(
+        self, dir_path: str, expend: str | List = None, concurrency: int = 1
+    ) -> Iterator[InputPluginResult]:
+        """对目录中的文件逐个进行设备输入, 可以重载为真正的惰性读取"""
+        yield from self.input_dir(dir_path, expend, concurrency=concurrency)
+
 
 class InputPluginResult:
     """输入插件的结果"""
@@ -720,15 +1769,32 @@ class AnalysisResult:
 
     def __init__(self):
         self._result: List[AlarmLevel] = []
+        # 按照插件简写分组的结果, 以及每个级别的数量, 第一次查询时生成, 之后随添加更新
+        self._index: Optional[Dict[str, AnalysisResult]] = None
+        self._counts: Optional[Dict[int, int]] = None
 
     def merge(self, result: AnalysisResult):
         """合并分析结果"""
-        self._result.extend(result._result)
+        if self._index is None and self._counts is None:
+            self._result.extend(result._result)
+            return
+
+        for alarm in result._result:
+            self.add(alarm)
 
     def add(self, level: AlarmLevel):
         """添加分析结果"""
         self._result.append(level)
 
+        if self._index is not None:
+            short = _short_plugin_name(level.plugin_name)
+            if short not in self._index:
+                self._index[short] = AnalysisResult()
+            self._index[short].add(level)
+
+        if self._counts is not None:
+            self._counts[level.level] = self._counts.get(level.level, 0) + 1
+
     def add_normal(self, message: str = ''):
         """添加正常结果"""
         self.add(AlarmLevel(AlarmLevel.NORMAL, message))
@@ -758,21 +1824,46 @@ class AnalysisResult:
         Return:
             AlarmLevel: AlarmLevel对象
         """
+        if self._index is None:
+            # 告警所属的插件在插件运行结束后才设置, 所以在第一次查询时才分组
+            self._index = {}
+            for alarm in self._result:
+                short = _short_plugin_name(alarm.plugin_name)
+                if short not in self._index:
+                    self._index[short] = AnalysisResult()
+                self._index[short].add(alarm)
+
         ret = AnalysisResult()
-        for alarm in self._result:
-            if self._short(alarm.plugin_name) == self._short(plugin_name):
-                ret.add(alarm)
+        bucket = self._index.get(_short_plugin_name(plugin_name))
+        if bucket is not None:
+            ret._result = list(bucket._result)
+            ret._counts = bucket._get_counts().copy()
         return ret
 
     def _short(self, plugin_name: str) -> str:
         """获取指定插件的简写
         e.g: AnalysisPluginWithPower -> power
         """
-        name = plugin_name.lower()
-        name = name.replace(' ', '')
-        name = name.replace('_', '')
-        name = name.replace('analysispluginwith', '')
-        return name
+        return _short_plugin_name(plugin_name)
+
+    def _get_counts(self) -> Dict[int, int]:
+        """每个级别的告警数量 {告警级别: 数量}"""
+        if self._counts is None:
+            self._counts = {}
+            for alarm in self._result:
+                self._counts[alarm.level] = self._counts.get(alarm.level, 0) + 1
+        return self._counts
+
+    def count(self, level: int) -> int:
+        """指定级别的告警数量
+
+        Args:
+            level: 告警级别, e.g ``AlarmLevel.WARNING``
+
+        Return:
+            int: 告警数量
+        """
+        return self._get_counts().get(level, 0)
 
     def __getitem__(self, index) -> AlarmLevel:
         return self._result[index]
@@ -786,10 +1877,19 @@ class AnalysisResult:
     @property
     def include_warning(self) -> bool:
         """是否包含警告级别"""
-        for alarm in self._result:
-            if alarm.is_warning:
-                return True
-        return False
+        return self.count(AlarmLevel.WARNING) > 0
+
+
+@functools.lru_cache(maxsize=None)
+def _short_plugin_name(plugin_name: str) -> str:
+    """获取插件的简写, 插件名称的数量有限, 所以缓存结果
+    e.g: AnalysisPluginWithPower -> power
+    """
+    name = plugin_name.lower()
+    name = name.replace(' ', '')
+    name = name.replace('_', '')
+    name = name.replace('analysispluginwith', '')
+    return name
 
 
 class PluginAbstract(abc.ABC):
@@ -821,8 +1921,30 @@ class InputPluginAbstract(PluginAbstract):
             InputPluginResult: 输入插件的返回结果
         """
 
+        return self.run_stream(file_path, self.read(file_path))
+
+    def read(self, file_path: str) -> str:
+        """读取文件内容, 可以重载以支持其他的读取方式
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 文件内容
+        """
         with open(file_path, 'r', encoding='utf_8_sig', errors='ignore') as f:
-            stream = f.read()
+            return f.read()
+
+    def run_stream(self, file_path: str, stream: str) -> InputPluginResult:
+        """对已经读取的文件内容进行设备输入
+
+        Args:
+            file_path: 文件路径
+            stream: 文件内容
+
+        Returns:
+            InputPluginResult: 输入插件的返回结果
+        """
         result = self.main(file_path, stream)
         result._device_info.file_path = file_path
         return result
@@ -867,7 +1989,8 @@ class OutputPluginAbstract(PluginAbstract):
         self.args = self.OutputArgs(
             devices=devices, file_path=path, output_params=output_params
         )
-        return self.main()
+        with metrics.timer(STAGE, 'output'):
+            return self.main()
 
     @abc.abstractmethod
     def main(self):
@@ -900,6 +2023,28 @@ class ParsePluginAbstract(PluginAbstract):
     def set_external_templates(self, template_dir: str):
         raise NotImplementedError
 
+    def template_signature(self, cmd: Cmd, platform: str) -> str:
+        """返回解析这条命令所用模板的签名, 用于解析结果的磁盘缓存,
+        模板发生变化时签名也必须改变。返回空字符串表示不使用缓存。
+
+        Args:
+            cmd: Cmd类
+            platform: 命令所属平台
+
+        Returns:
+            str: 模板签名
+        """
+        return ''
+
+    def templates_signature(self) -> str:
+        """返回所有模板的签名, 用于增量巡检判断之前的结果是否仍然有效,
+        任意模板发生变化时签名也必须改变。返回空字符串表示无法确定, 每次都重新处理。
+
+        Returns:
+            str: 模板签名
+        """
+        return ''
+
 
 class AnalysisPluginAbstract(PluginAbstract):
     @abc.abstractmethod
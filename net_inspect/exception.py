@@ -94,3 +94,14 @@ class OutputParamsNotGiven(OutputPluginError):
 
     def __str__(self):
         return f'没有向输出插件 {self.plugin_name!r} 提供 {self.key!r} 参数'
+
+
+class SnapshotError(Error):
+    """集群快照错误"""
+
+    def __init__(self, file_path: str, reason: str):
+        self.file_path = file_path
+        self.reason = reason
+
+    def __str__(self):
+        return f'快照 {self.file_path!r} 无法加载: {self.reason}'
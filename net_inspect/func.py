@@ -1,5 +1,13 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import os
 import re
 import sys
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
 
 import rich
 
@@ -116,6 +124,11 @@ def safe_str2float(string: str) -> float:
         return 0.0
 
 
+# str.splitlines 认可的换行符, 输入插件统一替换为 \n 之后再按位置切分
+line_breaks = '\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+line_break_pattern = re.compile(r'\r\n|[' + line_breaks + ']')
+
+
 # 创建一个对大小写不敏感的字典类
 class CaseInsensitiveDict(dict):
     def __init__(self, *args, **kwargs):
@@ -135,6 +148,157 @@ class CaseInsensitiveDict(dict):
             self[key] = value
 
 
+def code_fingerprint(obj: Any) -> str:
+    """返回函数或者类的代码指纹, 修改了定义它们的模块文件中的任意内容后指纹改变
+
+    使用定义函数或者类的模块源文件的内容计算, 模块级的辅助函数和正则等常量同样包含在内;
+    类使用继承链上所有类所在的模块, 被装饰器包装的函数同时使用被包装函数所在的模块。
+    任意一个模块取不到源文件时返回空字符串, 表示无法确定。
+
+    Args:
+        obj: 函数或者类
+
+    Returns:
+        str: 代码指纹
+    """
+    if isinstance(obj, type):
+        objects = [klass for klass in obj.__mro__ if klass.__module__ != 'builtins']
+    else:
+        objects = []
+        seen = set()  # 避免__wrapped__循环引用
+        while obj is not None and id(obj) not in seen:
+            seen.add(id(obj))
+            objects.append(obj)
+            obj = getattr(obj, '__wrapped__', None)
+
+    sha = hashlib.sha256()
+    for module_name in sorted({getattr(obj, '__module__', None) or '' for obj in objects}):
+        source_hash = _source_hash(sys.modules.get(module_name))
+        if not source_hash:
+            return ''
+        sha.update(f'{module_name}\0{source_hash}\0'.encode('utf-8'))
+    return sha.hexdigest()
+
+
+# 模块源文件的内容hash {文件路径: (修改时间, 文件大小, hash)}, 文件没有变化时不需要重新读取
+_source_hashes: Dict[str, Tuple[int, int, str]] = {}
+
+
+def _source_hash(module: Any) -> str:
+    """返回模块源文件内容的hash, 取不到源文件时返回空字符串"""
+    try:
+        file_path = inspect.getsourcefile(module)
+    except TypeError:  # 内置模块或者不是模块
+        return ''
+    if not file_path or not os.path.exists(file_path):
+        return ''
+
+    stat = os.stat(file_path)
+    cached = _source_hashes.get(file_path)
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        with open(file_path, 'rb') as f:
+            cached = (stat.st_mtime_ns, stat.st_size, hashlib.sha256(f.read()).hexdigest())
+        _source_hashes[file_path] = cached
+    return cached[2]
+
+
+class RowHeader:
+    """解析结果中表格的表头, 同一个模板的所有行共享一个表头
+
+    表头中的键统一转为小写, 并预先生成 {键: 位置} 的索引。
+    相同的表头通过 ``RowHeader.get`` 只创建一次。
+    """
+
+    __slots__ = ('keys', 'index')
+
+    _headers: Dict[Tuple[str, ...], RowHeader] = {}  # 已经创建的表头
+
+    def __init__(self, keys: Tuple[str, ...]):
+        self.keys = keys
+        self.index = {key.lower(): i for i, key in enumerate(keys)}
+
+    @classmethod
+    def get(cls, keys: Iterable[str]) -> RowHeader:
+        """获取表头, 相同的键返回同一个对象
+
+        Args:
+            keys: 表头中的键
+
+        Returns:
+            RowHeader: 表头
+        """
+        keys = tuple(keys)
+        header = cls._headers.get(keys)
+        if header is None:
+            header = cls._headers.setdefault(keys, cls(keys))
+        return header
+
+
+class Row(Mapping):
+    """解析结果中的一行, 只保存值, 键由共享的表头提供
+
+    与 ``CaseInsensitiveDict`` 一样可以通过 ``row['KEY']``, ``row.get('key')``
+    忽略大小写取值, 但是每一行不需要保存键的副本, 也不需要逐个键转为小写。
+    """
+
+    __slots__ = ('_header', '_values')
+
+    def __init__(self, header: RowHeader, values: Sequence[str]):
+        self._header = header
+        self._values = tuple(values)
+
+    def __getitem__(self, key: str):
+        index = self._header.index
+        if key not in index and isinstance(key, str):
+            key = key.lower()
+        return self._values[index[key]]
+
+    def __contains__(self, key) -> bool:
+        index = self._header.index
+        return key in index or (isinstance(key, str) and key.lower() in index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._header.index)
+
+    def __len__(self) -> int:
+        return len(self._header.index)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __reduce__(self):
+        # 跨进程传递时同一个表头的键只序列化一次, 并在接收端重新共享表头
+        return _restore_row, (self._header.keys, self._values)
+
+
+def _restore_row(keys: Tuple[str, ...], values: Tuple[str, ...]) -> Row:
+    return Row(RowHeader.get(keys), values)
+
+
+def make_rows(keys: Iterable[str], rows: Iterable[Sequence[str]]) -> List[Row]:
+    """将表头和多行的值转换为 ``Row`` 的列表
+
+    Args:
+        keys: 表头中的键
+        rows: 每一行的值, 顺序与表头一致
+
+    Returns:
+        List[Row]: 共享同一个表头的行
+    """
+    header = RowHeader.get(keys)
+    return [Row(header, values) for values in rows]
+
+
+def to_rows(results: Iterable[Mapping[str, str]]) -> List[Row]:
+    """将解析插件返回的字典列表转换为 ``Row`` 的列表, 已经是 ``Row`` 的保持不变"""
+    rows = []
+    for result in results:
+        if not isinstance(result, Row):
+            result = Row(RowHeader.get(result.keys()), result.values())
+        rows.append(result)
+    return rows
+
+
 class StoreFunc:
     """存储函数的类，用于延迟调用函数"""
 
@@ -168,6 +332,9 @@ class NoneSkip(Singleton):
     使用bool()来判断是否为空
     """
 
+    # 每个线程是否由自身设置了sys.settrace, 实例是所有线程共享的单例, 不能保存在实例中
+    _local = threading.local()
+
     def __init__(self):
         self.none = None
 
@@ -178,6 +345,7 @@ class NoneSkip(Singleton):
         # NOTE 存在一定的问题，当程序处于调试状态的时候，调试进程会被破坏：
         # https://pydev.blogspot.com/2007/06/why-cant-pydev-debugger-work-with.html
         sys.settrace(lambda *args, **keys: None)
+        NoneSkip._local.set_trace = True
         frame = sys._getframe(1)
         frame.f_trace = self.trace
 
@@ -188,6 +356,11 @@ class NoneSkip(Singleton):
         return False
 
     def __exit__(self, type, value, traceback):
+        # 恢复trace, 否则之后的每次函数调用都会经过trace函数
+        if getattr(NoneSkip._local, 'set_trace', False):
+            NoneSkip._local.set_trace = False
+            sys.settrace(None)
+
         if type is None:
             return  # No exception
         if issubclass(type, SkipWithBlock):
@@ -1,4 +1,5 @@
 import sys
+from typing import List, Tuple
 
 from loguru import logger as loguru_logger
 
@@ -7,6 +8,31 @@ from .func import Singleton
 logger = loguru_logger.opt(colors=True)
 
 
+def capture_records() -> List[Tuple[str, str]]:
+    """在子进程中移除所有的日志输出, 改为收集日志的 (级别, 内容), 由主进程使用 ``replay_records`` 重放
+
+    Returns:
+        List[Tuple[str, str]]: 收集日志的列表, 之后的日志会追加到这个列表中
+    """
+    records: List[Tuple[str, str]] = []
+
+    loguru_logger.remove()
+    loguru_logger.add(
+        lambda message: records.append(
+            (message.record['level'].name, message.record['message'])
+        ),
+        level='DEBUG',
+        format='{message}',
+    )
+    return records
+
+
+def replay_records(records: List[Tuple[str, str]]):
+    """在主进程中按顺序重放子进程收集的日志"""
+    for level, message in records:
+        logger.opt().log(level, message)
+
+
 class LoggerConfig(Singleton):
     def __init__(self):
         self._logger = loguru_logger
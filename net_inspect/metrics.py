@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+# 统计的分类
+CLUSTER = 'cluster'  # Cluster 中每个阶段的总耗时
+STAGE = 'stage'  # 每个阶段中单次调用的耗时, 如每个文件的输入、每台设备的解析
+PLATFORM = 'platform'  # 每个厂商平台设备的解析耗时
+TEMPLATE = 'template'  # 每个模板的解析耗时
+ANALYSIS_PLUGIN = 'analysis_plugin'  # 每个分析插件的耗时
+
+CATEGORIES = [CLUSTER, STAGE, PLATFORM, TEMPLATE, ANALYSIS_PLUGIN]
+
+
+class Metrics:
+    """记录运行过程中各个阶段、平台、模板以及分析插件的耗时和调用次数"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, List[float]]] = {}  # {分类: {名称: [次数, 耗时]}}
+        self._lock = threading.Lock()  # 并行分析时会在多个线程中记录
+
+    def add(self, category: str, name: str, seconds: float, count: int = 1):
+        """增加一条记录
+
+        Args:
+            category: 分类
+            name: 名称
+            seconds: 耗时(秒)
+            count: 调用次数
+        """
+        with self._lock:
+            item = self._data.setdefault(category, {}).setdefault(name, [0, 0.0])
+            item[0] += count
+            item[1] += seconds
+
+    @contextmanager
+    def timer(self, category: str, name: str) -> Iterator[None]:
+        """统计代码块的耗时, 代码块抛出异常时同样会记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(category, name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """返回当前的统计结果
+
+        Returns:
+            {分类: {名称: {'count': 调用次数, 'seconds': 耗时}}}
+        """
+        return {
+            category: {
+                name: {'count': count, 'seconds': seconds}
+                for name, (count, seconds) in items.items()
+            }
+            for category, items in sorted(self._data.items(), key=_category_order)
+        }
+
+    def merge(self, snapshot: Dict[str, Dict[str, Dict[str, float]]]):
+        """合并其他进程中的统计结果
+
+        Args:
+            snapshot: ``snapshot`` 方法返回的统计结果
+        """
+        for category, items in snapshot.items():
+            for name, item in items.items():
+                self.add(category, name, item['seconds'], item['count'])
+
+    def clear(self):
+        """清空统计结果"""
+        self._data.clear()
+
+    @contextmanager
+    def collect(self, target: Metrics) -> Iterator[None]:
+        """将代码块执行期间新增的统计结果同时合并到 ``target`` 中
+
+        全局的统计结果由所有实例共享, ``NetInspect`` 使用这个方法只记录自身运行的部分。
+
+        Args:
+            target: 接收统计结果的对象
+        """
+        before = self.snapshot()
+        try:
+            yield
+        finally:
+            target.merge(_subtract(self.snapshot(), before))
+
+
+def _subtract(
+    after: Dict[str, Dict[str, Dict[str, float]]],
+    before: Dict[str, Dict[str, Dict[str, float]]],
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """计算两次 ``snapshot`` 之间新增的统计结果"""
+    result = {}
+    for category, items in after.items():
+        for name, item in items.items():
+            old = before.get(category, {}).get(name, {'count': 0, 'seconds': 0.0})
+            count = item['count'] - old['count']
+            if count or item['seconds'] != old['seconds']:
+                result.setdefault(category, {})[name] = {
+                    'count': count,
+                    'seconds': item['seconds'] - old['seconds'],
+                }
+    return result
+
+
+def _category_order(item) -> int:
+    """按照 ``CATEGORIES`` 的顺序排列分类, 其他分类排在最后"""
+    category = item[0]
+    return CATEGORIES.index(category) if category in CATEGORIES else len(CATEGORIES)
+
+
+metrics = Metrics()
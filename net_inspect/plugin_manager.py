@@ -1,21 +1,77 @@
 from __future__ import annotations
 
 import os
-from typing import Dict, List, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Tuple
 
 from .data import pyoption
-from .domain import DeviceInfo, PluginManagerAbc
+from .domain import DeviceInfo, InputPluginResult, PluginManagerAbc
 from .exception import InputFileTypeError
 from .logger import logger
 
 
 class PluginManager(PluginManagerAbc):
     def input_dir(
-        self, dir_path: str, expend: str | List = None
+        self, dir_path: str, expend: str | List = None, concurrency: int = 1
     ) -> List[Tuple[Dict[str, str], DeviceInfo]]:
         """对目录中的文件进行设备输入"""
-        devices = []
+        return list(self.iter_input_dir(dir_path, expend, concurrency=concurrency))
+
+    def iter_input_dir(
+        self, dir_path: str, expend: str | List = None, concurrency: int = 1
+    ) -> Iterator[InputPluginResult]:
+        """对目录中的文件逐个进行设备输入
+
+        Args:
+            dir_path: 目录路径
+            expend: 文件扩展名
+            concurrency: 同时读取的文件数, 为1时每次只读取一个文件,
+                大于1时在线程池中并发读取, 适用于读取延迟较高的网络存储
+
+        Yields:
+            InputPluginResult: 按照文件的顺序产出输入插件的结果
+        """
+        yield from self.iter_input(
+            self.iter_dir_files(dir_path, expend), concurrency=concurrency
+        )
+
+    def iter_input(
+        self, files: Iterable[str], concurrency: int = 1
+    ) -> Iterator[InputPluginResult]:
+        """对文件逐个进行设备输入, 跳过不符合输入插件标准的文件
+
+        Args:
+            files: 文件路径
+            concurrency: 同时读取的文件数
+
+        Yields:
+            InputPluginResult: 按照文件的顺序产出输入插件的结果
+        """
+        if concurrency <= 1:
+            for file_path in files:
+                try:
+                    result = self.input(file_path)
+                except InputFileTypeError:  # pragma: no cover
+                    logger.info('文件不符合input_plugin标准，跳过: {}'.format(file_path))
+                    continue
+                yield result
+            return
+
+        for file_path, stream in _iter_read_concurrently(
+            files, self.read_input, concurrency
+        ):
+            try:
+                result = self.input_stream(file_path, stream)
+            except InputFileTypeError:
+                logger.info('文件不符合input_plugin标准，跳过: {}'.format(file_path))
+                continue
+            yield result
 
+    def iter_dir_files(
+        self, dir_path: str, expend: str | List = None
+    ) -> Iterator[str]:
+        """遍历目录中符合扩展名的文件"""
         if expend is None:
             expend = pyoption.input_file_expend
         elif expend is str:
@@ -24,10 +80,40 @@ class PluginManager(PluginManagerAbc):
         for root, dirs, files in os.walk(dir_path):
             for file in files:
                 if os.path.splitext(file)[-1] in expend:  # 判断文件后缀
-                    file_path = os.path.join(root, file)
-                    try:
-                        devices.append(self.input(file_path))
-                    except InputFileTypeError:  # pragma: no cover
-                        logger.info('文件不符合input_plugin标准，跳过: {}'.format(file_path))
+                    yield os.path.join(root, file)
+
+
+def _iter_read_concurrently(
+    files: Iterable[str], read: Callable[[str], str], concurrency: int
+) -> Iterator[Tuple[str, str]]:
+    """将文件读取放到线程池中并发执行, 按照文件原有的顺序产出
+
+    同时读取的文件不超过 ``concurrency`` 个, 已经提交但是还没有产出的文件不超过
+    ``concurrency * 2`` 个, 避免一次性将整个目录读入内存。
+
+    Args:
+        files: 文件路径
+        read: 读取文件内容的函数
+        concurrency: 同时读取的文件数
+
+    Yields:
+        (文件路径, 文件内容)
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending: Deque[Tuple[str, Future]] = deque()
+
+    try:
+        for file_path in files:
+            pending.append((file_path, executor.submit(read, file_path)))
+            if len(pending) >= concurrency * 2:
+                file_path, future = pending.popleft()
+                yield file_path, future.result()
+
+        while pending:
+            file_path, future = pending.popleft()
+            yield file_path, future.result()
 
-        return devices
+    finally:
+        for _, future in pending:  # 提前结束时丢弃还没有开始的读取
+            future.cancel()
+        executor.shutdown(wait=True)
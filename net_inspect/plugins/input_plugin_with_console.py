@@ -1,6 +1,8 @@
+import heapq
 import re
 
 from ..domain import InputPluginAbstract, InputPluginResult
+from ..func import line_break_pattern, line_breaks
 
 # 类思科的情况
 # device>show version
@@ -20,48 +22,62 @@ simialr_huawei_reg = re.compile(
 
 prompt_reg = r'\S+[>|\]|\)|#]'
 
+# 在整个文件内容中查找命令行使用的预编译正则, 与上面两个正则逐行匹配的结果相同。
+# 以换行符开头可以让正则引擎快速跳到下一行, 而不是在每个位置上尝试匹配行首,
+# 其中的 \s 替换为不包含换行符的 [^\S\n], 避免跨行匹配
+command_line_patterns = [
+    re.compile(
+        '\n' + reg.pattern.lstrip('^').replace(r'\s', r'[^\S\n]'),
+        re.IGNORECASE | re.MULTILINE,
+    )
+    for reg in (similar_cisco_reg, simialr_huawei_reg)
+]
+prompt_pattern = re.compile(prompt_reg)
+
 
 class InputPluginWithConsole(InputPluginAbstract):
     """通过Console或者vty获取命令的输出"""
 
     def main(self, file_path: str, stream: str) -> InputPluginResult:
-        command = ''
-        content = []
-
-        prompt = ''  # 用于记录当前的提示符
+        """在整个文件内容中查找命令行, 再以命令行的提示符查找命令回显的结尾
 
+        不需要对每一行执行正则, 也不需要将文件拆分为行的列表, 适用于很大的会话记录。
+        """
         result = InputPluginResult()
 
-        for line in stream.splitlines():
-            match = re.match(similar_cisco_reg, line) or re.match(
-                simialr_huawei_reg, line
-            )  # 判断是否为命令的行
-            if match:
-                if not result.hostname:  # 如果没有设备名称就记录
-                    result.hostname = match.group('device_name')
-
-                prompt = re.match(prompt_reg, line).group(0)  # 获取当前的提示符
-
-                if content and command:  # 如果有内容，且有命令，则保存
-                    result.add_cmd(command, '\n'.join(content))
-
-                command = match.group('cmd').strip()
-                content.clear()
-                continue
-
-            else:  # 如果没有匹配到，有可能是只有命令提示符，此时也要保存
-                if prompt:  # 如果保存有提示符
-                    # 如果行开始是提示符，且有内容，且有命令，则保存
-                    if line.startswith(prompt) and content and command:
-                        result.add_cmd(command, '\n'.join(content))
-
-                        command = ''  # 清空状态
-                        content.clear()
-                        continue
-
-                content.append(line)  # 如果没有匹配到，则添加到内容中
-
-        if content and command:  # 最后将没有保存的内容保存
-            result.add_cmd(command, '\n'.join(content))
+        if any(char in stream for char in line_breaks):
+            stream = line_break_pattern.sub('\n', stream)
+        stream = '\n' + stream  # 每一行都以换行符开头, 包括第一行
+
+        # 两个正则各自扫描一遍文件内容, 按照位置合并为命令行的序列
+        matches = heapq.merge(
+            *(pattern.finditer(stream) for pattern in command_line_patterns),
+            key=lambda match: match.start(),
+        )
+        length = len(stream)
+        match = next(matches, None)
+        while match:
+            if not result.hostname:  # 如果没有设备名称就记录
+                result.hostname = match.group('device_name')
+
+            prompt = prompt_pattern.match(stream, match.start() + 1).group(0)
+            command = match.group('cmd').strip()
+            start = match.end() + 1  # 命令回显的开始位置
+
+            next_match = next(matches, None)
+            end = next_match.start() if next_match else length
+
+            # 回显中以提示符开头的行为命令的结尾, 回显的第一行除外
+            prompt_line = stream.find('\n' + prompt, start, end)
+            if prompt_line != -1:
+                end = prompt_line
+            elif end == length and stream.endswith('\n', start):
+                end -= 1  # 文件最后的换行符不属于回显
+
+            # 至少有一行回显时才保存
+            if start <= end if next_match else start < length:
+                result.add_cmd(command, stream[start:end])
+
+            match = next_match
 
         return result
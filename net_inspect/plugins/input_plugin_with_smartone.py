@@ -1,9 +1,10 @@
 import os
 import re
-from typing import Dict, Tuple
+from typing import Match, Optional, Pattern
 
 from ..domain import DeviceInfo, InputPluginAbstract, InputPluginResult
 from ..exception import InputFileTypeError
+from ..func import line_break_pattern, line_breaks
 
 """
 这个插件是分析的从OSmartOne平台获取的输入文件，有两种情况
@@ -42,6 +43,37 @@ command_line_reg = (
 )
 command_line_reg2 = r'^------------------------------------------------------------$'
 
+# 在整个文件内容中查找命令分隔行使用的预编译正则, [^-] 不能跨行匹配换行符,
+# 行尾允许有 \r, 以 \r\n 换行的文件不需要先替换换行符
+command_line_pattern = re.compile(
+    command_line_reg.replace('[^-]', '[^-\\r\\n]').replace('$', '\\r?$'), re.MULTILINE
+)
+command_line_pattern2 = re.compile(command_line_reg2.replace('$', '\\r?$'), re.MULTILINE)
+command_line_prefix = '-' * 25  # 两种分隔行共同的开头, 用于快速定位候选行
+non_space_pattern = re.compile(r'\S')
+
+
+def search_line(pattern: Pattern, stream: str, pos: int) -> Optional[Match]:
+    """从行首位置 ``pos`` 开始查找第一个匹配 ``pattern`` 的行
+
+    先用 str.find 定位以 ``command_line_prefix`` 开头的行, 再用正则确认,
+    避免正则在每个位置上尝试匹配。
+    """
+    if stream.startswith(command_line_prefix, pos):
+        candidate = pos
+    else:
+        candidate = stream.find('\n' + command_line_prefix, pos)
+        candidate = candidate + 1 if candidate != -1 else -1
+
+    while candidate != -1:
+        match = pattern.match(stream, candidate)
+        if match:
+            return match
+        candidate = stream.find('\n' + command_line_prefix, candidate)
+        candidate = candidate + 1 if candidate != -1 else -1
+
+    return None
+
 
 class InputPluginWithSmartOne(InputPluginAbstract):
     """通过iSmartOne平台获取的输出"""
@@ -58,41 +90,79 @@ class InputPluginWithSmartOne(InputPluginAbstract):
         result.hostname = match.group('name')
         result.ip = match.group('ip')
 
-        cmd_dict = {}
-        content = []
-        command = ''
-
-        lines = stream.splitlines()
-        if re.match(command_line_reg, lines[0]):
-            state = 1  # 当开头是以----开头的时候，是情况一
+        # 不再将文件拆分为行的列表, 而是找到分隔行的位置后直接切片取出命令回显,
+        # 结果与逐行处理一致, 回显很大的文件(如 display logbuffer)可以节省大量内存。
+        # 只有 \n 和 \r\n 换行时在切片时处理 \r, 不需要复制整个文件内容
+        if not self._only_crlf(stream):
+            stream = line_break_pattern.sub('\n', stream)
 
+        if command_line_pattern.match(stream):
+            self._split_with_command_line(stream, result)  # 情况一
         else:
-            state = 2  # 否则是情况二
-
-        if state == 1:
-            for line in lines:
-                if re.match(command_line_reg, line):  # 当遇到的是第一种情况
-                    if command:  # 当有命令的时候，说明是上一个命令的结尾，要保存
-                        result.add_cmd(command, '\n'.join(content))
-                    command = re.match(command_line_reg, line).group('cmd')
-                    content.clear()  # 清空内容
-                    continue
-                content.append(line)
-
-        if state == 2:
-            for line in lines:
-                if not command:
-                    command = line.strip()  # 第一行为命令
-                    continue
-                if re.match(command_line_reg2, line):
-                    result.add_cmd(command, '\n'.join(content))
-                    command = ''
-                    content.clear()
-                    continue
-                content.append(line)
-
-        if content:
-            cmd_dict[command] = '\n'.join(content)
-
-        result.merge_cmd_dict(cmd_dict)
+            self._split_with_separator(stream, result)  # 情况二
+
         return result
+
+    @staticmethod
+    def _only_crlf(stream: str) -> bool:
+        """文件内容中是否只有 \n 和 \r\n 两种换行符"""
+        if any(char in stream for char in line_breaks[1:]):
+            return False
+        return '\r' not in stream or stream.count('\r') == stream.count('\r\n')
+
+    @staticmethod
+    def _content(stream: str, start: int, end: int) -> str:
+        """取出两个位置之间的回显, 去掉最后一个换行符, \r\n 替换为 \n"""
+        if stream.endswith('\n', start, end):
+            end -= 1
+            if stream.endswith('\r', start, end):
+                end -= 1
+        if start >= end:
+            return ''
+
+        content = stream[start:end]
+        if '\r' in content:
+            content = content.replace('\r\n', '\n')
+        return content
+
+    def _split_with_command_line(self, stream: str, result: InputPluginResult):
+        """情况一: 每个命令以 ----命令---- 的行开头"""
+        command = ''
+        start = 0  # 当前命令回显的开始位置
+
+        match = search_line(command_line_pattern, stream, 0)
+        while match:
+            if command:  # 当有命令的时候，说明是上一个命令的结尾，要保存
+                result.add_cmd(command, self._content(stream, start, match.start()))
+            command = match.group('cmd')
+            start = match.end() + 1
+            match = search_line(command_line_pattern, stream, start)
+
+        if command and start < len(stream):  # 最后一个命令至少有一行回显时才保存
+            result.add_cmd(command, self._content(stream, start, len(stream)))
+
+    def _split_with_separator(self, stream: str, result: InputPluginResult):
+        """情况二: 命令之间以 ------------ 的行分隔, 分隔后的第一个非空行为命令"""
+        pos = 0
+        length = len(stream)
+
+        while pos < length:
+            match = non_space_pattern.search(stream, pos)  # 第一行非空行为命令
+            if not match:
+                break
+
+            line_start = stream.rfind('\n', 0, match.start()) + 1
+            line_end = stream.find('\n', match.start())
+            if line_end == -1:
+                line_end = length
+            command = stream[line_start:line_end].strip()
+            pos = line_end + 1
+
+            separator = search_line(command_line_pattern2, stream, pos)
+            if separator is None:
+                if pos < length:  # 最后一个命令至少有一行回显时才保存
+                    result.add_cmd(command, self._content(stream, pos, length))
+                break
+
+            result.add_cmd(command, self._content(stream, pos, separator.start()))
+            pos = separator.end() + 1
@@ -1,5 +1,5 @@
 from rich import print
-from ..domain import OutputPluginAbstract
+from ..domain import AlarmLevel, OutputPluginAbstract
 
 
 class OutputPluginWithDeviceWarningLogging(OutputPluginAbstract):
@@ -9,7 +9,12 @@ class OutputPluginWithDeviceWarningLogging(OutputPluginAbstract):
 
     def main(self):
         for device in self.args.devices:
-            for warn in device.analysis_result:
+            result = device.analysis_result
+            # 没有关注及以上级别的告警时不需要逐条检查
+            if not result.count(AlarmLevel.FOCUS) and not result.count(AlarmLevel.WARNING):
+                continue
+
+            for warn in result:
                 if warn.above_focus:
                     print(
                         f"[green]%s[/] -- [{'red' if warn.is_warning else 'yellow'}]%s[/] -- %s"
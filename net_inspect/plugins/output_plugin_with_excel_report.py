@@ -1,17 +1,34 @@
 from __future__ import annotations
 
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, List, Tuple, Optional
+from typing import Deque, Dict, List, Tuple, Optional, Type
 
-from ..domain import OutputPluginAbstract
-from ..third_party.excel import CellContext, Excel
+from ..domain import Device, DeviceList, OutputPluginAbstract
+from ..logger import capture_records, replay_records
+from ..third_party.excel import CellContext, Excel, StreamingExcel
 
-if TYPE_CHECKING:
-    from ..domain import Device
+SHARD_BY = ('vendor', 'region', 'count')  # 支持的报告分组方式
 
 
 class OutputPluginWithExcelReport(OutputPluginAbstract):
-    """Microsoft Excel 巡检报告"""
+    """Microsoft Excel 巡检报告
+
+    参数 ``streaming`` 为 ``true`` 时使用只写模式逐行写入, 适用于设备数量很多的报告。
+
+    参数 ``shard_by`` 将报告拆分为多个文件, 每个分组的报告在单独的进程中生成,
+    输出路径中只保存链接到各个分组报告的索引:
+
+    - ``vendor``: 按照厂商分组
+    - ``region``: 按照设备名称的前缀分组, 前缀由 ``Values.region_pattern`` 匹配
+    - ``count``: 每 ``shard_size`` 台设备一个文件
+
+    参数 ``workers`` 为生成分组报告的进程数, 小于1时使用CPU核心数
+    """
 
     base_info_keys = [
         ('hostname', '设备名称'),
@@ -39,29 +56,181 @@ class OutputPluginWithExcelReport(OutputPluginAbstract):
         body_font: str = '等线'  # 内容字体
         body_font_size: int = 14  # 内容字体大小
         sn_lines: int = 10  # 序列号至少行数
+        streaming: bool = False  # 是否使用只写模式逐行写入
+        shard_by: str = ''  # 报告的分组方式, 为空时所有设备在一个文件中
+        shard_size: int = 100  # 按数量分组时每个文件的设备数
+        region_pattern: str = r'^[^\W_]+'  # 按区域分组时从设备名称中匹配区域的正则
+        workers: int = 1  # 生成分组报告的进程数
 
     def __init__(self):
-        self._excel: Optional[Excel] = None
+        self._excel: Optional[Excel | StreamingExcel] = None
         self.next_row = 1  # table的起始行号
 
         self.values = self.Values()
 
     @property
-    def excel(self) -> Excel:
+    def excel(self) -> Excel | StreamingExcel:
         if not self._excel:
-            self._excel = Excel()
-        
+            self._excel = StreamingExcel() if self.values.streaming else Excel()
+
         return self._excel
-        
 
     def main(self):
         """主程序"""
+        params = self.args.output_params or {}
+        if 'streaming' in params:
+            self.values.streaming = str(params['streaming']).lower() in ('true', '1', 'yes')
+        for key in ('shard_by', 'shard_size', 'region_pattern', 'workers'):
+            if key in params:
+                value_type = type(getattr(self.values, key))
+                setattr(self.values, key, value_type(params[key]))
+
         self.set_values()
+
+        if self.values.shard_by:
+            self.write_shards(self.args.devices, self.args.file_path)
+        else:
+            self.write_report(self.args.devices, self.args.file_path)
+
+    def write_report(self, devices: List[Device], file_path: str):
+        """将设备的报告写入一个文件
+
+        Args:
+            devices: 设备列表
+            file_path: 报告文件路径
+        """
+        self._excel = None  # 插件实例会被重复使用, 每次输出都使用新的工作簿
         self.set_excel()
 
-        for device in self.args.devices:
+        for device in devices:
             self.report(device)
-        self.excel.save(self.args.file_path)
+        self.excel.save(file_path)
+
+    def write_shards(self, devices: DeviceList, file_path: str):
+        """按照 ``Values.shard_by`` 将报告拆分为多个文件, 并在 ``file_path`` 中写入索引
+
+        分组报告保存在索引所在的目录中, 文件名为 ``<索引文件名>_<分组>.xlsx``。
+        并行写入时在子进程中调用 ``write_report``, 子进程中 ``self.args.output_params``
+        与主进程相同, ``self.args.devices`` 和 ``self.args.file_path`` 为这个分组的设备和报告路径,
+        重载 ``write_report`` 时应当使用传入的参数。
+
+        Args:
+            devices: 设备列表
+            file_path: 索引文件路径
+        """
+        shards = self.get_shards(devices)
+        files = self.get_shard_files(shards, file_path)
+
+        workers = self.values.workers
+        if workers < 1:
+            workers = os.cpu_count() or 1
+
+        if workers == 1 or len(shards) <= 1:
+            for name, shard in shards.items():
+                self.write_report(shard, files[name])
+        else:
+            workers = min(workers, len(shards))
+            pending: Deque[Future] = deque()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            ) as pool:
+                for name, shard in shards.items():
+                    # 最多提前提交 workers 个分组, 设备快照在提交时才生成, 不会同时保存所有设备的快照
+                    if len(pending) >= workers:
+                        replay_records(pending.popleft().result())
+                    # 子进程中只需要设备的基础信息和分析结果
+                    snapshots = [device.snapshot(commands=False) for device in shard]
+                    pending.append(
+                        pool.submit(
+                            _write_shard,
+                            type(self),
+                            self.values,
+                            self.args.output_params,
+                            snapshots,
+                            files[name],
+                        )
+                    )
+
+                while pending:  # 子进程出错时抛出异常
+                    replay_records(pending.popleft().result())  # 按照分组的顺序重放子进程中的日志
+
+        self.write_index(shards, files, file_path)
+
+    def get_shard_files(
+        self, shards: Dict[str, List[Device]], file_path: str
+    ) -> Dict[str, str]:
+        """返回每个分组报告的文件路径
+
+        分组名称中不能用于文件名的字符替换为 ``_``, 替换后与之前的分组重名时
+        (不区分大小写) 添加 ``_2`` 、 ``_3`` 这样的后缀, 保证每个分组写入不同的文件。
+
+        Args:
+            shards: ``get_shards`` 返回的分组
+            file_path: 索引文件路径
+
+        Returns:
+            {分组名称: 文件路径}
+        """
+        root, ext = os.path.splitext(str(file_path))
+        files = {}
+        used = set()  # 已经使用的文件名, 小写
+        for name in shards:
+            base = re.sub(r'[^\w.-]+', '_', name)
+            safe_name, suffix = base, 1
+            while safe_name.lower() in used:
+                suffix += 1
+                safe_name = f'{base}_{suffix}'
+            used.add(safe_name.lower())
+            files[name] = '{}_{}{}'.format(root, safe_name, ext or '.xlsx')
+        return files
+
+    def get_shards(self, devices: DeviceList) -> Dict[str, List[Device]]:
+        """按照 ``Values.shard_by`` 对设备分组, 分组按照第一台设备出现的顺序排列
+
+        Args:
+            devices: 设备列表
+
+        Returns:
+            {分组名称: 设备列表}
+        """
+        shard_by = self.values.shard_by
+        if shard_by not in SHARD_BY:
+            raise ValueError(f'shard_by 必须是 {SHARD_BY} 中的一个')
+
+        shards: Dict[str, List[Device]] = {}
+        region = re.compile(self.values.region_pattern)
+        for i, device in enumerate(devices):
+            if shard_by == 'vendor':
+                name = device.info.vendor or 'unknown'
+            elif shard_by == 'region':
+                match = region.search(device.info.hostname)
+                name = match.group(0) if match else 'unknown'
+            else:
+                size = max(self.values.shard_size, 1)
+                name = f'{i // size + 1}'
+            shards.setdefault(name, []).append(device)
+
+        return shards
+
+    def write_index(self, shards: Dict[str, List[Device]], files: Dict[str, str], file_path: str):
+        """写入链接到各个分组报告的索引
+
+        Args:
+            shards: {分组名称: 设备列表}
+            files: {分组名称: 分组报告路径}
+            file_path: 索引文件路径
+        """
+        index = Excel()
+        index.set_all_column_width(self.values.column_width, 'C')
+        index.write_block(
+            [[CellContext(title).set_font(bold=True) for title in ('分组', '设备数量', '文件')]]
+        )
+        for name, shard in shards.items():
+            file_name = os.path.basename(files[name])
+            row = index.write_block([[name, len(shard), file_name]])
+            index.sheet.cell(row, 3).hyperlink = file_name  # 与索引在同一目录中的相对路径
+        index.save(file_path)
 
     def set_values(self):
         """可以用于重载设置Value值"""
@@ -111,16 +280,15 @@ class OutputPluginWithExcelReport(OutputPluginAbstract):
         """生成序列号"""
         self.report_title('2. 序列号')
 
-        sn_list = device.info.sn
+        sn_list = list(device.info.sn)  # 补齐行数时不修改设备的基础信息
         if self.values.sn_lines > len(sn_list):
             for _ in range(self.values.sn_lines - len(sn_list)):
                 sn_list.append(('', ''))
 
-        for pid, sn in sn_list:
-            self.excel.write_rows(
-                rows=[[CellContext(pid), CellContext(sn)]],
-                merge=[('A', 'B'), ('C', self.values.max_column)],
-            )
+        self.excel.write_block(
+            rows=[[CellContext(pid), CellContext(sn)] for pid, sn in sn_list],
+            merge=[('A', 'B'), ('C', self.values.max_column)],
+        )
 
     def report_status(self, device: Device):
         """生成状态信息"""
@@ -170,3 +338,37 @@ class OutputPluginWithExcelReport(OutputPluginAbstract):
                 rows[-1].extend([title, value])
 
         return rows
+
+
+def _write_shard(
+    plugin_cls: Type[OutputPluginWithExcelReport],
+    values: OutputPluginWithExcelReport.Values,
+    output_params: Optional[Dict[str, str]],
+    snapshots: List[Tuple],
+    file_path: str,
+) -> List[Tuple[str, str]]:
+    """在子进程中生成一个分组的报告
+
+    与解析和分析的子进程一样收集日志, 由主进程重放
+
+    Args:
+        plugin_cls: 输出插件的类, 需要可以在子进程中导入
+        values: 插件的设置
+        output_params: 主进程中传入插件的参数
+        snapshots: ``Device.snapshot`` 返回的设备快照
+        file_path: 报告文件路径
+
+    Returns:
+        List[Tuple[str, str]]: 子进程中的日志
+    """
+    records = capture_records()
+    plugin = plugin_cls()
+    plugin.values = values
+    devices = DeviceList()
+    for snapshot in snapshots:
+        devices.append(Device.from_snapshot(snapshot, None))
+    plugin.args = plugin_cls.OutputArgs(
+        devices=devices, file_path=file_path, output_params=output_params
+    )
+    plugin.write_report(devices, file_path)
+    return list(records)
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
+import copy
+import hashlib
 import os
 import re
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Pattern, Tuple
 
+import textfsm
 from ntc_templates.parse import __file__ as model_file
 from ntc_templates.parse import get_clitable, parse_output
+from textfsm import clitable
 
 from .. import exception
 from ..domain import ParsePluginAbstract
-from ..func import reg_extend
+from ..func import make_rows, reg_extend
+from ..metrics import TEMPLATE, metrics
 
 if TYPE_CHECKING:
     from ..domain import Cmd
@@ -25,6 +32,99 @@ except ImportError:
     CHECK_NTC_TEMPLATES = False
 
 
+class TemplateCache:
+    """编译后的TextFSM模板的LRU缓存
+
+    缓存的键为 (模板目录, 模板文件名, 修改时间), 模板文件修改后会重新编译。
+    取出的模板是缓存模板的副本, 只复制解析过程中会改变的Value状态, 可以在多线程中使用。
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0  # 命中次数
+        self.misses = 0  # 未命中次数
+        self._cache: OrderedDict[Tuple[str, str, float], textfsm.TextFSM] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        """跨进程传递时只保留配置, 编译后的模板在子进程中重新生成"""
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['maxsize'])
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, template_file: str) -> textfsm.TextFSM:
+        """获取一个可以直接用于解析的TextFSM对象
+
+        Args:
+            template_file: 模板文件的路径
+
+        Returns:
+            textfsm.TextFSM: 已经重置状态的模板副本
+        """
+        key = (
+            os.path.dirname(template_file),
+            os.path.basename(template_file),
+            os.path.getmtime(template_file),
+        )
+
+        with self._lock:
+            fsm = self._cache.get(key)
+            if fsm is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+
+        if fsm is None:
+            with open(template_file, 'r') as f:
+                fsm = textfsm.TextFSM(f)
+
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = fsm
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+
+        return self._clone(fsm)
+
+    def info(self) -> Dict[str, int]:
+        """返回缓存的统计信息"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'maxsize': self.maxsize,
+            'currsize': len(self._cache),
+        }
+
+    def clear(self):
+        """清空缓存和统计信息"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @staticmethod
+    def _clone(fsm: textfsm.TextFSM) -> textfsm.TextFSM:
+        """复制模板, 状态和规则在解析时不会改变, 可以共享,
+        只需要复制Value以及Value的选项"""
+        clone = copy.copy(fsm)
+        clone.values = []
+        for value in fsm.values:
+            new_value = copy.copy(value)
+            new_value.fsm = clone
+            new_value.options = []
+            for option in value.options:
+                new_option = copy.copy(option)
+                new_option.value = new_value
+                new_value.options.append(new_option)
+            clone.values.append(new_value)
+
+        clone.Reset()
+        return clone
+
+
 class ParsePluginWithNtcTemplates(ParsePluginAbstract):
     """
     使用ntc-templates-elinpf解析命令
@@ -38,6 +138,61 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
 
         dir: str = ''
         index_commands: Dict[str, List[str]] = field(default_factory=lambda: {})
+        # 缓存 (platform, command) -> 模板文件路径列表
+        template_files: Dict[Tuple[str, str], List[str]] = field(
+            default_factory=lambda: {}
+        )
+        # 每个平台预编译好的命令匹配正则, 为None时退回逐条匹配
+        index_matchers: Dict[str, Optional[Pattern]] = field(
+            default_factory=lambda: {}
+        )
+
+        def __post_init__(self):
+            self.index_matchers = {
+                platform: self._compile_commands(commands)
+                for platform, commands in self.index_commands.items()
+            }
+
+        @staticmethod
+        def _compile_commands(commands: List[str]) -> Optional[Pattern]:
+            """将平台的所有命令合并为一个正则, 每条命令使用一个命名组,
+            按照index中的顺序匹配, 与逐条匹配的优先级一致"""
+            reg = '|'.join(
+                f'(?P<cmd{i}>^{reg_extend(cmd_reg)}$)'
+                for i, cmd_reg in enumerate(commands)
+            )
+            try:
+                return re.compile(reg)
+            except re.error:  # pragma: no cover
+                return None
+
+        def match_command(self, platform: str, command: str) -> str:
+            """在平台的命令列表中查找匹配的命令
+
+            Args:
+                platform: 平台名称
+                command: 命令
+
+            Returns:
+                str: 去掉简写标记的命令, 没有匹配时返回空字符串
+            """
+            commands = self.index_commands[platform]
+            matcher = self.index_matchers.get(platform)
+            if matcher is None:
+                for cmd_reg in commands:
+                    if re.match(f'^{reg_extend(cmd_reg)}$', command):
+                        return re.sub(r'[\[|\]]', '', cmd_reg)
+                return ''
+
+            match = matcher.match(command)
+            if not match:
+                return ''
+
+            # 外层的命名组最后闭合, 所以lastgroup就是匹配到的命令
+            cmd_reg = commands[int(match.lastgroup[3:])]
+            return re.sub(r'[\[|\]]', '', cmd_reg)
+
+    template_cache_size = 256  # 编译后模板的缓存数量
 
     def __init__(self):
 
@@ -50,6 +205,11 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
             raise ImportError(msg)
 
         ntc_templates_dir = os.path.join(os.path.dirname(model_file), 'templates')
+        # 缓存 (platform, command) -> (match_command, textfsm_info)
+        self._match_cache: Dict[Tuple[str, str], Optional[Tuple[str, TextFsmInfo]]] = {}
+        self.template_cache = TemplateCache(self.template_cache_size)
+        # 缓存 (模板路径, 修改时间, 文件大小) -> 模板文件内容的hash
+        self._template_hashes: Dict[Tuple[str, int, int], str] = {}
         self.textfms_info_dict = {
             'external': self.TextFsmInfo(),
             'ntc_templates': self.TextFsmInfo(
@@ -66,10 +226,10 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
         if not os.path.isdir(template_dir):
             raise exception.TemplateError(f'外部模板路径:{template_dir!r} 不存在.')
 
-        self.textfms_info_dict['external'].dir = template_dir
-        self.textfms_info_dict['external'].index_commands = self._get_index_commands(
-            template_dir
+        self.textfms_info_dict['external'] = self.TextFsmInfo(
+            dir=template_dir, index_commands=self._get_index_commands(template_dir)
         )
+        self._match_cache.clear()
 
     def _get_index_commands(self, textfsm_dir: str) -> Dict[str, List[str]]:
         """将ntc-templates中的index文件提取出来，
@@ -105,6 +265,28 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
 
         return commands
 
+    def _search_command(
+        self, command: str, platform: str
+    ) -> Optional[Tuple[str, TextFsmInfo]]:
+        """按照外部模板优先, ntc_templates其次的顺序查找命令对应的模板
+
+        Args:
+            command: 命令
+            platform: 命令所属平台
+
+        Returns:
+            匹配到的命令和模板信息, 没有匹配时返回None
+        """
+        for textfsm_info in self.textfms_info_dict.values():
+            if platform not in textfsm_info.index_commands:  # 检查是否有匹配的平台
+                continue
+
+            match_command = textfsm_info.match_command(platform, command)
+            if match_command:
+                return match_command, textfsm_info
+
+        return None
+
     @contextmanager
     def _pre_parse(self, command: str, platform: str):
         """预处理重复内容
@@ -113,28 +295,17 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
             command: 命令
             platform: 命令所属平台
         """
-        for type, textfsm_info in self.textfms_info_dict.items():
-            if platform not in textfsm_info.index_commands:  # 检查是否有匹配的平台
-                if type == 'external':  # 如果是外部的textFSM模板，则进入ntc_templates中
-                    continue
-                else:
-                    raise exception.TemplateNotSupperThisPlatform(platform)
-
-            platform_commands_reg = textfsm_info.index_commands[platform]
-            match_command = ''
-            for cmd_reg in platform_commands_reg:
-                if re.match(f'^{reg_extend(cmd_reg)}$', command):
-                    match_command = re.sub(r'[\[|\]]', '', cmd_reg)
-                    break
-
-            if match_command == '':  # 检查是否有匹配的命令
-                if type == 'external':
-                    continue
-                else:
-                    raise exception.TemplateNotSupperThisCommand(platform, command)
+        key = (platform, command)
+        if key not in self._match_cache:
+            self._match_cache[key] = self._search_command(command, platform)
 
-            yield (match_command, textfsm_info)
-            break
+        result = self._match_cache[key]
+        if result is None:
+            if platform not in self.textfms_info_dict['ntc_templates'].index_commands:
+                raise exception.TemplateNotSupperThisPlatform(platform)
+            raise exception.TemplateNotSupperThisCommand(platform, command)
+
+        yield result
 
     def main(self, cmd: Cmd, platform: str) -> Dict[str, str]:
         """识别是否为index中的命令，如果是则使用textFSM解析
@@ -150,11 +321,11 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
 
         with self._pre_parse(command, platform) as (match_command, textfsm_info):
             try:
-                res = parse_output(
+                res = self._parse_output(
                     platform=platform,
                     command=match_command,
                     data=cmd.content,
-                    template_dir=textfsm_info.dir,
+                    textfsm_info=textfsm_info,
                 )
             except Exception as e:
                 raise exception.TemplateError(
@@ -165,6 +336,112 @@ class ParsePluginWithNtcTemplates(ParsePluginAbstract):
                 raise exception.NotParseAnyResult(platform, command)
             return res
 
+    def _get_template_files(
+        self, platform: str, command: str, textfsm_info: TextFsmInfo
+    ) -> List[str]:
+        """通过index文件找到命令对应的模板文件路径
+
+        Args:
+            platform: 命令所属平台
+            command: index中匹配到的命令
+            textfsm_info: 模板信息
+
+        Returns:
+            模板文件路径列表
+        """
+        key = (platform, command)
+        if key not in textfsm_info.template_files:
+            cli_table = clitable.CliTable('index', textfsm_info.dir)
+            attrs = {'Command': command, 'Platform': platform}
+            row_idx = cli_table.index.GetRowMatch(attrs)
+            if not row_idx:
+                raise clitable.CliTableError(
+                    f'No template found for attributes: "{attrs}"'
+                )
+
+            templates = cli_table.index.index[row_idx]['Template']
+            textfsm_info.template_files[key] = [
+                os.path.join(textfsm_info.dir, template)
+                for template in templates.split(':')
+            ]
+
+        return textfsm_info.template_files[key]
+
+    def _parse_output(
+        self, platform: str, command: str, data: str, textfsm_info: TextFsmInfo
+    ) -> List[Dict[str, str]]:
+        """使用缓存的TextFSM模板解析, 结果与 ``ntc_templates.parse.parse_output`` 一致
+
+        Args:
+            platform: 命令所属平台
+            command: index中匹配到的命令
+            data: 命令回显
+            textfsm_info: 模板信息
+
+        Returns:
+            解析后的结果
+        """
+        template_files = self._get_template_files(platform, command, textfsm_info)
+        template_name = ':'.join(os.path.basename(file) for file in template_files)
+
+        with metrics.timer(TEMPLATE, template_name):
+            if len(template_files) > 1:  # 多个模板需要合并表格, 交给ntc_templates处理
+                return parse_output(
+                    platform=platform,
+                    command=command,
+                    data=data,
+                    template_dir=textfsm_info.dir,
+                )
+
+            fsm = self.template_cache.get(template_files[0])
+            return make_rows(fsm.header, fsm.ParseText(data))
+
+    def template_signature(self, cmd: Cmd, platform: str) -> str:
+        """返回解析命令所用模板文件内容的hash, 模板修改后签名随之改变
+
+        Args:
+            cmd: Cmd类
+            platform: 命令所属平台
+
+        Returns:
+            str: 模板签名, 没有对应模板时返回空字符串
+        """
+        try:
+            with self._pre_parse(cmd.command, platform) as (match_command, info):
+                template_files = self._get_template_files(platform, match_command, info)
+        except (exception.TemplateError, clitable.CliTableError):
+            return ''
+
+        return ','.join(self._template_hash(file) for file in template_files)
+
+    def _template_hash(self, template_file: str) -> str:
+        """计算模板文件内容的hash"""
+        stat = os.stat(template_file)
+        key = (template_file, stat.st_mtime_ns, stat.st_size)
+        if key not in self._template_hashes:
+            with open(template_file, 'rb') as f:
+                self._template_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+        return self._template_hashes[key]
+
+    def templates_signature(self) -> str:
+        """返回所有模板目录中文件的 (路径, 大小, 修改时间) 的hash
+
+        Returns:
+            str: 模板签名
+        """
+        sha = hashlib.sha256()
+        for name, info in sorted(self.textfms_info_dict.items()):
+            if not info.dir:
+                continue
+            sha.update(f'{name}\0{info.dir}\0'.encode('utf-8'))
+            for root, dirs, files in os.walk(info.dir):
+                dirs.sort()
+                for file in sorted(files):
+                    stat = os.stat(os.path.join(root, file))
+                    path = os.path.relpath(os.path.join(root, file), info.dir)
+                    sha.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode())
+        return sha.hexdigest()
+
     def get_clitable(self, command: str, platform: str) -> dict:
         """通过执行一个空内容的textfsm文件，获得一个字典
 
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Tuple
+import functools
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple
 
 try:
-    from openpyxl.styles import Alignment, Border, Font, Side
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, Side
     from openpyxl.utils import column_index_from_string, get_column_letter
     from openpyxl.workbook import Workbook
+    from openpyxl.worksheet.merge import MergedCellRange
 
     if TYPE_CHECKING:
+        from openpyxl.worksheet._write_only import WriteOnlyWorksheet
         from openpyxl.worksheet.worksheet import Worksheet
 
 except ImportError:  # pragma: no cover
@@ -17,7 +22,13 @@ else:
     CHECK_IMPORT = True
 
 
-msg = "Please install openpyxl first"
+msg = "Please install openpyxl first: pip install net_inspect[excel]"
+
+# 只写模式替换 merged_cells 已经验证过的 openpyxl 版本范围 [最低版本, 最高版本),
+# 与 pyproject.toml 中 excel 扩展的版本范围相同
+STREAMING_MERGE_VERSIONS = ((3, 0, 10), (3, 2))
+
+MERGE = List[Tuple[str, str]]  # 每行合并单元格的范围, 例如: [('A', 'B'), ('C', 'D')]
 
 
 class Excel:
@@ -26,6 +37,7 @@ class Excel:
             raise ImportError(msg)  # pragma: no cover
 
         self.wb, self.sheet = self.init_excel()
+        self.styles = StyleRegistry(self.wb)
         self.next_row = 1  # table的起始行号
 
     def init_excel(self) -> Tuple[Workbook, Worksheet]:
@@ -42,15 +54,11 @@ class Excel:
         for col in range(1, column_index_from_string(max_col) + 1):
             self.sheet.column_dimensions[get_column_letter(col)].width = width
 
-    def write_row(self, row: List[CellContext | str], merge: List[Tuple[str, str]] = None):
+    def write_row(self, row: List[CellContext | str], merge: MERGE = None):
         """写入一行数据"""
-        self.write_rows([row], merge)
+        self.write_block([row], merge)
 
-    def write_rows(
-        self,
-        rows: List[List[CellContext | str]],
-        merge: List[Tuple[str, str]] = None,
-    ):
+    def write_rows(self, rows: List[List[CellContext | str]], merge: MERGE = None):
         """
         这个方法是按行来进行写入的, 并且合并操作是每行都会执行一次
 
@@ -59,75 +67,326 @@ class Excel:
             - merge: 合并单元格的范围, 例如: [('A', 'B'), ('C', 'D')]
 
         """
-        # 将 str 转化为 CellContext
-        for row_list in rows:
-            for i, row in enumerate(row_list):
-                if isinstance(row, str):
-                    row_list[i] = CellContext(row)
-
-
-        # 获取要跳过的列
-        skip_cols = []
-        if merge:
-            for merge_item in merge:
-                start_col = column_index_from_string(merge_item[0]) + 1
-                end_col = column_index_from_string(merge_item[1])
-                if start_col == end_col:
-                    skip_cols.append(start_col)
-                else:
-                    skip_cols.extend(range(start_col, end_col + 1))
-
-        for i, row in enumerate(rows):
-            col_i = 1
-            while row:
-                # 跳过合并过的单元格
-                if col_i in skip_cols:
-                    col_i += 1
-                    continue
-
-                current_row = self.next_row + i
-
-                current_cell = self.sheet.cell(current_row, col_i)
-                cell = row.pop(0)
-                current_cell.value = cell.value
-                current_cell.alignment = cell.align
-                current_cell.border = cell.border
-                current_cell.font = cell.font
-                col_i += 1
-
-            if merge is not None:  # 对每行进行合并
-                for col_start, col_end in merge:
-                    col_start = column_index_from_string(col_start)
-                    col_end = column_index_from_string(col_end)
-                    self.sheet.merge_cells(
-                        start_row=self.next_row + i,
-                        start_column=col_start,
-                        end_row=self.next_row + i,
-                        end_column=col_end,
-                    )
-        self.next_row += len(rows)  # 更新行号
+        self.write_block(rows, merge)
+
+    def write_block(self, rows: List[List[CellContext | Any]], merge: MERGE = None) -> int:
+        """一次写入多行数据, 每行按照相同的范围合并单元格
+
+        每个值依次写入没有被合并的列, 不是 ``CellContext`` 的值使用默认样式。
+        单元格引用 ``StyleRegistry`` 中共享的命名样式, 合并的范围不会重叠,
+        使用 ``_merge_cells`` 加入工作表, 不再逐个检查已有的范围。
+
+        Args:
+            rows: 每行数据的每个数据
+            merge: 合并单元格的范围, 例如: [('A', 'B'), ('C', 'D')]
+
+        Returns:
+            int: 写入的第一行的行号
+        """
+        layout = get_merge_layout(tuple(merge or ()))
+        first_row = self.next_row
+
+        for row in rows:
+            col = 1
+            for value in row:
+                cell = value if isinstance(value, CellContext) else CellContext(value)
+                sheet_cell = self.sheet.cell(self.next_row, col)
+                sheet_cell.value = cell.value
+                sheet_cell.style = self.styles.get(cell)
+                col += 1 + layout.spans.get(col, 0)  # 跳过合并过的单元格
+
+            for cell_range in layout.iter_ranges(self.next_row):
+                _merge_cells(self.sheet, cell_range)
+
+            self.next_row += 1
+
+        return first_row
+
+
+class StreamingExcel:
+    """使用只写模式的工作簿逐行写入 Excel, 与 ``Excel`` 的写入接口相同
+
+    写入的行直接输出到临时文件, 不保存单元格对象, 内存占用与行数无关。
+    单元格只引用 ``StyleRegistry`` 中共享的命名样式;
+    同一种合并方式的布局只计算一次, 每行只记录行号和布局。
+    只能按顺序追加行, 列宽需要在写入第一行之前设置。
+
+    当前的 openpyxl 不支持替换只写模式的 ``merged_cells`` 时 (见 ``_supports_streaming_merge``),
+    使用普通模式的工作表并通过 ``_merge_cells`` 合并, 输出相同但是内存占用与行数有关。
+    """
+
+    def __init__(self):
+        if not CHECK_IMPORT:
+            raise ImportError(msg)  # pragma: no cover
+
+        self.merged: _MergeLayouts | None = None
+        if _supports_streaming_merge():
+            self.wb = Workbook(write_only=True)
+            self.sheet: WriteOnlyWorksheet | Worksheet = self.wb.create_sheet()
+            # NOTE 只写模式的工作表没有公开的合并方法。保存时 openpyxl 的
+            # WorksheetWriter.write_merged_cells 只判断 merged_cells 是否为空并遍历其中的范围,
+            # 这里替换为只记录行号和布局的 _MergeLayouts
+            self.merged = _MergeLayouts()
+            self.sheet.merged_cells = self.merged
+        else:
+            self.wb = Workbook()
+            self.sheet = self.wb.active
+        self.styles = StyleRegistry(self.wb)
+        self.next_row = 1  # table的起始行号
+
+    def save(self, file_path: str):
+        self.wb.save(file_path)
+
+    def set_all_column_width(self, width: int, max_col: str = 'A'):
+        """设置所有列的宽度, 必须在写入之前设置"""
+        for col in range(1, column_index_from_string(max_col) + 1):
+            self.sheet.column_dimensions[get_column_letter(col)].width = width
+
+    def write_row(self, row: List[CellContext | str], merge: MERGE = None):
+        """写入一行数据"""
+        self.write_block([row], merge)
+
+    def write_rows(self, rows: List[List[CellContext | str]], merge: MERGE = None):
+        """按行写入数据, 合并操作是每行都会执行一次
+
+        Args:
+            - rows: 每行数据的每个数据
+            - merge: 合并单元格的范围, 例如: [('A', 'B'), ('C', 'D')]
+        """
+        self.write_block(rows, merge)
+
+    def write_block(self, rows: List[List[CellContext | Any]], merge: MERGE = None) -> int:
+        """一次写入多行数据, 每行按照相同的范围合并单元格
+
+        被合并的单元格使用合并范围第一个单元格的样式, 合并后的边框与 ``Excel`` 一致。
+
+        Args:
+            rows: 每行数据的每个数据
+            merge: 合并单元格的范围, 例如: [('A', 'B'), ('C', 'D')]
+
+        Returns:
+            int: 写入的第一行的行号
+        """
+        layout = get_merge_layout(tuple(merge or ()))
+        first_row = self.next_row
+
+        for row in rows:
+            cells = []
+            for value in row:
+                cell = value if isinstance(value, CellContext) else CellContext(value)
+                style = self.styles.get(cell)
+
+                write_cell = WriteOnlyCell(self.sheet, value=cell.value)
+                write_cell.style = style
+                cells.append(write_cell)
+
+                # 跳过合并的列, 合并范围内的其他单元格只写入样式
+                for _ in range(layout.spans.get(len(cells), 0)):
+                    merged_cell = WriteOnlyCell(self.sheet)
+                    merged_cell.style = style
+                    cells.append(merged_cell)
+
+            self.sheet.append(cells)
+            if self.merged is not None:
+                if layout.ranges:
+                    self.merged.add(self.next_row, layout)
+            else:
+                for cell_range in layout.iter_ranges(self.next_row):
+                    _merge_cells(self.sheet, cell_range)
+            self.next_row += 1
+
+        return first_row
+
+
+class StyleRegistry:
+    """将相同的 (字体, 对齐, 边框) 注册为工作簿中共享的命名样式
+
+    单元格只需要引用样式的名称, 不再逐个设置字体、对齐和边框。
+    """
+
+    prefix = 'net_inspect'  # 命名样式的名称前缀
+
+    def __init__(self, wb: Workbook):
+        self.wb = wb
+        self._names: Dict[Tuple[Font, Alignment, Border], str] = {}  # 样式 -> 名称
+        # 按照对象id查找, 避免每次计算样式的hash; 保存的对象不会被回收, id不会被复用
+        self._by_id: Dict[Tuple[int, int, int], str] = {}
+        self._keep: List[Tuple[Font, Alignment, Border]] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get(self, cell: CellContext) -> str:
+        """返回单元格样式对应的命名样式的名称, 没有时注册一个新的
+
+        Args:
+            cell: 单元格
+
+        Returns:
+            str: 命名样式的名称
+        """
+        key = (cell.font, cell.align, cell.border)
+        ids = (id(key[0]), id(key[1]), id(key[2]))
+        name = self._by_id.get(ids)
+        if name is not None:
+            return name
+
+        name = self._names.get(key)
+        if name is None:
+            name = f'{self.prefix}_{len(self._names)}'
+            self.wb.add_named_style(
+                NamedStyle(name=name, font=key[0], alignment=key[1], border=key[2])
+            )
+            self._names[key] = name
+
+        self._by_id[ids] = name
+        self._keep.append(key)
+        return name
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(
+    name: str = '等线',
+    size: int = 10,
+    bold: bool = False,
+    italic: bool = False,
+    strike: bool = False,
+    color: str = '000000',
+) -> Font:
+    """返回共享的字体对象, 相同的参数只创建一次, 不能修改返回的对象"""
+    return Font(name=name, size=size, bold=bold, italic=italic, strike=strike, color=color)
+
+
+@functools.lru_cache(maxsize=None)
+def get_alignment(horizontal: str = 'center', vertical: str = 'center') -> Alignment:
+    """返回共享的对齐方式对象, 不能修改返回的对象"""
+    return Alignment(horizontal=horizontal, vertical=vertical)
+
+
+@functools.lru_cache(maxsize=None)
+def get_border(border_style: str = 'thin', color: str = '000000') -> Border:
+    """返回四边相同的共享边框对象, 不能修改返回的对象"""
+    side = Side(border_style=border_style, color=color)
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+class MergeLayout:
+    """一行中合并单元格的布局"""
+
+    __slots__ = ('spans', 'ranges')
+
+    def __init__(self, merge: Tuple[Tuple[str, str], ...]):
+        self.spans: Dict[int, int] = {}  # 合并开始的列号 -> 合并的额外列数
+        self.ranges: List[Tuple[str, str]] = []  # 合并范围的起止列字母
+
+        for col_start, col_end in merge:
+            start = column_index_from_string(col_start)
+            end = column_index_from_string(col_end)
+            if end > start:
+                self.spans[start] = end - start
+                self.ranges.append((get_column_letter(start), get_column_letter(end)))
+
+    def iter_ranges(self, row: int) -> Iterator[str]:
+        """产出指定行中合并的范围, 例如 ``A1:F1``"""
+        for start, end in self.ranges:
+            yield f'{start}{row}:{end}{row}'
+
+
+@functools.lru_cache(maxsize=None)
+def get_merge_layout(merge: Tuple[Tuple[str, str], ...]) -> MergeLayout:
+    """计算合并方式的布局, 相同的合并方式只计算一次"""
+    return MergeLayout(merge)
+
+
+def _merge_cells(sheet: Worksheet, cell_range: str):
+    """合并单元格, 结果与 ``sheet.merge_cells`` 相同
+
+    ``merge_cells`` 中的 ``MultiCellRange.add`` 会逐个检查已有的范围,
+    耗时与合并的次数的平方成正比 (见 benchmarks/bench_excel.py)。
+    写入的范围不会重叠, 这里直接加入范围的集合,
+    再与 ``merge_cells`` 一样调用 ``_clean_merge_range`` 设置边框。
+
+    NOTE 用到了 openpyxl 的内部实现 ``MultiCellRange.ranges`` 和
+    ``Worksheet._clean_merge_range``, 已在 openpyxl 3.0.10 和 3.1.0 ~ 3.1.5 上验证,
+    安装 ``net_inspect[excel]`` 时限制在这个版本范围内; 内部实现不存在时使用公开的 ``merge_cells``
+    """
+    ranges = getattr(sheet.merged_cells, 'ranges', None)
+    clean = getattr(sheet, '_clean_merge_range', None)
+    if clean is None or not isinstance(ranges, (set, list)):  # pragma: no cover
+        sheet.merge_cells(cell_range)
+        return
+
+    merged = MergedCellRange(sheet, cell_range)
+    if isinstance(ranges, set):
+        ranges.add(merged)
+    else:  # pragma: no cover
+        ranges.append(merged)  # openpyxl 3.0 中是列表
+    clean(merged)
+
+
+@functools.lru_cache(maxsize=None)
+def _supports_streaming_merge() -> bool:
+    """当前的 openpyxl 是否可以用 ``_MergeLayouts`` 替换只写模式工作表的 ``merged_cells``
+
+    版本不在 ``STREAMING_MERGE_VERSIONS`` 范围内, 或者保存合并范围的实现与验证时不同时返回False
+    """
+    try:
+        from openpyxl import __version__
+        from openpyxl.worksheet._writer import WorksheetWriter
+        from openpyxl.worksheet.cell_range import MultiCellRange
+    except ImportError:  # pragma: no cover
+        return False
+
+    version = tuple(int(part) for part in re.findall(r'\d+', __version__)[:3])
+    low, high = STREAMING_MERGE_VERSIONS
+    if not low <= version < high:
+        return False
+
+    sheet = Workbook(write_only=True).create_sheet()
+    return hasattr(WorksheetWriter, 'write_merged_cells') and isinstance(
+        getattr(sheet, 'merged_cells', None), MultiCellRange
+    )
+
+
+class _MergeLayouts:
+    """只写模式的工作表中合并的范围, 只记录行号和布局, 保存时才生成范围字符串
+
+    代替工作表的 ``merged_cells``, 实现了 openpyxl 保存时用到的 ``__bool__`` 和 ``__iter__``
+    """
+
+    def __init__(self):
+        self._rows: List[Tuple[int, MergeLayout]] = []
+
+    def add(self, row: int, layout: MergeLayout):
+        self._rows.append((row, layout))
+
+    def __bool__(self) -> bool:
+        return bool(self._rows)
+
+    def __len__(self) -> int:
+        return sum(len(layout.ranges) for _, layout in self._rows)
+
+    def __iter__(self) -> Iterator[str]:
+        for row, layout in self._rows:
+            yield from layout.iter_ranges(row)
 
 
 class CellContext:
-    """对单元格设置进行集成"""
+    """对单元格设置进行集成
+
+    字体、对齐和边框使用共享的对象, 创建单元格时不再创建新的样式对象
+    """
 
     class Style:
         def __init__(self):
             if not CHECK_IMPORT:
                 raise ImportError(msg)  # pragma: no cover
 
-            self.align: str = Alignment(horizontal='center', vertical='center')
-            self.border: str = Border(
-                left=Side(border_style='thin', color='000000'),
-                right=Side(border_style='thin', color='000000'),
-                top=Side(border_style='thin', color='000000'),
-                bottom=Side(border_style='thin', color='000000'),
-            )
-            self.font: str = Font(
-                name='等线', size=10, bold=False, italic=False, strike=False, color='000000'
-            )
+            self.align: Alignment = get_alignment()
+            self.border: Border = get_border()
+            self.font: Font = get_font()
 
-    def __init__(self, value: str):
+    def __init__(self, value: Any):
         if not CHECK_IMPORT:
             raise ImportError(msg)  # pragma: no cover
 
@@ -143,18 +402,18 @@ class CellContext:
     def align(self) -> Alignment:
         return self.style.align
 
-    def set_align(self, align: str) -> Style:
+    def set_align(self, align: str) -> CellContext:
         """设置对齐方式"""
-        self.style.align = Alignment(horizontal=align)
+        self.style.align = get_alignment(horizontal=align, vertical=None)
         return self
 
     @property
     def border(self) -> Border:
         return self.style.border
 
-    def set_border(self, border: str) -> Style:
+    def set_border(self, border: str) -> CellContext:
         """设置边框"""
-        self.style.border = Border(border_style=border)
+        self.style.border = get_border(border_style=border)
         return self
 
     @property
@@ -169,9 +428,9 @@ class CellContext:
         italic: bool = False,
         strike: bool = False,
         color: str = '000000',
-    ) -> Style:
+    ) -> CellContext:
         """设置字体"""
-        self.style.font = Font(
+        self.style.font = get_font(
             name=name, size=size, bold=bold, italic=italic, strike=strike, color=color
         )
         return self
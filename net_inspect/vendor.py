@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Dict, Type
+from typing import TYPE_CHECKING, Dict, List, Optional, Pattern, Tuple, Type
+import inspect
 import re
 
 from .func import reg_extend
@@ -8,7 +9,31 @@ if TYPE_CHECKING:
     from .domain import Cmd
 
 
-class DefaultVendor:
+# check_vendor 用到的识别方法, 子类重载了其中任意一个时不能预编译
+DETECT_HOOKS = ('_check_vendor', '_check_version_command')
+
+
+class VendorMeta(type):
+    """厂商类的元类, 定义新的厂商类或者修改厂商类的属性时增加版本号,
+    厂商识别器根据版本号判断是否需要重新构建, 不需要每次识别都检查所有厂商类的属性
+    """
+
+    version = 0
+
+    def __init__(cls, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        VendorMeta.version += 1
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        VendorMeta.version += 1
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        VendorMeta.version += 1
+
+
+class DefaultVendor(metaclass=VendorMeta):
     """默认厂商"""
 
     PLATFORM = 'default'
@@ -19,11 +44,16 @@ class DefaultVendor:
     @classmethod
     def check_vendor(cls, cmds: Dict[str, Cmd]) -> Type[DefaultVendor]:
         """检查确认设备的厂商"""
-        for handler in cls.__subclasses__():
-            if handler._check_vendor(cmds):
-                return handler
+        return cls.get_detector().detect(cmds) or cls
 
-        return cls
+    @classmethod
+    def get_detector(cls) -> VendorDetector:
+        """返回由子类构建的厂商识别器, 定义了新的厂商类或者厂商类的属性发生变化时重新构建"""
+        cached = _detectors.get(cls)
+        if cached is None or cached[0] != VendorMeta.version:
+            cached = (VendorMeta.version, VendorDetector(cls.__subclasses__()))
+            _detectors[cls] = cached
+        return cached[1]
 
     @classmethod
     def _check_vendor(cls, cmds: Dict[str, Cmd]) -> bool:
@@ -51,6 +81,114 @@ class DefaultVendor:
         return ''
 
 
+class VendorDetector:
+    """预编译的厂商识别器
+
+    所有厂商的版本命令、关键字以及无效回显的正则只编译一次,
+    版本命令相同的厂商共用一个正则, 每条命令只需要匹配一次。
+    重载了 ``DETECT_HOOKS`` 中任意一个方法的厂商调用自身的 ``_check_vendor``,
+    识别的结果与逐个调用 ``_check_vendor`` 一致。
+    """
+
+    max_command_cache = 4096  # 缓存的命令匹配结果的数量上限
+
+    def __init__(self, handlers: List[Type[DefaultVendor]]):
+        """
+        Args:
+            handlers: 按照识别顺序排列的厂商类
+        """
+        self.handlers = handlers
+        self._version_regs: List[Pattern] = []  # 去重后的版本命令正则
+        # (厂商, 版本命令正则的序号, 关键字正则, 无效回显正则), 序号为None时调用厂商自身的_check_vendor
+        self._rules: List[Tuple[Type[DefaultVendor], Optional[int], Pattern, Optional[Pattern]]] = []
+        self._command_cache: Dict[str, Tuple[int, ...]] = {}  # 命令匹配到的版本命令正则序号
+
+        version_index = {}  # type: Dict[str, int]
+        for handler in handlers:
+            if (
+                not _uses_default_hooks(handler) or handler.VERSION_COMMAND is None
+            ):  # 自定义了识别方法的厂商无法预编译
+                self._rules.append((handler, None, None, None))
+                continue
+
+            if handler.VERSION_COMMAND not in version_index:
+                version_index[handler.VERSION_COMMAND] = len(self._version_regs)
+                self._version_regs.append(
+                    re.compile(
+                        '(' + reg_extend(handler.VERSION_COMMAND) + ')$', re.IGNORECASE
+                    )
+                )
+
+            self._rules.append(
+                (
+                    handler,
+                    version_index[handler.VERSION_COMMAND],
+                    re.compile(handler.KEYWORD_REG, re.IGNORECASE),
+                    re.compile(handler.INVALID_STR) if handler.INVALID_STR else None,
+                )
+            )
+
+    def _match_command(self, command: str) -> Tuple[int, ...]:
+        """返回命令匹配到的版本命令正则序号"""
+        matched = self._command_cache.get(command)
+        if matched is None:
+            matched = tuple(
+                i for i, reg in enumerate(self._version_regs) if reg.match(command)
+            )
+            if len(self._command_cache) >= self.max_command_cache:
+                self._command_cache.clear()
+            self._command_cache[command] = matched
+        return matched
+
+    def detect(self, cmds: Dict[str, Cmd]) -> Optional[Type[DefaultVendor]]:
+        """识别设备的厂商
+
+        Args:
+            cmds: 设备的命令字典
+
+        Returns:
+            厂商类, 没有识别到时返回None
+        """
+        version_cmds: Dict[int, List[Cmd]] = {}  # 每个版本命令正则匹配到的命令, 保持原有顺序
+        for command, cmd in cmds.items():
+            for i in self._match_command(command):
+                version_cmds.setdefault(i, []).append(cmd)
+
+        for handler, index, keyword_reg, invalid_reg in self._rules:
+            if index is None:
+                if handler._check_vendor(cmds):
+                    return handler
+                continue
+
+            for cmd in version_cmds.get(index, []):
+                content = cmd.content
+                if not content.strip():  # 与Cmd.check_valid的判断一致
+                    continue
+                if invalid_reg is not None and invalid_reg.search(content):
+                    continue
+
+                # 只检查第一条有效的版本命令
+                if keyword_reg.search(content):
+                    return handler
+                break
+
+        return None
+
+
+def _uses_default_hooks(handler: Type[DefaultVendor]) -> bool:
+    """厂商是否使用 ``DefaultVendor`` 中的识别方法
+
+    比较的是类中定义的原始对象, 重载为staticmethod或者普通函数时同样可以判断
+    """
+    return all(
+        inspect.getattr_static(handler, hook) is inspect.getattr_static(DefaultVendor, hook)
+        for hook in DETECT_HOOKS
+    )
+
+
+_detectors: Dict[Type[DefaultVendor], Tuple[int, VendorDetector]] = {}  # 每个厂商类的识别器
+
+
 class Huawei(DefaultVendor):
 
     PLATFORM = 'huawei_vrp'
@@ -1,9 +1,12 @@
+import importlib
+import sys
+
 import pytest
 from net_inspect.api import NetInspect
 from net_inspect.base_info import BaseInfo, EachVendorDeviceInfo
 from net_inspect.domain import Device, InputPluginResult
 from net_inspect import vendor
-from net_inspect.exception import PluginNotSpecify
+from net_inspect.exception import PluginNotSpecify, SnapshotError
 from net_inspect.plugins.input_plugin_with_smartone import InputPluginWithSmartOne
 
 
@@ -149,3 +152,282 @@ def test_set_base_info_handler(shared_datadir):
 
     info = net.cluster.devices[0].info  # type: AppendClock
     assert info.clock == '2022-02-21 16:22:26'
+
+
+def test_base_info_handler_funcs_cache(mocker):
+    """基本信息的方法按照处理器类缓存, 设置处理器时重新查找"""
+    handler = EachVendorWithClock()
+    names = [func.__name__ for func in handler.get_funcs(vendor.Huawei, 'baseinfo')]
+    assert names == ['do_huawei_vrp_baseinfo', 'do_huawei_vrp_baseinfo_2']
+    assert handler.get_analysis_items() == EachVendorDeviceInfo.analysis_items
+
+    def do_huawei_vrp_baseinfo_3(self, device, info):
+        ...
+
+    mocker.patch.object(
+        EachVendorWithClock,
+        'do_huawei_vrp_baseinfo_3',
+        do_huawei_vrp_baseinfo_3,
+        create=True,
+    )
+    assert len(handler.get_funcs(vendor.Huawei, 'baseinfo')) == 2  # 使用缓存
+
+    try:
+        NetInspect().set_base_info_handler(EachVendorWithClock)
+        assert len(handler.get_funcs(vendor.Huawei, 'baseinfo')) == 3
+    finally:
+        EachVendorDeviceInfo.clear_cache()
+
+
+def test_base_info_handler_get_commands():
+    """从基本信息方法的源码中找出用到的命令, 无法确定时返回None"""
+    handler = EachVendorDeviceInfo()
+    commands = handler.get_commands(vendor.Huawei)
+    assert {'display version', 'display cpu-usage'} <= commands
+
+    class EachVendorWithHelper(EachVendorDeviceInfo):
+        def do_huawei_vrp_baseinfo_helper(self, device, info):
+            self.get_clock(device, info)
+
+        def get_clock(self, device, info):
+            info.clock = device.parse_result('display clock')
+
+    class EachVendorWithAccessor(EachVendorDeviceInfo):
+        def do_huawei_vrp_baseinfo_accessor(self, device, info):
+            parse_result = device.parse_result
+            info.clock = parse_result('display clock')
+
+    try:
+        assert EachVendorWithHelper().get_commands(vendor.Huawei) is None
+        assert EachVendorWithAccessor().get_commands(vendor.Huawei) is None
+    finally:
+        EachVendorDeviceInfo.clear_cache()
+
+
+class EachVendorWithCmds(EachVendorDeviceInfo):
+
+    base_info_class = AppendClock
+
+    def do_huawei_vrp_baseinfo_2(self, device: Device, info: AppendClock):
+        for command, cmd in device.cmds.items():
+            if command.startswith('dis') and 'clock' in command and cmd.parse_result:
+                row = cmd.parse_result[0]
+                info.clock = f'{row["year"]}-{row["month"]}-{row["day"]} {row["time"]}'
+
+
+def test_base_info_handler_get_commands_with_cmds(shared_datadir):
+    """基本信息方法直接读取 device.cmds 时无法确定用到的命令, 按需解析时解析所有命令"""
+    assert EachVendorWithCmds().get_commands(vendor.Huawei) is None
+
+    net = NetInspect()
+    net.set_input_plugin('smartone')
+    net.set_base_info_handler(EachVendorWithCmds)
+    net.enable_demand_parse()
+    net.enable_release_content(spill=False)
+    try:
+        net.run_input(shared_datadir / 'log_files/HUAWEI_BAD_POWER_21.1.1.1.diag')
+        net.run_parse()
+    finally:
+        EachVendorDeviceInfo.clear_cache()
+
+    info = net.cluster.devices[0].info  # type: AppendClock
+    assert info.clock == '2022-02-21 16:22:26'
+
+
+def test_parse_cache(shared_datadir, tmp_path, mocker):
+    """启用解析缓存后，第二次运行不再调用解析插件"""
+    file_path = shared_datadir / 'log_files/B_FOO_BAR_AR01_21.1.1.1.diag'
+
+    net = NetInspect()
+    net.set_input_plugin('smartone')
+    net.enable_parse_cache(tmp_path)
+    net.run_input(file_path)
+    net.run_parse()
+    first_info = net.cluster.devices[0].info
+    assert net._plugin_manager.parse_cache.info()['hits'] == 0
+
+    net = NetInspect()
+    net.set_input_plugin('smartone')
+    net.enable_parse_cache(tmp_path)
+    spy = mocker.spy(net._plugin_manager.parse_plugin, 'main')
+    net.run_input(file_path)
+    net.run_parse()
+
+    res = net.cluster.devices[0].cmds['dis version'].parse_result
+    assert res[0]['vrp_version'] == '8.180'
+    assert net.cluster.devices[0].info == first_info
+    assert net._plugin_manager.parse_cache.info()['hits'] > 0
+    assert spy.call_count == 0
+
+
+def test_incremental(shared_datadir, tmp_path, mocker):
+    """增量巡检只处理变化的文件, 结果与完整巡检一致"""
+    input_dir = shared_datadir / 'log_files'
+    manifest_dir = tmp_path / 'manifest'
+
+    def run(incremental: bool = True) -> NetInspect:
+        net = NetInspect()
+        net.set_input_plugin('smartone')
+        if incremental:
+            net.enable_incremental(manifest_dir)
+        net.run(input_path=input_dir)
+        return net
+
+    def results(net: NetInspect):
+        return [
+            (
+                device.info,
+                [(alarm.plugin_name, alarm.level, alarm.message) for alarm in device.analysis_result],
+            )
+            for device in net.cluster.devices
+        ]
+
+    spy = mocker.spy(InputPluginWithSmartOne, 'main')
+    expected = results(run(incremental=False))
+    assert results(run()) == expected
+
+    spy.reset_mock()
+    net = run()
+    assert results(net) == expected
+    assert all(device.restored for device in net.cluster.devices)
+    assert spy.call_count == 0
+
+    # 修改其中一个文件, 只重新处理这个文件
+    changed = sorted(input_dir.iterdir())[0]
+    changed.write_text(changed.read_text(encoding='utf-8') + '\n', encoding='utf-8')
+    net = run()
+    assert results(net) == expected
+    assert spy.call_count == 1
+    assert net.cluster.manifest.info() == {'reused': len(expected) - 1, 'changed': 1}
+
+
+def test_incremental_function_changed(shared_datadir, tmp_path, mocker):
+    """修改了分析函数所在模块的源文件后, 所有文件都会重新处理"""
+    from net_inspect.analysis_plugin import analysis
+
+    input_dir = shared_datadir / 'log_files'
+    module_path = tmp_path / 'changed_analysis.py'
+    module_path.write_text('LEVEL = 1\n', encoding='utf-8')
+    mocker.patch('sys.path', [str(tmp_path)] + sys.path)
+    mocker.patch.dict(sys.modules)
+    importlib.import_module('changed_analysis')
+
+    info = analysis.store[0]
+    original = info.function
+
+    def redefined(*args, **kwargs):
+        return original(*args, **kwargs)
+
+    redefined.__module__ = 'changed_analysis'
+    redefined.__qualname__ = original.__qualname__
+    mocker.patch.object(info, 'function', redefined)
+
+    def run() -> NetInspect:
+        net = NetInspect()
+        net.set_input_plugin('smartone')
+        net.enable_incremental(tmp_path / 'manifest')
+        net.run(input_path=input_dir)
+        return net
+
+    spy = mocker.spy(InputPluginWithSmartOne, 'main')
+    run()
+    spy.reset_mock()
+    run()
+    assert spy.call_count == 0
+
+    module_path.write_text('LEVEL = 20\n', encoding='utf-8')
+
+    spy.reset_mock()
+    net = run()
+    files = len(list(input_dir.iterdir()))
+    assert spy.call_count == files
+    assert net.cluster.manifest.info() == {'reused': 0, 'changed': files}
+
+
+def test_snapshot(shared_datadir, tmp_path, mocker):
+    """保存快照后重新加载, 不需要解析就可以得到相同的结果"""
+    net = NetInspect()
+    net.set_input_plugin('smartone')
+    net.run(input_path=shared_datadir / 'log_files')
+    net.save_snapshot(tmp_path / 'cluster.snapshot')
+    net.save_snapshot(tmp_path / 'content.snapshot', include_content=True)
+
+    for name in ('cluster.snapshot', 'content.snapshot'):
+        loaded = NetInspect()
+        spy = mocker.spy(loaded._plugin_manager.parse_plugin, 'main')
+        loaded.load_snapshot(tmp_path / name)
+
+        assert len(loaded.cluster.devices) == len(net.cluster.devices)
+        for device, expected in zip(loaded.cluster.devices, net.cluster.devices):
+            assert device.vendor is expected.vendor
+            assert device.info == expected.info
+            assert [
+                (alarm.plugin_name, alarm.level, alarm.message)
+                for alarm in device.analysis_result
+            ] == [
+                (alarm.plugin_name, alarm.level, alarm.message)
+                for alarm in expected.analysis_result
+            ]
+            assert device.parse_result('dis version') == expected.parse_result('dis version')
+            for command, cmd in device.cmds.items():
+                assert cmd.parse_result == expected.cmds[command].parse_result
+                if name == 'content.snapshot':
+                    assert cmd.content == expected.cmds[command].content
+                else:
+                    assert cmd.content == ''
+
+        if name == 'cluster.snapshot':  # 不保存回显时所有命令都已经解析
+            assert spy.call_count == 0
+
+
+def test_snapshot_error(tmp_path):
+    """快照文件损坏时抛出SnapshotError"""
+    file_path = tmp_path / 'broken.snapshot'
+    file_path.write_bytes(b'not a snapshot')
+    with pytest.raises(SnapshotError):
+        NetInspect().load_snapshot(file_path)
+
+
+def test_iter_run(shared_datadir):
+    """流水线方式运行，逐台产出设备"""
+    net = NetInspect()
+    net.set_input_plugin('smartone')
+    devices = list(net.iter_run(shared_datadir / 'log_files'))
+    assert len(devices) >= 2
+    assert len(net.cluster.devices) == 0
+    assert devices[0].info.hostname
+
+
+def test_get_metrics(shared_datadir):
+    """运行后可以获取每个阶段、平台、模板和分析插件的耗时统计"""
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone', output_plugin='device_list')
+    net.run(shared_datadir / 'log_files')
+
+    metrics = net.get_metrics()
+    assert set(metrics['cluster']) == {'input', 'parse', 'analysis', 'output'}
+    assert metrics['stage']['input']['count'] >= 2
+    assert metrics['stage']['output']['count'] == 1
+    assert 'huawei_vrp' in metrics['platform']
+    assert 'huawei_vrp_display_version.textfsm' in metrics['template']
+    assert 'AnalysisPluginWithCpuStatus' in metrics['analysis_plugin']
+
+    net.reset_metrics()
+    assert net.get_metrics() == {}
+
+
+def test_get_metrics_per_instance(shared_datadir):
+    """每个实例只统计自身的运行, 创建或者运行其他实例不影响已有的统计"""
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone')
+    net.run(shared_datadir / 'log_files')
+    expected = net.get_metrics()
+    assert expected['cluster']['parse']['count'] == 1
+
+    other = NetInspect()
+    assert other.get_metrics() == {}
+    other.set_plugins(input_plugin='smartone')
+    other.run(shared_datadir / 'log_files')
+
+    assert net.get_metrics() == expected
+    assert other.get_metrics()['cluster']['parse']['count'] == 1
@@ -0,0 +1,38 @@
+from benchmarks import bench_console_splitter, bench_pipeline
+from net_inspect.api import NetInspect
+
+
+def test_synthesize_devices(tmp_path):
+    """合成的设备都能识别出厂商"""
+    total = bench_pipeline.synthesize_devices(str(tmp_path), 2)
+    assert total == 2 * len(bench_pipeline.PLATFORMS)
+
+    net = NetInspect()
+    net.set_input_plugin('smartone')
+    net.run_input(str(tmp_path))
+    net.run_parse()
+
+    platforms = sorted(device.vendor.PLATFORM for device in net.cluster.devices)
+    assert platforms == sorted(bench_pipeline.PLATFORMS * 2)
+
+
+def test_benchmark_save_and_compare(tmp_path, mocker):
+    """保存基线后对比, 耗时增加超过阈值时返回非0"""
+    mocker.patch.object(bench_pipeline, 'BASELINE_DIR', str(tmp_path))
+    # 其他测试会向全局注册只适用于测试数据的分析函数, 这里不执行分析
+    mocker.patch.object(NetInspect, 'run_analysis')
+    args = ['-n', '1', '-r', '1', '--no-output']
+
+    assert bench_pipeline.main(args + ['--save', 'test']) == 0
+    baseline = bench_pipeline.load_baseline('test')
+    assert set(baseline['seconds']) == {'run_input', 'run_parse', 'run_analysis'}
+    assert baseline['parse_commands']
+
+    result = dict(baseline, seconds={k: v * 2 for k, v in baseline['seconds'].items()})
+    assert bench_pipeline.compare(result, baseline, 10.0) == list(result['seconds'])
+    assert bench_pipeline.compare(baseline, baseline, 10.0) == []
+
+
+def test_console_splitter_benchmark():
+    """两种切分方法的结果相同时返回0"""
+    assert bench_console_splitter.main(['-n', '1', '-r', '1']) == 0
@@ -1,4 +1,7 @@
+import pytest
+
 from net_inspect.domain import Cluster, Device, DeviceList, OutputPluginAbstract
+from net_inspect.metrics import metrics
 from net_inspect.plugin_manager import PluginManager
 from net_inspect.plugins.parse_plugin_with_ntc_templates import (
     ParsePluginWithNtcTemplates,
@@ -110,3 +113,336 @@ def test_cluster_parse_not_found_vendor(shared_datadir):
     assert device1.info.hostname == 'Default_Vendor'
     assert device1.info.ip == '21.1.1.1'
     assert device1.info.cpu_usage == ''
+
+
+def test_cluster_parallel_parse(shared_datadir):
+    """并行解析的结果和设备顺序与串行解析一致"""
+    input_plugin = InputPluginWithSmartOne
+    parse_plugin = ParsePluginWithNtcTemplates
+
+    clusters = []
+    for workers in (1, 2):
+        metrics.clear()
+        plugin_manager = PluginManager(
+            input_plugin=input_plugin, parse_plugin=parse_plugin
+        )
+        cluster = Cluster()
+        cluster.plugin_manager = plugin_manager
+        cluster.input_dir(shared_datadir / 'log_files')
+        cluster.parse(workers=workers)
+        clusters.append(cluster)
+
+    serial, parallel = clusters
+    assert [d.info for d in serial.devices] == [d.info for d in parallel.devices]
+    # 子进程中的耗时统计会合并回主进程
+    assert 'huawei_vrp_display_version.textfsm' in metrics.snapshot()['template']
+    for serial_device, parallel_device in zip(serial.devices, parallel.devices):
+        for command, cmd in serial_device.cmds.items():
+            assert cmd.parse_result == parallel_device.cmds[command].parse_result
+
+
+def test_cluster_iter_input_dir(shared_datadir):
+    """迭代输入目录时，设备不会保存到cluster中"""
+    input_plugin = InputPluginWithSmartOne
+    plugin_manager = PluginManager(input_plugin=input_plugin)
+
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    devices = cluster.iter_input_dir(shared_datadir / 'log_files')
+    assert len([device for device in devices]) >= 2
+    assert len(cluster.devices) == 0
+
+
+def test_cluster_iter_devices(shared_datadir):
+    """流水线处理目录的结果与列表方式一致"""
+    from net_inspect.bootstrap import bootstrap
+
+    analysis_plugins = bootstrap().get_analysis_plugin_list()
+    results = []
+    for workers in (1, 2):
+        plugin_manager = PluginManager(
+            input_plugin=InputPluginWithSmartOne,
+            parse_plugin=ParsePluginWithNtcTemplates,
+            analysis_plugin=analysis_plugins,
+        )
+        cluster = Cluster()
+        cluster.plugin_manager = plugin_manager
+        results.append(
+            [
+                (device.info, len(device.analysis_result))
+                for device in cluster.iter_devices(
+                    shared_datadir / 'log_files', workers=workers, max_in_flight=1
+                )
+            ]
+        )
+
+    plugin_manager = PluginManager(
+        input_plugin=InputPluginWithSmartOne,
+        parse_plugin=ParsePluginWithNtcTemplates,
+        analysis_plugin=analysis_plugins,
+    )
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    cluster.input_dir(shared_datadir / 'log_files')
+    cluster.parse()
+    cluster.analysis()
+    expected = [(device.info, len(device.analysis_result)) for device in cluster.devices]
+
+    assert results[0] == expected
+    assert results[1] == expected
+
+
+def test_cluster_parallel_analysis(shared_datadir):
+    """线程池和进程池并行分析的结果与串行分析一致"""
+    from net_inspect.bootstrap import bootstrap
+
+    analysis_plugins = bootstrap().get_analysis_plugin_list()
+    results = []
+    for workers, executor in ((1, 'thread'), (2, 'thread'), (2, 'process')):
+        plugin_manager = PluginManager(
+            input_plugin=InputPluginWithSmartOne,
+            parse_plugin=ParsePluginWithNtcTemplates,
+            analysis_plugin=analysis_plugins,
+        )
+        cluster = Cluster()
+        cluster.plugin_manager = plugin_manager
+        cluster.input_dir(shared_datadir / 'log_files')
+        cluster.parse()
+        cluster.analysis(workers=workers, executor=executor)
+        results.append(
+            [
+                (
+                    device.info,
+                    [
+                        (alarm.plugin_name, alarm.level, alarm.message)
+                        for alarm in device.analysis_result
+                    ],
+                    device.cmds['dis version'].parse_result
+                    if 'dis version' in device.cmds
+                    else None,
+                )
+                for device in cluster.devices
+            ]
+        )
+
+    assert any(alarms for _, alarms, _ in results[0])
+    assert results[1] == results[0]
+    assert results[2] == results[0]
+
+
+RUNTIME_PLUGIN = '''
+from net_inspect import vendor
+from net_inspect.analysis_plugin import AnalysisPluginAbc, analysis
+
+
+class AnalysisPluginWithRuntime(AnalysisPluginAbc):
+    """运行时定义的分析插件"""
+
+    @analysis.vendor(vendor.Huawei)
+    @analysis.template_key('huawei_vrp_display_version.textfsm', ['vrp_version'])
+    def huawei_vrp(template, result):
+        """运行时注册的分析函数"""
+        result.add_focus('runtime')
+'''
+
+
+def run_runtime_plugin(shared_datadir, mocker):
+    """使用运行时定义的分析插件进行进程池分析, 返回每台设备的平台和告警以及插件的弱引用"""
+    import types
+    import weakref
+
+    from net_inspect.analysis_plugin import analysis
+
+    module = types.ModuleType('runtime_analysis_plugin')
+    exec(RUNTIME_PLUGIN, module.__dict__)
+    plugin = module.AnalysisPluginWithRuntime
+    key = (plugin.__name__, 'huawei_vrp')
+    process_analysis = mocker.spy(DeviceList, '_parallel_process_analysis')
+    try:
+        plugin_manager = PluginManager(
+            input_plugin=InputPluginWithSmartOne,
+            parse_plugin=ParsePluginWithNtcTemplates,
+            analysis_plugin=[plugin],
+        )
+        cluster = Cluster()
+        cluster.plugin_manager = plugin_manager
+        cluster.input_dir(shared_datadir / 'log_files')
+        cluster.parse()
+        cluster.analysis(workers=2, executor='process')
+    finally:
+        for info in analysis._index.pop(key, []):
+            analysis.store.remove(info)
+        module.__dict__.clear()
+
+    assert process_analysis.call_count == 0
+    results = [
+        (device.vendor.PLATFORM, [alarm.message for alarm in device.analysis_result])
+        for device in cluster.devices
+    ]
+    return results, weakref.ref(plugin)
+
+
+def test_cluster_process_analysis_runtime_plugin(shared_datadir, mocker):
+    """进程池分析时, 子进程中无法导入运行时定义的分析插件, 改为使用线程池分析"""
+    import gc
+
+    results, plugin = run_runtime_plugin(shared_datadir, mocker)
+    for platform, messages in results:
+        assert messages == (['runtime'] if platform == 'huawei_vrp' else [])
+
+    gc.collect()  # 插件类不能留在AnalysisPluginAbc的子类中, 否则会被其他用例加载
+    assert plugin() is None
+
+
+def test_unimportable_analysis_function():
+    """导入之后才注册到插件中的分析函数在子进程中不存在"""
+    from net_inspect.analysis_plugin import analysis
+    from net_inspect.domain import _unimportable_analysis
+    from net_inspect.plugins.analysis_plugin_with_fan_status import (
+        AnalysisPluginWithFanStatus,
+    )
+    from net_inspect.vendor import Huawei
+
+    plugin_manager = PluginManager(analysis_plugin=[AnalysisPluginWithFanStatus])
+    assert _unimportable_analysis(plugin_manager) == []
+
+    def extra(template, result):
+        """运行时注册的分析函数"""
+
+    extra.__qualname__ = 'AnalysisPluginWithFanStatus.extra'
+    analysis.vendor(Huawei)(extra)
+    try:
+        assert _unimportable_analysis(plugin_manager) == ['AnalysisPluginWithFanStatus.extra']
+    finally:
+        analysis.store.remove(analysis.index[('AnalysisPluginWithFanStatus', 'huawei_vrp')].pop())
+
+
+def test_cluster_demand_parse(shared_datadir):
+    """按需解析时不需要的命令不会解析, 基础信息、分析结果和解析结果与全部解析一致"""
+    from net_inspect.bootstrap import bootstrap
+
+    analysis_plugins = bootstrap().get_analysis_plugin_list()
+    results = []
+    for demand, workers in ((False, 1), (True, 1), (True, 2)):
+        plugin_manager = PluginManager(
+            input_plugin=InputPluginWithSmartOne,
+            parse_plugin=ParsePluginWithNtcTemplates,
+            analysis_plugin=analysis_plugins,
+        )
+        cluster = Cluster()
+        cluster.plugin_manager = plugin_manager
+        if demand:
+            cluster.enable_demand_parse()
+        cluster.input_dir(shared_datadir / 'log_files')
+        cluster.parse(workers=workers)
+        cluster.analysis()
+
+        parsed = [cmd.parsed for device in cluster.devices for cmd in device.cmds.values()]
+        if demand:
+            assert not all(parsed)
+        results.append(
+            [
+                (
+                    device.info,
+                    [
+                        (alarm.plugin_name, alarm.level, alarm.message)
+                        for alarm in device.analysis_result
+                    ],
+                    {
+                        command: cmd.parse_result
+                        for command, cmd in device.cmds.items()
+                    },
+                )
+                for device in cluster.devices
+            ]
+        )
+
+    assert results[1] == results[0]
+    assert results[2] == results[0]
+
+
+def test_cluster_analysis_executor_error():
+    """不支持的并行分析方式"""
+    with pytest.raises(ValueError):
+        Cluster().analysis(workers=2, executor='coroutine')
+
+
+def test_cluster_release_content(shared_datadir):
+    """开启释放回显后，解析结果和基础信息不变，回显可以重新读取"""
+    plugin_manager = PluginManager(
+        input_plugin=InputPluginWithSmartOne, parse_plugin=ParsePluginWithNtcTemplates
+    )
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    cluster.enable_release_content()
+    cluster.input(shared_datadir / 'log_files/B_FOO_BAR_AR01_21.1.1.1.diag')
+    content = cluster.devices[0].cmds['dis version'].content
+    cluster.parse()
+
+    cmd = cluster.devices[0].cmds['dis version']
+    assert cmd._content == ''
+    assert cmd.content == content
+    assert cmd.parse_result[0]['vrp_version'] == '8.180'
+    assert cluster.devices[0].info.cpu_usage == '13%'
+
+
+def test_device_list_check_vendor(shared_datadir):
+    """批量识别设备厂商, 返回每个厂商平台的设备数量"""
+    plugin_manager = PluginManager(input_plugin=InputPluginWithSmartOne)
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    cluster.input_dir(shared_datadir / 'log_files')
+
+    platforms = [device.vendor.PLATFORM for device in cluster.devices]
+    counts = cluster.devices.check_vendor()
+    assert [device.vendor.PLATFORM for device in cluster.devices] == platforms
+    assert sum(counts.values()) == len(cluster.devices)
+    assert counts['huawei_vrp'] == platforms.count('huawei_vrp')
+    assert counts['default'] == 1
+
+
+def test_cluster_input_dir_check_vendor_once(shared_datadir, mocker):
+    """输入目录时所有设备读取完成后统一识别厂商, 不再逐台设备识别"""
+    plugin_manager = PluginManager(input_plugin=InputPluginWithSmartOne)
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    device_check = mocker.spy(Device, 'check_vendor')
+    batch_check = mocker.spy(DeviceList, 'check_vendor')
+    cluster.input_dir(shared_datadir / 'log_files')
+
+    assert device_check.call_count == 0
+    assert batch_check.call_count == 1
+    assert any(device.vendor.PLATFORM == 'huawei_vrp' for device in cluster.devices)
+
+
+def test_cluster_release_content_per_device(shared_datadir, mocker):
+    """每台设备解析完成后立即释放回显, 而不是等待所有设备解析完成"""
+    plugin_manager = PluginManager(
+        input_plugin=InputPluginWithSmartOne, parse_plugin=ParsePluginWithNtcTemplates
+    )
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    cluster.enable_release_content(spill=False)
+    cluster.input_dir(shared_datadir / 'log_files')
+
+    calls = []
+    parse = Device.parse
+    release_content = Device.release_content
+    mocker.patch.object(
+        Device,
+        'parse',
+        lambda self, *args, **kwargs: calls.append(('parse', self)) or parse(self, *args, **kwargs),
+    )
+    mocker.patch.object(
+        Device,
+        'release_content',
+        lambda self, *args, **kwargs: calls.append(('release', self))
+        or release_content(self, *args, **kwargs),
+    )
+    cluster.parse()
+
+    parsed = [device for device in cluster.devices if device.vendor.PLATFORM != 'default']
+    assert len(parsed) > 1
+    for device in parsed:  # 设备的解析之后紧接着释放回显
+        index = calls.index(('parse', device))
+        assert calls[index + 1] == ('release', device)
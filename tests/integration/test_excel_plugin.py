@@ -1,4 +1,19 @@
+import pytest
 from net_inspect import NetInspect
+from net_inspect.domain import Device
+from net_inspect.plugins import output_plugin_with_excel_report
+from net_inspect.plugins.output_plugin_with_excel_report import (
+    OutputPluginWithExcelReport,
+)
+
+
+class ExcelReportWithTitle(OutputPluginWithExcelReport):
+    """写入报告时读取 self.args 中的参数"""
+
+    def write_report(self, devices, file_path):
+        self.values.header_title = self.args.output_params['title']
+        assert list(self.args.devices) == list(devices)
+        super().write_report(devices, file_path)
 
 
 def test_output_plugin_with_excel_report(shared_datadir, tmp_path):
@@ -10,3 +25,159 @@ def test_output_plugin_with_excel_report(shared_datadir, tmp_path):
     net.set_plugins(input_plugin='smartone', output_plugin='excel_report')
 
     net.run(input_path=input_dir, output_file_path=out_file)
+
+
+def test_output_plugin_with_excel_report_streaming(shared_datadir, tmp_path):
+    """只写模式生成的报告与普通模式的内容、合并范围和样式一致"""
+    from openpyxl import load_workbook
+
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone', output_plugin='excel_report')
+    net.run(input_path=shared_datadir / 'log_files', output_file_path=tmp_path / 'normal.xlsx')
+    net.run_output(tmp_path / 'streaming.xlsx', {'streaming': 'true'})
+
+    def load(file_path):
+        sheet = load_workbook(file_path).active
+        return (
+            [
+                [
+                    (cell.value, cell.font.name, cell.font.sz, cell.font.b, cell.border.left.style)
+                    for cell in row
+                ]
+                for row in sheet.iter_rows()
+            ],
+            sorted(str(cell_range) for cell_range in sheet.merged_cells.ranges),
+            sheet.column_dimensions['A'].width,
+        )
+
+    normal = load(tmp_path / 'normal.xlsx')
+    assert normal[0]
+    assert load(tmp_path / 'streaming.xlsx') == normal
+
+
+@pytest.mark.parametrize('streaming_merge', [True, False])
+def test_excel_write_block(tmp_path, mocker, streaming_merge):
+    """相同的样式共享一个命名样式, 每行按照相同的范围合并,
+    openpyxl 不支持只写模式的合并时使用普通模式的工作表, 结果相同"""
+    from openpyxl import load_workbook
+
+    from net_inspect.third_party import excel as excel_module
+    from net_inspect.third_party.excel import CellContext, Excel, StreamingExcel
+
+    mocker.patch.object(
+        excel_module, '_supports_streaming_merge', return_value=streaming_merge
+    )
+    for excel_cls in (Excel, StreamingExcel):
+        excel = excel_cls()
+        if excel_cls is StreamingExcel:
+            assert (excel.merged is not None) is streaming_merge
+        rows = [[CellContext(f'pid{i}').set_font(bold=True), f'sn{i}'] for i in range(3)]
+        assert excel.write_block(rows, merge=[('A', 'B'), ('C', 'F')]) == 1
+        assert excel.write_block([['end']]) == 4
+        assert len(excel.styles) == 2
+
+        file_path = tmp_path / f'{excel_cls.__name__}.xlsx'
+        excel.save(file_path)
+        sheet = load_workbook(file_path).active
+        assert [row[0].value for row in sheet.iter_rows()] == ['pid0', 'pid1', 'pid2', 'end']
+        assert sheet['C2'].value == 'sn1'
+        assert sheet['A1'].font.b and not sheet['C1'].font.b
+        assert len(sheet.merged_cells.ranges) == 6
+
+
+@pytest.mark.parametrize(
+    'params',
+    [
+        {'shard_by': 'vendor', 'workers': '2'},
+        {'shard_by': 'region'},
+        {'shard_by': 'count', 'shard_size': '1'},
+    ],
+)
+def test_output_plugin_with_excel_report_shards(shared_datadir, tmp_path, params):
+    """拆分的报告包含所有设备, 索引链接到每个分组的报告"""
+    from openpyxl import load_workbook
+
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone', output_plugin='excel_report')
+    net.run_input(shared_datadir / 'log_files')
+    net.run_parse()
+    net.run_analysis()
+    net.run_output(tmp_path / 'index.xlsx', params)
+
+    rows = list(load_workbook(tmp_path / 'index.xlsx').active.iter_rows(min_row=2))
+    assert sum(row[1].value for row in rows) == len(net.cluster.devices)
+    if params['shard_by'] == 'count':
+        assert len(rows) == len(net.cluster.devices)
+
+    for name, count, file_name in rows:
+        assert file_name.hyperlink.target == file_name.value
+        sheet = load_workbook(tmp_path / file_name.value).active
+        headers = [row[0].value for row in sheet.iter_rows() if row[0].value == '现场巡检报告']
+        assert len(headers) == count.value
+
+
+def test_output_plugin_with_excel_report_shard_file_names(shared_datadir, tmp_path, mocker):
+    """分组名称替换后重名时, 每个分组仍然写入不同的文件"""
+    from openpyxl import load_workbook
+
+    from net_inspect.plugins.output_plugin_with_excel_report import (
+        OutputPluginWithExcelReport,
+    )
+
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone', output_plugin='excel_report')
+    net.run_input(shared_datadir / 'log_files')
+    net.run_parse()
+    net.run_analysis()
+
+    devices = list(net.cluster.devices)
+    shards = {'BJ 1': devices[:1], 'BJ_1': devices[1:2], 'bj/1': devices[2:]}
+    mocker.patch.object(OutputPluginWithExcelReport, 'get_shards', return_value=shards)
+    net.run_output(tmp_path / 'index.xlsx', {'shard_by': 'region'})
+
+    rows = list(load_workbook(tmp_path / 'index.xlsx').active.iter_rows(min_row=2))
+    assert [row[2].value for row in rows] == [
+        'index_BJ_1.xlsx',
+        'index_BJ_1_2.xlsx',
+        'index_bj_1_3.xlsx',
+    ]
+    for name, count, file_name in rows:
+        sheet = load_workbook(tmp_path / file_name.value).active
+        headers = [row[0].value for row in sheet.iter_rows() if row[0].value == '现场巡检报告']
+        assert len(headers) == count.value == len(shards[name.value])
+
+
+def test_output_plugin_with_excel_report_shard_workers(shared_datadir, tmp_path, mocker):
+    """并行写入分组报告时子进程中可以读取 self.args, 设备快照在提交分组时才生成"""
+    from openpyxl import load_workbook
+
+    net = NetInspect()
+    net.set_plugins(input_plugin='smartone')
+    net.run_input(shared_datadir / 'log_files')
+    net.run_parse()
+    net.run_analysis()
+
+    events = []
+    snapshot = Device.snapshot
+    mocker.patch.object(
+        Device,
+        'snapshot',
+        lambda self, *args, **kwargs: events.append('snapshot') or snapshot(self, *args, **kwargs),
+    )
+    mocker.patch.object(
+        output_plugin_with_excel_report,
+        'replay_records',
+        side_effect=lambda records: events.append('replay'),
+    )
+    params = {'shard_by': 'count', 'shard_size': '1', 'workers': '2', 'title': '分组报告'}
+    ExcelReportWithTitle().run(net.cluster.devices, tmp_path / 'index.xlsx', params)
+
+    devices = len(net.cluster.devices)
+    assert events.count('snapshot') == events.count('replay') == devices
+    assert events.index('replay') < len(events) - 1 - events[::-1].index('snapshot')
+
+    rows = list(load_workbook(tmp_path / 'index.xlsx').active.iter_rows(min_row=2))
+    assert len(rows) == devices
+    for name, count, file_name in rows:
+        sheet = load_workbook(tmp_path / file_name.value).active
+        assert sheet['A1'].value == '分组报告'
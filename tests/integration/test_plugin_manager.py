@@ -1,5 +1,10 @@
+import shutil
+import threading
+import time
+
 from net_inspect.plugin_manager import PluginManager
 from net_inspect.bootstrap import bootstrap
+from net_inspect.plugins.input_plugin_with_smartone import InputPluginWithSmartOne
 
 
 def test_plugin_manager_get_plugins():
@@ -11,3 +16,72 @@ def test_plugin_manager_get_plugins():
     )
     manager = PluginManager(*p)
     assert manager._input_plugin.__class__.__name__ == 'InputPluginWithSmartOne'
+
+
+class SlowInputPlugin(InputPluginWithSmartOne):
+    """模拟读取延迟较高的网络存储"""
+
+    delay = 0.1
+    lock = threading.Lock()
+    reading = 0  # 正在读取的文件数
+    max_reading = 0  # 同时读取的最大文件数
+    started = 0  # 开始读取的文件数
+
+    def read(self, file_path: str) -> str:
+        cls = self.__class__
+        with cls.lock:
+            cls.reading += 1
+            cls.started += 1
+            cls.max_reading = max(cls.max_reading, cls.reading)
+        time.sleep(self.delay)
+        with cls.lock:
+            cls.reading -= 1
+        return super().read(file_path)
+
+
+def copy_log_files(shared_datadir, tmp_path, times: int):
+    """复制测试文件, 并加入一个不符合输入插件标准的文件"""
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    for i in range(times):
+        for file in (shared_datadir / 'log_files').iterdir():
+            shutil.copy(file, input_dir / f'COPY{i}_{file.name}')
+    (input_dir / 'not_smartone_file.diag').write_text('dis ver')
+    return input_dir
+
+
+def test_plugin_manager_concurrent_input_dir(shared_datadir, tmp_path):
+    """并发读取的结果和顺序与逐个读取一致, 并且会跳过不符合标准的文件"""
+    input_dir = copy_log_files(shared_datadir, tmp_path, 2)
+    manager = PluginManager(input_plugin=SlowInputPlugin)
+
+    serial = manager.input_dir(input_dir)
+
+    SlowInputPlugin.max_reading = 0
+    concurrent = manager.input_dir(input_dir, concurrency=4)
+
+    assert len(serial) == 8
+    assert [r.hostname for r in serial] == [r.hostname for r in concurrent]
+    assert [r.cmd_dict for r in serial] == [r.cmd_dict for r in concurrent]
+    assert [r._device_info for r in serial] == [r._device_info for r in concurrent]
+    assert 1 < SlowInputPlugin.max_reading <= 4
+
+
+def test_plugin_manager_concurrent_iter_input_dir_break(shared_datadir, tmp_path):
+    """并发读取时提前结束迭代, 读取线程全部结束, 并且不会继续读取剩余的文件"""
+    input_dir = copy_log_files(shared_datadir, tmp_path, 2)
+    manager = PluginManager(input_plugin=SlowInputPlugin)
+    threads = threading.active_count()
+    SlowInputPlugin.started = 0
+
+    results = manager.iter_input_dir(input_dir, concurrency=2)
+    result = next(results)
+    results.close()
+
+    assert result.hostname
+    assert SlowInputPlugin.reading == 0
+    assert SlowInputPlugin.started <= 2 * 2  # 最多提交 concurrency * 2 个文件
+    assert threading.active_count() == threads
+
+    time.sleep(SlowInputPlugin.delay * 2)
+    assert SlowInputPlugin.started <= 2 * 2
@@ -205,3 +205,53 @@ def test_analysis_plugin_with_base_info(shared_datadir):
             return
 
     assert False
+
+
+def test_analysis_dispatch_index():
+    """分析函数按照 (插件名称, 厂商平台) 建立索引, only_run_plugins 设置后只返回指定插件"""
+    key = ('AnalysisPluginWithTest', vendor.Huawei.PLATFORM)
+    assert key in analysis.index
+    assert 'huawei' in [info.function_name for info in analysis.index[key]]
+    assert analysis.filter(
+        plugin_name='analysis_plugin_with_test', vendor_platform=vendor.Huawei.PLATFORM
+    ) == analysis.index[key]
+
+    only_run_plugins = analysis._only_run_plugins
+    try:
+        analysis.set_only_run_plugins([AnalysisPluginWithTest])
+        funcs = list(analysis.get_funcs('AnalysisPluginWithTest', vendor.Huawei))
+        assert [func for func, _, _ in funcs] == [
+            info.function for info in analysis.index[key]
+        ]
+
+        analysis.set_only_run_plugins([AnalysisPluginWithPowerStatus])
+        assert not list(analysis.get_funcs('AnalysisPluginWithTest', vendor.Huawei))
+    finally:
+        analysis._only_run_plugins = only_run_plugins
+        analysis._build_dispatch()
+
+
+def test_analysis_result_index_and_counts():
+    """分组和计数在第一次查询后随着添加和合并更新"""
+    result = AnalysisResult()
+    result.add(AlarmLevel(AlarmLevel.NORMAL, 'normal', AnalysisPluginWithTest))
+    assert not result.include_warning
+    assert len(result.get('test')) == 1
+
+    other = AnalysisResult()
+    other.add_warning('warning')
+    other.add_focus('focus')
+    for alarm in other:
+        alarm.plugin_cls = AnalysisPluginWithPowerStatus
+    result.merge(other)
+
+    assert result.include_warning
+    assert result.count(AlarmLevel.FOCUS) == 1
+    assert result.count(AlarmLevel.WARNING) == 1
+    assert [alarm.message for alarm in result.get('power_status')] == ['warning', 'focus']
+    assert result.get('power status').include_warning
+    assert not result.get('AnalysisPluginWithTest').include_warning
+    assert len(result.get('fan status')) == 0
+
+    result.get('test').add_warning()  # 修改返回的结果不影响原来的结果
+    assert len(result.get('test')) == 1
@@ -1,6 +1,7 @@
 import re
 import pytest
 
+from benchmarks.bench_console_splitter import split_by_line
 from net_inspect.plugins.input_plugin_with_console import (
     InputPluginWithConsole,
     simialr_huawei_reg,
@@ -127,3 +128,108 @@ def test_smartone_plugin_error_file(shared_datadir):
     input_plugin = InputPluginWithSmartOne()
     with pytest.raises(exception.InputFileTypeError):
         input_plugin.run(shared_datadir / 'console_input.log')
+
+
+def test_input_plugin_with_smartone_command_line():
+    """情况一: 以 ----命令---- 开头的文件, 兼容\\r\\n换行, 没有回显的最后一个命令不保存"""
+    dashes = '-' * 25
+    stream = (
+        f'{dashes}dis clock{dashes}\r\n'
+        '2022-02-21 16:22:26+08:00\r\n'
+        '\r\n'
+        f'{dashes}dis cpu{dashes}\r\n'
+        f'{dashes}dis version{dashes}\r\n'
+        'Huawei Versatile Routing Platform Software\r\n'
+        f'{"-" * 60}\r\n'
+        f'{dashes}dis memory{dashes}'
+    )
+    result = InputPluginWithSmartOne().main('A_FOO_BAR_DR01_127.0.0.1.diag', stream)
+
+    assert result.cmd_dict == {
+        'dis clock': '2022-02-21 16:22:26+08:00\n',
+        'dis cpu': '',
+        'dis version': 'Huawei Versatile Routing Platform Software\n' + '-' * 60,
+    }
+
+
+def test_input_plugin_with_smartone_crlf_without_copy(mocker):
+    """只有\\r\\n换行时在切片时处理, 不替换整个文件内容的换行符"""
+    from net_inspect.plugins import input_plugin_with_smartone
+
+    dashes = '-' * 25
+    lines = [f'{dashes}dis clock{dashes}', '2022-02-21', '', f'{dashes}dis cpu{dashes}', 'cpu']
+    sub = mocker.patch.object(
+        input_plugin_with_smartone,
+        'line_break_pattern',
+        wraps=input_plugin_with_smartone.line_break_pattern,
+    )
+    plugin = InputPluginWithSmartOne()
+
+    crlf = plugin.main('A_FOO_BAR_DR01_127.0.0.1.diag', '\r\n'.join(lines) + '\r\n')
+    sub.sub.assert_not_called()
+
+    lf = plugin.main('A_FOO_BAR_DR01_127.0.0.1.diag', '\n'.join(lines) + '\n')
+    assert crlf.cmd_dict == lf.cmd_dict == {'dis clock': '2022-02-21\n', 'dis cpu': 'cpu'}
+
+    mixed = plugin.main('A_FOO_BAR_DR01_127.0.0.1.diag', '\r'.join(lines))
+    sub.sub.assert_called_once()
+    assert mixed.cmd_dict == {'dis clock': '2022-02-21\n', 'dis cpu': 'cpu'}
+
+
+def test_input_plugin_with_smartone_separator():
+    """情况二: 以 ------------ 分隔的文件, 分隔后的第一个非空行为命令"""
+    stream = '\n'.join(
+        [
+            'dis clock',
+            '2022-02-21 16:22:26+08:00',
+            '-' * 60,
+            '',
+            '  dis version  ',
+            'Huawei Versatile Routing Platform Software',
+            '',
+            '-' * 60,
+            'dis cpu',
+        ]
+    )
+    result = InputPluginWithSmartOne().main('A_FOO_BAR_DR01_127.0.0.1.diag', stream)
+
+    assert result.cmd_dict == {
+        'dis clock': '2022-02-21 16:22:26+08:00',
+        'dis version': 'Huawei Versatile Routing Platform Software\n',
+    }
+
+
+def test_console_plugin_prompt_boundary():
+    """命令行与提示符切分: 兼容\\r\\n换行, 回显第一行的提示符不作为结尾"""
+    stream = (
+        'dev#show clock\r\n'
+        'dev#\r\n'
+        '10:00:00\r\n'
+        'dev#\r\n'
+        'ignored\r\n'
+        'dev(config)#sh run\r\n'
+        '!\r\n'
+        'dev(config)#\r\n'
+        '<dev>dis cpu\r\n'
+        '\r\n'
+        '<dev>dis version\r\n'
+    )
+    result = InputPluginWithConsole().main('', stream)
+
+    assert result.hostname == 'dev'
+    assert result.cmd_dict == {
+        'show clock': 'dev#\n10:00:00',
+        'sh run': '!',
+        'dis cpu': '',
+    }
+
+
+def test_console_plugin_same_as_split_by_line(shared_datadir):
+    """整个文件查找的切分结果与逐行切分的结果相同"""
+    input_plugin = InputPluginWithConsole()
+    stream = input_plugin.read(shared_datadir / 'console_input.log')
+
+    result = input_plugin.main('', stream)
+    expected = split_by_line('', stream)
+    assert result.hostname == expected.hostname
+    assert result.cmd_dict == expected.cmd_dict
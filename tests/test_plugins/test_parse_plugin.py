@@ -79,3 +79,97 @@ def test_external_and_ntc_textfsm_parse(shared_datadir):
     res = parse_plugin.main(cmd, 'huawei_vrp')  # 使用的是外部模板
     assert res[0]['vrp_version'] == '8.180'
     assert not res[0].get('uptime')  # 确认外部模板是没有uptime这个值的
+
+
+def test_external_textfsm_parallel_parse(shared_datadir):
+    """并行解析时，外部模板同样生效"""
+    from net_inspect.domain import Cluster
+    from net_inspect.plugin_manager import PluginManager
+    from net_inspect.plugins.input_plugin_with_smartone import InputPluginWithSmartOne
+
+    plugin_manager = PluginManager(
+        input_plugin=InputPluginWithSmartOne, parse_plugin=ParsePluginWithNtcTemplates
+    )
+    plugin_manager.parse_plugin.set_external_templates(
+        shared_datadir / 'external_templates'
+    )
+    cluster = Cluster()
+    cluster.plugin_manager = plugin_manager
+    cluster.input(shared_datadir / 'B_FOO_BAR_AR01_21.1.1.1.diag')
+    cluster.input(shared_datadir / 'HUAWEI_BAD_POWER_21.1.1.1.diag')
+    cluster.parse(workers=2)
+
+    res = cluster.devices[0].search_cmd('display version').parse_result
+    assert res[0]['vrp_version'] == '8.180'
+    assert not res[0].get('uptime')  # 确认使用的是外部模板
+    assert cluster.devices[0].info.hostname == 'B_FOO_BAR_AR01'
+
+
+def test_ntc_templates_match_command():
+    """预编译的命令匹配支持简写, 并且会缓存匹配结果"""
+    parse_plugin = ParsePluginWithNtcTemplates()
+    with parse_plugin._pre_parse('dis ver', 'huawei_vrp') as (match_command, _):
+        assert match_command == 'display version'
+
+    assert ('huawei_vrp', 'dis ver') in parse_plugin._match_cache
+
+
+def test_external_templates_clear_match_cache(shared_datadir):
+    """设置外部模板后，重新匹配命令"""
+    parse_plugin = ParsePluginWithNtcTemplates()
+    with parse_plugin._pre_parse('display version', 'huawei_vrp') as (_, info):
+        assert info is parse_plugin.textfms_info_dict['ntc_templates']
+
+    parse_plugin.set_external_templates(shared_datadir / 'external_templates')
+    with parse_plugin._pre_parse('display version', 'huawei_vrp') as (_, info):
+        assert info is parse_plugin.textfms_info_dict['external']
+
+
+def test_ntc_templates_template_cache():
+    """同一个模板只编译一次，之后从缓存中获取"""
+    parse_plugin = ParsePluginWithNtcTemplates()
+    for _ in range(3):
+        cmd = Cmd('display version')
+        cmd.content = huawei_verison
+        res = parse_plugin.main(cmd, 'huawei_vrp')
+        assert res[0]['vrp_version'] == '8.180'
+
+    info = parse_plugin.template_cache.info()
+    assert info['misses'] == 1
+    assert info['hits'] == 2
+    assert info['currsize'] == 1
+
+
+def test_ntc_templates_template_cache_lru():
+    """超过缓存数量时，淘汰最久未使用的模板"""
+    from net_inspect.exception import TemplateError
+    from net_inspect.plugins.parse_plugin_with_ntc_templates import TemplateCache
+
+    parse_plugin = ParsePluginWithNtcTemplates()
+    parse_plugin.template_cache = TemplateCache(maxsize=1)
+    for command in ['display version', 'display cpu-usage', 'display version']:
+        cmd = Cmd(command)
+        cmd.content = huawei_verison
+        try:
+            parse_plugin.main(cmd, 'huawei_vrp')
+        except TemplateError:  # 回显与模板不匹配时没有解析结果
+            pass
+
+    assert len(parse_plugin.template_cache) == 1
+    assert parse_plugin.template_cache.misses == 3
+
+
+def test_template_signature_change_with_template(shared_datadir):
+    """模板文件修改后，模板签名随之改变，使解析缓存失效"""
+    template_dir = shared_datadir / 'external_templates'
+    parse_plugin = ParsePluginWithNtcTemplates()
+    parse_plugin.set_external_templates(template_dir)
+    cmd = Cmd('display version')
+
+    signature = parse_plugin.template_signature(cmd, 'huawei_vrp')
+    assert signature
+
+    template_file = template_dir / 'huawei_vrp_display_version.textfsm'
+    template_file.write_text(template_file.read_text() + '\n')
+    assert parse_plugin.template_signature(cmd, 'huawei_vrp') != signature
+    assert parse_plugin.template_signature(Cmd('not command'), 'huawei_vrp') == ''
@@ -97,3 +97,14 @@ def test_textfsm_external_template_2(shared_datadir):
     )
     assert result.exit_code == 0
     assert 'model' in result.stdout
+
+
+def test_profile(shared_datadir):
+    """运行主程序，显示耗时统计"""
+    path = str(shared_datadir).replace('\\', '\\\\')
+    result = runner.invoke(
+        app, split(f'--input {path} --output-plugin device_list --profile')
+    )
+
+    assert result.exit_code == 0
+    assert '耗时统计: cluster' in result.stdout
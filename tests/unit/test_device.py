@@ -1,4 +1,8 @@
-from net_inspect.domain import Device, DeviceInfo
+import sys
+import threading
+
+from net_inspect.domain import Cmd, Device, DeviceInfo
+from net_inspect.func import NoneSkip
 
 
 def cmd_dict():
@@ -66,6 +70,68 @@ class TestDevice:
             for row in cmd.parse_result:
                 assert False
 
+    def test_device_search_cmd_no_result_restore_trace(self):
+        """serach_cmd没有结果时, 跳过代码块后恢复sys.settrace"""
+        device = Device()
+        device.save_to_cmds(cmd_dict())
+
+        if sys.gettrace():  # pragma: no cover 调试状态下不会设置trace
+            return
+
+        with device.search_cmd('other cmd') as cmd:
+            assert False
+
+        assert sys.gettrace() is None
+
+    def test_device_search_cmd_no_result_in_threads(self):
+        """其他线程中跳过代码块时, 不会清除当前线程设置trace的状态"""
+        device = Device()
+        device.save_to_cmds(cmd_dict())
+        traces = []
+
+        def skip():
+            trace = sys.gettrace()  # 调试或者统计覆盖率时线程中已经有trace
+            with device.search_cmd('other cmd') as cmd:
+                assert False
+            traces.append(sys.gettrace() is trace)
+
+        NoneSkip._local.set_trace = True  # 当前线程正处于跳过的代码块中
+        try:
+            thread = threading.Thread(target=skip)
+            thread.start()
+            thread.join()
+            assert NoneSkip._local.set_trace is True
+        finally:
+            NoneSkip._local.set_trace = False
+
+        assert traces == [True]
+
+    def test_device_get_cmd(self):
+        """get_cmd 找到命令时返回Cmd, 没有找到时返回None"""
+        device = Device()
+        device.save_to_cmds(cmd_dict())
+        assert device.get_cmd('dis ver').command == 'display version'
+        assert device.get_cmd('other cmd') is None
+
+    def test_device_search_cmd_after_save_to_cmds(self):
+        """save_to_cmds 之后查找结果会更新, 并取得分最高的命令"""
+        device = Device()
+        device.save_to_cmds({'dis version': 'short'})
+        assert device.search_cmd('display ver').content == 'short'
+
+        device.save_to_cmds({'display version': 'long'})
+        assert device.search_cmd('display ver').content == 'long'
+        assert device.search_cmd('dis ver').content == 'short'
+
+    def test_device_search_cmd_with_direct_cmds_change(self):
+        """直接修改cmds时，索引也会重建"""
+        device = Device()
+        device.save_to_cmds(cmd_dict())
+        assert not device.search_cmd('dis clock')
+
+        device.cmds['display clock'] = Cmd('display clock', 'clock')
+        assert device.search_cmd('dis clock').content == 'clock'
+
     def test_device_parse_result(self):
         """测试解析结果方法"""
 
@@ -99,3 +165,28 @@ class TestDevice:
 def test_device_info():
     devinfo = DeviceInfo(name='Router-A')
     assert devinfo.name == 'Router-A'
+
+
+def test_cmd_release_content_with_spill():
+    """释放回显到临时文件后，可以重新读取"""
+    from net_inspect.cache import ContentSpill
+
+    spill = ContentSpill()
+    cmd = Cmd('display version', '回显内容')
+    other = Cmd('display clock', 'clock')
+    cmd.release_content(spill)
+    other.release_content(spill)
+
+    assert cmd._content == ''
+    assert cmd.content == '回显内容'
+    assert other.content == 'clock'
+
+
+def test_cmd_release_content_without_spill():
+    """没有临时文件时，回显直接丢弃，解析结果保留"""
+    cmd = Cmd('display version', 'content')
+    cmd.update_parse_reslut([{'key': 'value'}])
+    cmd.release_content()
+
+    assert cmd.content == ''
+    assert cmd.parse_result == [{'key': 'value'}]
@@ -1,3 +1,10 @@
+import importlib
+import pickle
+import sys
+import types
+
+import pytest
+
 from net_inspect import func
 
 
@@ -127,3 +134,72 @@ def test_case_insensitive_dict_3():
     assert t2['version'] == '1.0'
     assert t2['UPTIME'] == '1 day'
     assert t2['uptime'] == '1 day'
+
+
+def test_row():
+    """测试共享表头的行, 取值时忽略大小写"""
+    rows = func.make_rows(['INTERFACE', 'Status'], [['Gi0/1', 'up'], ['Gi0/2', 'down']])
+
+    assert rows[0]['interface'] == 'Gi0/1'
+    assert rows[0]['INTERFACE'] == 'Gi0/1'
+    assert rows[1].get('status') == 'down'
+    assert rows[1].get('speed') is None
+    assert 'Status' in rows[1]
+    assert 'speed' not in rows[1]
+    assert rows[0] == {'interface': 'Gi0/1', 'status': 'up'}
+    assert list(rows[0].keys()) == ['interface', 'status']
+    assert rows[0]._header is rows[1]._header
+
+    with pytest.raises(KeyError):
+        rows[0]['speed']
+    with pytest.raises(KeyError):  # 不是字符串的键与字典一样抛出KeyError
+        rows[0][0]
+    assert rows[0].get(0) is None
+    assert 0 not in rows[0]
+
+
+def test_row_pickle():
+    """跨进程传递后仍然共享表头"""
+    rows = func.make_rows(['interface', 'status'], [['Gi0/1', 'up'], ['Gi0/2', 'down']])
+    restored = pickle.loads(pickle.dumps(rows))
+
+    assert restored == rows
+    assert restored[0]._header is restored[1]._header is rows[0]._header
+
+
+def test_to_rows():
+    """字典转换为共享表头的行, 已经是行的保持不变"""
+    row = func.make_rows(['interface'], [['Gi0/1']])[0]
+    rows = func.to_rows([{'Interface': 'Gi0/2'}, {'INTERFACE': 'Gi0/3'}, row])
+
+    assert [r['interface'] for r in rows] == ['Gi0/2', 'Gi0/3', 'Gi0/1']
+    assert rows[2] is row
+
+
+def test_code_fingerprint(tmp_path, monkeypatch):
+    """代码指纹与所在模块的源文件有关, 修改模块中的任意内容后改变"""
+    source = (
+        'PATTERN = r"a"\n\n\n'
+        'def helper():\n    return PATTERN\n\n\n'
+        'class Handler:\n    def method(self):\n        return helper()\n'
+    )
+    module_path = tmp_path / 'fingerprint_module.py'
+    module_path.write_text(source, encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        module = importlib.import_module('fingerprint_module')
+        handler = func.code_fingerprint(module.Handler)
+        method = func.code_fingerprint(module.Handler.method)
+        assert handler and method
+        assert func.code_fingerprint(module.Handler) == handler
+
+        # 只修改了模块级的常量, 类和函数本身没有变化
+        module_path.write_text(source.replace('r"a"', 'r"ab"'), encoding='utf-8')
+        assert func.code_fingerprint(module.Handler) != handler
+        assert func.code_fingerprint(module.Handler.method) != method
+    finally:
+        sys.modules.pop('fingerprint_module', None)
+
+    dynamic = types.ModuleType('dynamic_module')  # 取不到源文件时无法确定
+    exec('def f():\n    pass\n', dynamic.__dict__)
+    assert func.code_fingerprint(dynamic.f) == ''
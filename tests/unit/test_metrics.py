@@ -0,0 +1,58 @@
+import pytest
+from net_inspect.metrics import CLUSTER, STAGE, TEMPLATE, Metrics
+
+
+def test_metrics_add_and_snapshot():
+    """记录调用次数和耗时"""
+    m = Metrics()
+    m.add(STAGE, 'parse', 0.5)
+    m.add(STAGE, 'parse', 0.25)
+    m.add(TEMPLATE, 'a.textfsm', 1.0, count=3)
+
+    res = m.snapshot()
+    assert res[STAGE]['parse'] == {'count': 2, 'seconds': 0.75}
+    assert res[TEMPLATE]['a.textfsm'] == {'count': 3, 'seconds': 1.0}
+
+
+def test_metrics_timer_with_exception():
+    """代码块抛出异常时同样会记录"""
+    m = Metrics()
+    with pytest.raises(ValueError):
+        with m.timer(STAGE, 'input'):
+            raise ValueError()
+
+    assert m.snapshot()[STAGE]['input']['count'] == 1
+
+
+def test_metrics_merge_and_clear():
+    """合并其他进程的统计结果, 清空后为空"""
+    m = Metrics()
+    m.add(STAGE, 'parse', 1.0)
+    other = Metrics()
+    other.add(STAGE, 'parse', 2.0)
+    other.add(CLUSTER, 'parse', 3.0)
+
+    m.merge(other.snapshot())
+    res = m.snapshot()
+    assert res[STAGE]['parse'] == {'count': 2, 'seconds': 3.0}
+    assert list(res) == [CLUSTER, STAGE]  # 按照分类的顺序排列
+
+    m.clear()
+    assert m.snapshot() == {}
+
+
+def test_metrics_collect():
+    """collect 只合并代码块执行期间新增的统计"""
+    store = Metrics()
+    store.add(CLUSTER, 'parse', 1.0)
+    target = Metrics()
+    with store.collect(target):
+        store.add(CLUSTER, 'parse', 2.0)
+        store.add(CLUSTER, 'input', 0.5)
+
+    assert target.snapshot() == {
+        CLUSTER: {
+            'parse': {'count': 1, 'seconds': 2.0},
+            'input': {'count': 1, 'seconds': 0.5},
+        }
+    }
@@ -31,3 +31,83 @@ def test_multi_commands_check_vendor():
     ]
     res = vendor.DefaultVendor.check_vendor({cmd.command: cmd for cmd in cmds})
     assert res.PLATFORM == vendor.Huawei.PLATFORM
+
+
+def test_detector_same_as_check_vendor():
+    """预编译的识别器与逐个厂商检查的结果一致"""
+    cmds = [
+        Cmd('dis vers', 'Huawei Versatile Routing Platform'),
+        Cmd('dis ver', 'H3C Comware Software'),
+        Cmd('sh ver', 'Cisco IOS Software'),
+        Cmd('show version', 'Ruijie Networks'),
+        Cmd('dis ver', " % Ambiguous command found at '^' position."),
+    ]
+    for cmd in cmds:
+        cmd_dict = {cmd.command: cmd}
+        expected = vendor.DefaultVendor
+        for handler in vendor.DefaultVendor.__subclasses__():
+            if handler._check_vendor(cmd_dict):
+                expected = handler
+                break
+
+        assert vendor.DefaultVendor.check_vendor(cmd_dict) is expected
+
+
+def test_detector_rebuild_when_vendor_changed(mocker):
+    """厂商的识别属性变化后, 识别器会重新构建"""
+    detector = vendor.DefaultVendor.get_detector()
+    assert vendor.DefaultVendor.get_detector() is detector
+
+    cmd = Cmd('dis ver', 'Custom Versatile Routing Platform')
+    assert vendor.DefaultVendor.check_vendor({cmd.command: cmd}) is vendor.DefaultVendor
+
+    mocker.patch.object(vendor.Huawei, 'KEYWORD_REG', r'Custom Versatile Routing Platform')
+    assert vendor.DefaultVendor.get_detector() is not detector
+    assert vendor.DefaultVendor.check_vendor({cmd.command: cmd}) is vendor.Huawei
+
+
+def test_detector_with_custom_version_command():
+    """只重载了 _check_version_command 的厂商, 识别的结果与 _check_vendor 一致"""
+
+    class CustomVendor(vendor.Huawei):
+        @classmethod
+        def _check_version_command(cls, cmds):
+            return 'dis custom' if 'dis custom' in cmds else ''
+
+    detector = vendor.VendorDetector([CustomVendor])
+    cmds = [
+        Cmd('dis custom', 'Huawei Versatile Routing Platform'),
+        Cmd('dis ver', 'Huawei Versatile Routing Platform'),
+    ]
+    for cmd in cmds:
+        cmd_dict = {cmd.command: cmd}
+        expected = CustomVendor if CustomVendor._check_vendor(cmd_dict) else None
+        assert detector.detect(cmd_dict) is expected
+
+    assert detector.detect({cmds[0].command: cmds[0]}) is CustomVendor
+
+
+def test_detector_with_staticmethod_hook():
+    """识别方法重载为staticmethod的厂商不会预编译, 使用厂商自身的识别方法"""
+
+    class StaticVendor(vendor.Huawei):
+        @staticmethod
+        def _check_vendor(cmds):
+            return 'dis static' in cmds
+
+    detector = vendor.VendorDetector([StaticVendor])
+    cmd = Cmd('dis static', 'anything')
+    assert detector.detect({cmd.command: cmd}) is StaticVendor
+    assert detector.detect({'dis ver': Cmd('dis ver', 'Huawei')}) is None
+
+
+def test_detector_rebuild_when_vendor_defined():
+    """定义新的厂商类后识别器会重新构建, 没有变化时直接复用"""
+    detector = vendor.Huawei.get_detector()
+    assert vendor.Huawei.get_detector() is detector
+
+    class NewVendor(vendor.Huawei):
+        pass
+
+    assert vendor.Huawei.get_detector() is not detector
+    assert NewVendor in vendor.Huawei.get_detector().handlers